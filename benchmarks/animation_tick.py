@@ -0,0 +1,52 @@
+"""
+Frame time of a status board with hundreds of blinking indicators.
+
+Every indicator runs its own looping animation of a paint only color and
+a width, started at a different moment. The time per frame is the time of
+one `AnimationEngine.tick` over all of them.
+
+    python benchmarks/animation_tick.py [indicator count] [frames]
+"""
+import sys
+from time import perf_counter
+
+from spatial_ui.layout_engine.models.style import Style
+from spatial_ui.layout_engine.parser.animation import AnimationEngine
+from spatial_ui.layout_engine.parser.stylesheet import compile_stylesheet
+
+SHEET = """
+Indicator {
+    width: 10px;
+    animation-name: blink;
+    animation-duration: 1s;
+    animation-iteration-count: infinite;
+}
+@keyframes blink {
+  0%   {background-color: rgba(0, 200, 0, 1); width: 10px}
+  50%  {background-color: rgba(0, 200, 0, 0); width: 14px}
+  100% {background-color: rgba(0, 200, 0, 1); width: 10px}
+}
+"""
+FRAME = 1 / 60
+
+
+def main(indicator_count=500, frames=600):
+    sheet = compile_stylesheet(SHEET)
+    engine = AnimationEngine()
+    for index in range(indicator_count):
+        style = Style.from_rules(sheet.rules)
+        style.animating = True
+        engine.fire(sheet.animations["blink"].bind(style))
+        # Start every indicator at its own point in the blink
+        engine.tick(FRAME * (index % 7) / 7)
+
+    start = perf_counter()
+    for _ in range(frames):
+        engine.tick(FRAME)
+    elapsed = perf_counter() - start
+    print(f"{indicator_count} indicators, {frames} frames")
+    print(f"  {elapsed / frames * 1000:.3f}ms per frame")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
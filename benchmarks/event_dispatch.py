@@ -0,0 +1,103 @@
+"""
+Setting up and sending system events for a 50,000 node layout tree.
+
+Compares a blinker connection per pseudo state handler per node, as the
+app used to make, against the EventDispatcher, which keeps no per node
+connections for pseudo states. One node in ten defines `:hover`.
+
+    python benchmarks/event_dispatch.py [node count] [events]
+"""
+import random
+import sys
+from collections import defaultdict
+from time import perf_counter
+
+from spatial_ui.events.dispatch import EventDispatcher
+from spatial_ui.layout_engine.models.node import Node
+from spatial_ui.events.signals import (
+    ON_ENTER,
+    ON_EXIT,
+    ON_DOWN,
+    ON_UP,
+    ON_FOCUS,
+    ON_BLUR,
+)
+from spatial_ui.window import PSEUDO_STATE_HANDLERS, defines_state
+
+SIGNALS = (ON_ENTER, ON_EXIT, ON_DOWN, ON_UP, ON_FOCUS, ON_BLUR)
+
+
+class Style:
+    def __init__(self, states):
+        self.values = defaultdict(dict, {state: {} for state in states})
+        self.state = "default"
+
+    def set_state(self, state):
+        self.state = state
+
+
+class Layout:
+    def __init__(self, states):
+        self.node = Node(node_element_name="Panel")
+        self.style = Style(states)
+        self.children = []
+
+
+def make_layouts(node_count):
+    return [
+        Layout(("default", "hover") if idx % 10 == 0 else ("default",))
+        for idx in range(node_count)
+    ]
+
+
+def with_blinker(layouts, targets):
+    receivers = {
+        signal: handler
+        for handlers in PSEUDO_STATE_HANDLERS.values()
+        for signal, handler in handlers
+    }
+    start = perf_counter()
+    for layout in layouts:
+        for signal, handler in receivers.items():
+            signal.connect(handler, layout)
+    setup = perf_counter() - start
+
+    start = perf_counter()
+    for layout in targets:
+        ON_ENTER.send(layout)
+        ON_EXIT.send(layout)
+    send = perf_counter() - start
+
+    for layout in layouts:
+        for signal, handler in receivers.items():
+            signal.disconnect(handler, layout)
+    return setup, send
+
+
+def with_dispatcher(layouts, targets):
+    start = perf_counter()
+    dispatcher = EventDispatcher(defines_state)
+    for state, handlers in PSEUDO_STATE_HANDLERS.items():
+        for signal, handler in handlers:
+            dispatcher.connect_state(state, signal, handler)
+    setup = perf_counter() - start
+
+    start = perf_counter()
+    for layout in targets:
+        dispatcher.send(ON_ENTER, layout)
+        dispatcher.send(ON_EXIT, layout)
+    send = perf_counter() - start
+    return setup, send
+
+
+def main(node_count=50_000, events=100_000):
+    layouts = make_layouts(node_count)
+    targets = random.Random(0).choices(layouts, k=events)
+    print(f"{node_count} nodes, {events} enter and exit events")
+    for name, run in (("blinker", with_blinker), ("dispatcher", with_dispatcher)):
+        setup, send = run(layouts, targets)
+        print(f"  {name}: setup {setup:.3f}s, send {send:.3f}s")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
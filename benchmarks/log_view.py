@@ -0,0 +1,51 @@
+"""
+Frame time of a log view a producer thread appends lines to.
+
+The view keeps the last 100,000 lines. Every frame, the lines appended
+since the last one are laid out and the view follows them. The time per
+frame is the time of the layout, with the producer running alongside.
+
+    python benchmarks/log_view.py [lines per second] [frames]
+"""
+import sys
+import threading
+from time import perf_counter, sleep
+
+from spatial_ui.elements import LogView, Panel
+from spatial_ui.layout.css import CSSLayout
+
+FRAME = 1 / 60
+
+
+def produce(log, lines_per_second, stop):
+    batch = max(int(lines_per_second / 100), 1)
+    count = 0
+    while not stop.is_set():
+        log.extend(f"{count + idx} GET /api/items 200 {idx % 97}ms" for idx in range(batch))
+        count += batch
+        sleep(0.01)
+
+
+def main(lines_per_second=1000, frames=300):
+    log = LogView([f"{idx} startup" for idx in range(100_000)])
+    layout = CSSLayout("")
+    layout.set_element_tree(Panel(log))
+    layout.render(800, 600)
+
+    stop = threading.Event()
+    producer = threading.Thread(target=produce, args=(log, lines_per_second, stop))
+    producer.start()
+    elapsed = 0
+    for _ in range(frames):
+        start = perf_counter()
+        layout._refresh(FRAME)
+        elapsed += perf_counter() - start
+        sleep(FRAME)
+    stop.set()
+    producer.join()
+    print(f"{lines_per_second} lines per second, {frames} frames")
+    print(f"  {elapsed / frames * 1000:.3f}ms of layout per frame")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,95 @@
+"""
+Rule matching of a 100,000 node tree, sequential and in a process pool.
+
+The tree is a panel of tables, every row holding cells with a text node,
+styled by a sheet with descendant, child, sibling and attribute selectors.
+Each worker count runs in a MatchPool, the way a layout keeps one: the
+first match starts the workers and is reported apart, the timed one runs
+on the warm pool. Every match is checked against the sequential one.
+
+    python benchmarks/parallel_cascade.py [node count] [max workers]
+"""
+import os
+import sys
+from time import perf_counter
+
+from spatial_ui.layout_engine import StyleTreeRenderer
+from spatial_ui.layout_engine.models.node import Node, NodeType
+from spatial_ui.layout_engine.parallel import MatchPool
+from spatial_ui.layout_engine.parser.stylesheet import compile_stylesheet
+
+SHEET = """
+Panel { display: block; }
+Table { display: block; border: 1px solid black; }
+TableRow { display: table-row; }
+TableRow + TableRow { background-color: #eeeeee; }
+Table > TableRow TableCell { display: table-cell; padding: 2px; }
+.even TableCell { background-color: #dddddd; }
+TableCell[id$="-0"] { font-weight: bold; }
+Table .selected:hover { background-color: #3341ff; }
+"""
+CELLS = 4
+
+
+def make_tree(node_count):
+    # A row is the row, its cells and their text
+    row_size = 1 + CELLS * 2
+    rows_per_table = 100
+    tables = []
+    rows = []
+    for row_index in range(node_count // row_size):
+        cells = [
+            Node(
+                node_element_name="TableCell",
+                node_id=f"cell-{row_index}-{cell_index}",
+                children=[Node(node_element_name="Text", node_type=NodeType.TEXT)],
+            )
+            for cell_index in range(CELLS)
+        ]
+        node_class = "even" if row_index % 2 else None
+        rows.append(Node(node_element_name="TableRow", node_class=node_class, children=cells))
+        if len(rows) == rows_per_table:
+            tables.append(Node(node_element_name="Table", children=rows))
+            rows = []
+    if rows:
+        tables.append(Node(node_element_name="Table", children=rows))
+    return Node(node_element_name="Panel", children=tables)
+
+
+def main(node_count=100_000, max_workers=None):
+    max_workers = max_workers or os.cpu_count()
+    sheet = compile_stylesheet(SHEET)
+    renderer = StyleTreeRenderer(sheet.rules, sheet.animations)
+    root = make_tree(node_count)
+    node_count = sum(1 for _ in root.walk())
+    print(f"{node_count} nodes, {os.cpu_count()} cores")
+
+    start = perf_counter()
+    expected = renderer.matcher.match(root)
+    sequential = perf_counter() - start
+    print(f"  sequential: {sequential:.3f}s")
+
+    workers = 2
+    while workers <= max_workers:
+        pool = MatchPool(workers, min_nodes=0)
+        try:
+            start = perf_counter()
+            rules_by_node = pool.match(renderer.matcher, sheet.rules, root, node_count)
+            cold = perf_counter() - start
+            assert rules_by_node == expected, "the parallel match differs"
+
+            start = perf_counter()
+            rules_by_node = pool.match(renderer.matcher, sheet.rules, root, node_count)
+            elapsed = perf_counter() - start
+            assert rules_by_node == expected, "the parallel match differs"
+        finally:
+            pool.shutdown()
+        print(
+            f"  {workers} workers: {elapsed:.3f}s, speedup {sequential / elapsed:.2f}x"
+            f" (first match, starting the pool: {cold:.3f}s)"
+        )
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,96 @@
+"""
+Parse time of a 5,000 rule stylesheet.
+
+Compares the tokenisation of the single tinycss2 pass used by the layout
+engine against the one of the former pipeline, which parsed every sheet
+with tinycss for the style rules, again with tinycss2 for keyframes, and
+every keyframe once more with tinycss. Neither side cleans the values,
+the cleaning of the former pipeline was replaced along with it. The full
+pass, cleaning included, is timed on its own.
+
+    python benchmarks/stylesheet_parse.py [rule count] [repeat]
+"""
+import sys
+from timeit import repeat
+
+import tinycss2
+
+from spatial_ui.layout_engine.parser.stylesheet import parse_stylesheet
+
+KEYFRAMES = """
+@keyframes blink {
+  0%   {background-color: rgba(255, 255, 255, 1)}
+  50%  {background-color: rgba(255, 255, 255, 0)}
+  100% {background-color: rgba(255, 255, 255, 1)}
+}
+"""
+RULE = """
+Table .row-{idx} TableCell:hover {{
+    width: {width}px;
+    padding: 2px 4px;
+    border: 1px solid black;
+    background-color: #3341{color:02x};
+    color: rgba(255, 255, 255, 0.5);
+}}
+"""
+
+
+def make_sheet(rule_count):
+    rules = [KEYFRAMES]
+    for idx in range(rule_count):
+        rules.append(RULE.format(idx=idx, width=idx % 100, color=idx % 256))
+    return "".join(rules)
+
+
+def single_parse(sheet):
+    nodes = tinycss2.parse_stylesheet(sheet, skip_comments=True, skip_whitespace=True)
+    for node in nodes:
+        if node.type == "qualified-rule":
+            tinycss2.parse_declaration_list(node.content, skip_comments=True, skip_whitespace=True)
+        elif node.type == "at-rule":
+            keyframes = tinycss2.parse_rule_list(
+                node.content, skip_comments=True, skip_whitespace=True
+            )
+            for keyframe in keyframes:
+                tinycss2.parse_declaration_list(
+                    keyframe.content, skip_comments=True, skip_whitespace=True
+                )
+
+
+def double_parse(sheet):
+    import tinycss
+    parser = tinycss.make_parser()
+    parser.parse_stylesheet(sheet)
+    nodes = tinycss2.parse_stylesheet(sheet, skip_comments=True, skip_whitespace=True)
+    for node in nodes:
+        if node.type != "at-rule":
+            continue
+        content = [token for token in node.content if token.type != "whitespace"]
+        for definition in content[1::2]:
+            parser.parse_stylesheet(f"stub {definition.serialize()}")
+
+
+def best_of(func, sheet, times):
+    return min(repeat(lambda: func(sheet), number=1, repeat=times))
+
+
+def main(rule_count=5000, times=3):
+    sheet = make_sheet(rule_count)
+    print(f"{rule_count} rules, best of {times}")
+
+    full = best_of(parse_stylesheet, sheet, times)
+    print(f"  single pass, parse and clean: {full:.3f}s")
+
+    single = best_of(single_parse, sheet, times)
+    print(f"  single pass, parse only: {single:.3f}s")
+    try:
+        double = best_of(double_parse, sheet, times)
+    except ImportError:
+        print("  tinycss is not installed, skipping the former parse")
+        return
+    print(f"  tinycss + tinycss2, parse only: {double:.3f}s")
+    print(f"  parse speedup: {double / single:.2f}x")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
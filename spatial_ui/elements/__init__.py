@@ -1,5 +1,7 @@
 from .button import Button
 from .panel import Panel
 from .input import Input
+from .text_area import TextArea
+from .log_view import LogView
 from .table import Table
 from .primitives.element import Scrollbar
\ No newline at end of file
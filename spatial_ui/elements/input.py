@@ -1,9 +1,11 @@
 from .primitives.element import Element
+from .primitives.text_buffer import GapBuffer
 from ..events.signals import (
     ON_CHAR,
     ON_ENTER_KEY,
     ON_BACKSPACE_KEY,
-    ON_ARROW_KEY
+    ON_ARROW_KEY,
+    TEXT_EDITED,
 )
 
 class Caret(Element):
@@ -29,16 +31,23 @@ class Text(Element):
         super().__init__()
         self.text = text
 
+    @property
+    def text(self):
+        # A buffer is only joined into a string when the text is read
+        return str(self._text)
+
+    @text.setter
+    def text(self, text):
+        self._text = text
+
     def __bool__(self):
-        return bool(self.text)
+        return len(self) > 0
+
+    def __len__(self):
+        return len(self._text)
 
     def __getitem__(self, key):
-        return self.text[key]
-        if isinstance(key, slice):
-            import pdb; pdb.set_trace()
-            indices = range(*key.indices(len(self.list)))
-            return [self.list[i] for i in indices]
-        return self.list[key]
+        return self._text[key]
 
 
 class Input(Element):
@@ -49,21 +58,21 @@ class Input(Element):
             placeholder = Placeholder(placeholder)
             self.add(placeholder)
         self.placeholder = placeholder
-        self._content_container = Text("")
+        self._content = GapBuffer()
+        self._content_container = Text(self._content)
         self.add(self.caret)
         self.add(self._content_container)
 
-        self._content = []
         self._index = 0
 
     @property
     def must_draw(self):
-        return not bool(self._content)
+        return not len(self._content)
 
-    def on_focus(self, layout):
+    def on_focus(self, layout, **kwargs):
         self._connect_keyboard()
 
-    def on_blur(self, layout):
+    def on_blur(self, layout, **kwargs):
         self._disconnect_keyboard()
 
     def _connect_keyboard(self):
@@ -79,9 +88,16 @@ class Input(Element):
         ON_ARROW_KEY.disconnect(self.on_arrow_key)
 
     def on_char(self, char):
-        self._content.append(char)
-        self._index += 1
-        self._content_container.text = "".join(self._content)
+        self.insert_text(char)
+
+    def insert_text(self, text):
+        """
+        Inserts text at the caret, a paste is a single edit.
+        """
+        with self.layout_lock:
+            self._content.insert(self._index, text)
+            self._index += len(text)
+            self._edited()
 
     def on_enter_key(self):
         pass
@@ -89,9 +105,15 @@ class Input(Element):
     def on_backspace_key(self, sender):
         if not self._index:
             return
-        self._index -= 1
-        self._content.pop(self._index)
-        self._content_container.text = "".join(self._content)
+        with self.layout_lock:
+            self._index -= 1
+            self._content.delete(self._index, self._index + 1)
+            self._edited()
+
+    def _edited(self):
+        content = self._content
+        tail = content.unchanged_tail
+        TEXT_EDITED.send(self._content_container, start=content.take_edited(), tail=tail)
 
     def on_arrow_key(self, arrow):
         if arrow == "right" and self._index < len(self._content):
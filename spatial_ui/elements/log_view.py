@@ -0,0 +1,35 @@
+from .input import Text
+from .primitives.element import Element
+from .primitives.line_buffer import LineBuffer
+from ..events.signals import LINES_APPENDED
+
+
+class LogView(Element):
+    """
+    A read only view of the last `max_lines` lines of a log.
+
+    Lines can be appended from any thread, an asyncio producer included,
+    and are laid out with the next frame, the lines it is made with are
+    there from the start. Only the appended lines are laid out, and while
+    the view is scrolled to its end, it follows them.
+    """
+    def __init__(self, lines=(), max_lines=100_000, follow=True):
+        super().__init__()
+        self.lines = LineBuffer(lines, max_lines)
+        self.follow = follow
+        self._content_container = Text(self.lines)
+        self.add(self._content_container)
+
+    def append(self, line):
+        self.extend((line,))
+
+    def extend(self, lines):
+        if self.lines.extend(lines):
+            LINES_APPENDED.send(self._content_container, lines=self.lines)
+
+    async def consume(self, batches):
+        """
+        Appends the batches of lines of an async iterator as they come.
+        """
+        async for lines in batches:
+            self.extend(lines)
@@ -1,3 +1,5 @@
+from contextlib import nullcontext
+
 from ...events.signals import (
     ON_HOVER,
     ON_ENTER,
@@ -24,32 +26,76 @@ EVENTS = {
     "on_frame": ON_FRAME
 }
 
+NO_LOCK = nullcontext()
+
 
 class Element:
+    # Optional identity among its siblings, lets CSSLayout reuse the node
+    # of an element rebuilt from the same data
+    key = None
+    # The CSSLayout the element is in, set by it
+    css_layout = None
+
     def __init__(self):
         self.parent = None
         self.children = [Scrollbar()]
 
+    @property
+    def layout_lock(self):
+        """
+        Held while changing anything the layout reads, the layout may be
+        running on another thread.
+        """
+        if self.css_layout is None:
+            return NO_LOCK
+        return self.css_layout.lock
+
     def __iter__(self):
         return iter(self.children)
 
     def add(self, child):
+        self._adopt(child)
+        self.children.append(child)
+
+    def insert(self, index, child):
+        self._adopt(child)
+        self.children.insert(index, child)
+
+    def remove(self, child):
+        self.children.remove(child)
+        if isinstance(child, Element):
+            child.parent = None
+
+    def _adopt(self, child):
         if isinstance(child, Element):
             if child.parent:
                 raise ValueError(f"{child} already has a parent {child.parent}")
             child.parent = self
         elif not isinstance(child, str):
             raise ValueError(f"Child must be Element or str, not {type(child)}")
-        self.children.append(child)
 
     def __repr__(self):
         return f"<{self.__class__.__name__}: {len(self.children)} children>"
 
-    def register_system_events(self, layout):
+    def register_system_events(self, layout, dispatcher):
+        # on_<event> handlers get the events of this element and, for
+        # bubbling events, of its descendants, on_<event>_capture ones get
+        # them before the descendants do. They are called with the layout
+        # of this element, and the one the event was sent to as `target`
+        for event, signal in EVENTS.items():
+            if hasattr(self, event):
+                dispatcher.connect(signal, getattr(self, event), layout)
+            if hasattr(self, f"{event}_capture"):
+                handler = getattr(self, f"{event}_capture")
+                dispatcher.connect(signal, handler, layout, capture=True)
+
+    def unregister_system_events(self, layout, dispatcher):
         for event, signal in EVENTS.items():
             if hasattr(self, event):
-                handler = getattr(self, event)
-                signal.connect(handler, layout)
+                dispatcher.disconnect(signal, getattr(self, event), layout)
+            if hasattr(self, f"{event}_capture"):
+                handler = getattr(self, f"{event}_capture")
+                dispatcher.disconnect(signal, handler, layout, capture=True)
 
 
 class Scrollbar(Element):
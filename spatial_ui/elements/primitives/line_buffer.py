@@ -0,0 +1,71 @@
+from collections import deque
+from itertools import islice
+from threading import Lock
+
+
+class LineBuffer:
+    """
+    The last `max_lines` lines of a log, older lines are dropped.
+
+    Lines can be appended from any thread, they are only queued there.
+    They join the buffer when `take_appended` is called, which is done
+    by the layout, so the lines it has and the buffer never disagree.
+    """
+    def __init__(self, lines=(), max_lines=100_000):
+        self.max_lines = max_lines
+        self.lines = deque(lines)
+        self._chars = sum(map(len, self.lines))
+        self._drop_excess()
+        self._text = None
+        self._pending = deque()
+        self._lock = Lock()
+
+    def __len__(self):
+        return self._chars + max(len(self.lines) - 1, 0)
+
+    def __str__(self):
+        if self._text is None:
+            self._text = "\n".join(self.lines)
+        return self._text
+
+    def __getitem__(self, key):
+        return str(self)[key]
+
+    def extend(self, lines):
+        """
+        Queues lines, given without their line break. Returns whether
+        there were any.
+        """
+        lines = list(lines)
+        if not lines:
+            return False
+        # A line with breaks in it is appended as several
+        lines = "\n".join(lines).split("\n")
+        with self._lock:
+            self._pending.extend(lines)
+        return True
+
+    def take_appended(self):
+        """
+        Moves the queued lines into the buffer. Returns the lines that were
+        added and kept, and how many of the lines that were in the buffer
+        before were dropped.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, deque()
+        if not pending:
+            return [], 0
+        previous = len(self.lines)
+        self._text = None
+        self.lines.extend(pending)
+        self._chars += sum(map(len, pending))
+        self._drop_excess()
+        appended = min(len(pending), self.max_lines)
+        dropped = previous + appended - len(self.lines)
+        added = list(islice(reversed(self.lines), appended))
+        added.reverse()
+        return added, dropped
+
+    def _drop_excess(self):
+        while len(self.lines) > self.max_lines:
+            self._chars -= len(self.lines.popleft())
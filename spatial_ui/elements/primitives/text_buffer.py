@@ -0,0 +1,84 @@
+GAP_SIZE = 64
+
+
+class GapBuffer:
+    """
+    Editable text, kept as a list of characters with a gap at the last
+    edit. Typing and deleting at the caret only moves the gap as far as
+    the caret moved, instead of shifting everything after it.
+
+    The lowest index edited since `take_edited` was last called is kept,
+    so text layout can start measuring from there, as well as how much of
+    the end of the text was left as it was.
+    """
+    def __init__(self, text=""):
+        self._chars = list(text) + [None] * GAP_SIZE
+        self._gap_start = len(text)
+        self._gap_end = len(self._chars)
+        self._text = text
+        self.edited_from = None
+        self.unchanged_tail = None
+
+    def __len__(self):
+        return len(self._chars) - (self._gap_end - self._gap_start)
+
+    def __str__(self):
+        if self._text is None:
+            self._text = "".join(
+                self._chars[:self._gap_start] + self._chars[self._gap_end:]
+            )
+        return self._text
+
+    def __getitem__(self, key):
+        # A slice only joins the characters in it
+        if self._text is not None or not isinstance(key, slice) or key.step not in (None, 1):
+            return str(self)[key]
+        start, stop, _ = key.indices(len(self))
+        gap = self._gap_end - self._gap_start
+        before = self._chars[start:min(stop, self._gap_start)]
+        after = self._chars[max(start, self._gap_start) + gap:stop + gap]
+        return "".join(before + after)
+
+    def insert(self, index, text):
+        self._edited(index, len(self) - index)
+        self._move_gap(index)
+        if len(text) > self._gap_end - self._gap_start:
+            self._grow(len(text))
+        self._chars[self._gap_start:self._gap_start + len(text)] = text
+        self._gap_start += len(text)
+
+    def delete(self, start, end):
+        self._edited(start, len(self) - end)
+        self._move_gap(end)
+        self._gap_start = start
+
+    def take_edited(self):
+        edited_from, self.edited_from = self.edited_from, None
+        self.unchanged_tail = None
+        return edited_from
+
+    def _edited(self, index, tail):
+        self._text = None
+        if self.edited_from is None or index < self.edited_from:
+            self.edited_from = index
+        if self.unchanged_tail is None or tail < self.unchanged_tail:
+            self.unchanged_tail = tail
+
+    def _move_gap(self, index):
+        if index < self._gap_start:
+            moved = self._chars[index:self._gap_start]
+            self._gap_end -= len(moved)
+            self._chars[self._gap_end:self._gap_end + len(moved)] = moved
+            self._gap_start = index
+        elif index > self._gap_start:
+            length = index - self._gap_start
+            moved = self._chars[self._gap_end:self._gap_end + length]
+            self._chars[self._gap_start:index] = moved
+            self._gap_start = index
+            self._gap_end += length
+
+    def _grow(self, size):
+        # At least doubles, so a long paste does not grow it many times
+        grow_by = max(size, len(self._chars), GAP_SIZE)
+        self._chars[self._gap_end:self._gap_end] = [None] * grow_by
+        self._gap_end += grow_by
@@ -0,0 +1,81 @@
+from .input import Input
+from .primitives.text_buffer import GapBuffer
+from ..events.signals import ON_ENTER_KEY
+
+
+class TextArea(Input):
+    """
+    A multi-line Input, for editors and log viewers.
+
+    Its text keeps its line breaks and wraps at its width. Going up and
+    down, and the selection, are measured on the laid out lines of its
+    text. The selection is a (start, end) pair of indices.
+    """
+    def __init__(self, text="", placeholder=None):
+        super().__init__(placeholder)
+        self._content = GapBuffer(text)
+        self._content_container.text = self._content
+        self.selection = None
+
+    @property
+    def text(self):
+        return str(self._content)
+
+    @property
+    def selected_text(self):
+        if not self.selection:
+            return ""
+        start, end = self.selection
+        return self.text[start:end]
+
+    def select(self, start, end):
+        start, end = sorted((start, end))
+        self.selection = (start, end) if start != end else None
+        self._index = end
+
+    def _connect_keyboard(self):
+        super()._connect_keyboard()
+        ON_ENTER_KEY.connect(self.on_enter_key)
+
+    def _disconnect_keyboard(self):
+        super()._disconnect_keyboard()
+        ON_ENTER_KEY.disconnect(self.on_enter_key)
+
+    def insert_text(self, text):
+        with self.layout_lock:
+            self._delete_selection()
+            super().insert_text(text)
+
+    def on_enter_key(self, sender):
+        self.insert_text("\n")
+
+    def on_backspace_key(self, sender):
+        with self.layout_lock:
+            if self._delete_selection():
+                self._edited()
+                return
+            super().on_backspace_key(sender)
+
+    def on_arrow_key(self, arrow):
+        self.selection = None
+        if arrow in ("up", "down") and self.css_layout is not None:
+            with self.layout_lock:
+                # Looked up each time, a rebuilt tree replaces the layout
+                text_layout = self.css_layout.layout_of(self._content_container)
+                if getattr(text_layout, "paragraphs", None) is not None:
+                    x, y = text_layout.caret_offset(self._index)
+                    line_height = text_layout.paragraphs.line_height
+                    y += line_height if arrow == "down" else -line_height
+                    # Aims at the middle of the line
+                    self._index = text_layout.index_at(x, y + line_height / 2)
+                    return
+        super().on_arrow_key(arrow)
+
+    def _delete_selection(self):
+        if not self.selection:
+            return False
+        start, end = self.selection
+        self._content.delete(start, end)
+        self._index = start
+        self.selection = None
+        return True
@@ -0,0 +1,117 @@
+from .signals import ON_HOVER, ON_DOWN, ON_UP, ON_CLICK
+
+# Like in the DOM, enter, exit, focus and blur only reach their target
+BUBBLING = (ON_HOVER, ON_DOWN, ON_UP, ON_CLICK)
+
+# Returned by a handler to keep an event from the nodes after it
+STOP_PROPAGATION = object()
+
+
+class EventDispatcher:
+    """
+    Sends system events to the handlers of the layout nodes on the path to
+    the target.
+
+    Handlers are kept by signal and node identity, so finding the ones of
+    a node is a dict lookup, and nodes without handlers cost nothing. An
+    event first goes down the parent chain to the target through capture
+    handlers, then, for bubbling events, back up through the others. So a
+    single handler on a table receives the clicks on all of its cells.
+    Handlers are called with the node they were connected to, and the
+    node the event was sent to as `target`.
+
+    Pseudo state handlers are not kept per node at all: they are looked up
+    when an event is sent, and only run for a target whose style defines
+    the state. Receivers connected to the signal itself are still sent to.
+    """
+    def __init__(self, defines_state, parent_of=None, bubbling=BUBBLING):
+        self.defines_state = defines_state
+        self.parent_of = parent_of
+        self.bubbling = set(bubbling)
+        self.handlers = {}
+        self.capture_handlers = {}
+        self.state_handlers = {}
+
+    def connect(self, signal, handler, node, capture=False):
+        table = self.capture_handlers if capture else self.handlers
+        by_node = table.setdefault(signal, {})
+        by_node.setdefault(id(node), []).append(handler)
+
+    def disconnect(self, signal, handler, node, capture=False):
+        table = self.capture_handlers if capture else self.handlers
+        by_node = table.get(signal, {})
+        handlers = by_node.get(id(node), [])
+        if handler in handlers:
+            handlers.remove(handler)
+        if not handlers:
+            by_node.pop(id(node), None)
+
+    def forget(self, node):
+        # Node ids are reused once the node is gone
+        for table in (self.handlers, self.capture_handlers):
+            for by_node in table.values():
+                by_node.pop(id(node), None)
+
+    def connect_state(self, state, signal, handler):
+        # A handler shared by states runs once for a node defining several
+        handlers = self.state_handlers.setdefault(signal, {})
+        handlers.setdefault(handler, []).append(state)
+
+    def has_receivers(self, *signals):
+        return any(
+            signal.receivers
+            or self.handlers.get(signal)
+            or self.capture_handlers.get(signal)
+            or signal in self.state_handlers
+            for signal in signals
+        )
+
+    def send(self, signal, node, **kwargs):
+        if node is not None:
+            defines_state = self.defines_state
+            for handler, states in self.state_handlers.get(signal, {}).items():
+                for state in states:
+                    if defines_state(node, state):
+                        handler(node)
+                        break
+            self._propagate(signal, node, kwargs)
+        if signal.receivers:
+            signal.send(node, **kwargs)
+
+    def _propagate(self, signal, target, kwargs):
+        capture = self.capture_handlers.get(signal)
+        bubble = self.handlers.get(signal)
+        if not capture and not bubble:
+            return
+        path = self.path_to(target)
+        if capture:
+            for node in reversed(path):
+                if self._run(capture.get(id(node)), node, target, kwargs):
+                    return
+        if bubble:
+            if signal not in self.bubbling:
+                path = path[:1]
+            for node in path:
+                if self._run(bubble.get(id(node)), node, target, kwargs):
+                    return
+
+    def _run(self, handlers, node, target, kwargs):
+        if not handlers:
+            return False
+        stopped = False
+        # Handlers may disconnect themselves
+        for handler in tuple(handlers):
+            if handler(node, target=target, **kwargs) is STOP_PROPAGATION:
+                stopped = True
+        return stopped
+
+    def path_to(self, node):
+        # From the node up to the root
+        path = [node]
+        if self.parent_of is None:
+            return path
+        parent = self.parent_of(node)
+        while parent is not None:
+            path.append(parent)
+            parent = self.parent_of(parent)
+        return path
@@ -0,0 +1,79 @@
+from time import perf_counter
+
+from .signals import ON_FRAME, ON_INTERPOLATE, ON_LAYOUT, ON_FRAME_MISSED
+
+# Weight of the latest measurement in the running cost estimates
+COST_WEIGHT = 0.5
+# Keeps rounding in the summed deltas from skipping a step
+STEP_TOLERANCE = 1e-9
+
+
+class FrameScheduler:
+    """
+    Runs a frame within a time budget, most urgent work first.
+
+    Input is handled first, then animations advance on ON_FRAME in fixed
+    steps, so a long frame is caught up with the same steps a short one
+    takes. The time short of a step carries over to the next frame, and
+    goes out on ON_INTERPOLATE before painting, so what is painted can
+    be moved that far past the last step. Restyles and relayouts
+    (ON_LAYOUT) only run when the frame is expected to stay within
+    budget, but are never put off for more than `max_deferred` frames.
+    Frames over budget send ON_FRAME_MISSED.
+    """
+    def __init__(self, budget=1 / 60, step=1 / 60, max_steps=4, max_deferred=4, clock=perf_counter):
+        self.budget = budget
+        self.step = step
+        self.max_steps = max_steps
+        self.max_deferred = max_deferred
+        self.clock = clock
+        self.accumulator = 0
+        self.deferred = 0
+        self.missed = 0
+        self.layout_cost = 0
+        self.paint_cost = 0
+
+    def run_frame(self, delta, handle_input, paint):
+        start = self.clock()
+        handle_input()
+        self.advance(delta)
+
+        remaining = self.budget - (self.clock() - start) - self.paint_cost
+        if self.layout_cost <= remaining or self.deferred >= self.max_deferred:
+            self.deferred = 0
+            layout_start = self.clock()
+            ON_LAYOUT.send(delta)
+            self.layout_cost = self._estimate(self.layout_cost, self.clock() - layout_start)
+        else:
+            self.deferred += 1
+
+        paint_start = self.clock()
+        ON_INTERPOLATE.send(self.accumulator)
+        paint(delta)
+        end = self.clock()
+        self.paint_cost = self._estimate(self.paint_cost, end - paint_start)
+
+        elapsed = end - start
+        if elapsed > self.budget:
+            self.missed += 1
+            ON_FRAME_MISSED.send(elapsed)
+
+    def advance(self, delta):
+        self.accumulator += delta
+        steps = 0
+        while self.accumulator + STEP_TOLERANCE >= self.step and steps < self.max_steps:
+            ON_FRAME.send(self.step)
+            self.accumulator -= self.step
+            steps += 1
+        # Time that could not be caught up with is dropped, rather than
+        # making every following frame late as well
+        if self.accumulator + STEP_TOLERANCE >= self.step:
+            self.accumulator %= self.step
+
+    @property
+    def alpha(self):
+        # How far the frame is between the last step and the next one
+        return self.accumulator / self.step
+
+    def _estimate(self, estimate, measured):
+        return estimate + (measured - estimate) * COST_WEIGHT
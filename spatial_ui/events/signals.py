@@ -9,6 +9,8 @@ ON_CHAR = Signal("on_char")
 ON_BACKSPACE_KEY = Signal("on_backspace_key")
 ON_ENTER_KEY = Signal("on_enter_key")
 ON_ARROW_KEY = Signal("on_arrow_key")
+TEXT_EDITED = Signal("text_edited")
+LINES_APPENDED = Signal("lines_appended")
 
 ON_HOVER = Signal("on_hover")
 ON_ENTER = Signal("on_enter")
@@ -18,3 +20,6 @@ ON_FOCUS = Signal("on_focus")
 ON_BLUR = Signal("on_blur")
 
 ON_FRAME = Signal("on_frame")
+ON_INTERPOLATE = Signal("on_interpolate")
+ON_LAYOUT = Signal("on_layout")
+ON_FRAME_MISSED = Signal("on_frame_missed")
@@ -1,24 +1,35 @@
 import os.path as osp
+from collections import defaultdict, deque
+from functools import wraps
 from queue import Queue, Empty
+from threading import Event, RLock, Thread
 
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
-from arcade_curtains.animation import AnimationManager
 
 from ..layout_engine import render_layout, get_layout_renderer
+from ..layout_engine.parallel import MatchPool
 from ..layout_engine.layout import AnonymousLayout
-from ..layout_engine.helpers import node_tree_from_nested_struct
+from ..layout_engine.helpers import node_tree_from_nested_struct, index_of
 from ..layout_engine.models.primitives import Vector2
 from ..layout_engine.models.node import Node, NodeType
+from ..layout_engine.parser.animation import AnimationEngine
 from ..layout_engine.signals import (
     STYLE_CHANGED,
     LAUNCH_ANIMATION,
     STOP_ANIMATION,
-    ANIMATION_ENDED,
 )
 from ..elements.input import Caret, Placeholder, Text
 from ..elements import Scrollbar
-from ..events.signals import ON_FRAME
+from ..elements.primitives.element import Element
+from ..events.signals import (
+    ON_FRAME,
+    ON_INTERPOLATE,
+    ON_LAYOUT,
+    TEXT_EDITED,
+    LINES_APPENDED,
+)
+from .snapshot import LayoutSnapshot
 
 LAYOUT_ROOT_PATH = osp.abspath(osp.dirname(__file__))
 AGENT_CSS_PATH = osp.join(LAYOUT_ROOT_PATH, "assets", "agent.css")
@@ -38,7 +49,9 @@ def get_element_at(element, x, y):
     # for element in reversed(tree):
     box = element.container.border_box
     if box.left <= x <= box.right and box.top <= y <= box.bottom:
-        for child in element.children:
+        # children of a scroll container are laid out unscrolled
+        y += element.scroll_offset
+        for child in element.children_in(y, y):
             found_element = get_element_at(child, x, y)
             if found_element:
                 # currently here because we don't want to return text nodes
@@ -48,6 +61,18 @@ def get_element_at(element, x, y):
         return element
 
 
+def get_scroll_container_at(element, x, y):
+    box = element.container.border_box
+    if box.left <= x <= box.right and box.top <= y <= box.bottom:
+        inner_y = y + element.scroll_offset
+        for child in reversed(element.children_in(inner_y, inner_y)):
+            container = get_scroll_container_at(child, x, inner_y)
+            if container is not None:
+                return container
+        if element.is_scrollable():
+            return element
+
+
 def start_watchdog(layout, file_path):
     event_handler = ReloadCSSHandler(layout)
     observer = Observer()
@@ -78,10 +103,17 @@ def node_factory(element):
     return node
 
 
-class EventableList(list):
-    def remove(self, item):
-        super().remove(item)
-        ANIMATION_ENDED.send(item.sprite.style)
+def element_identity(element):
+    return type(element), getattr(element, "key", None)
+
+
+def locked(method):
+    # Changes to the live tree wait for a layout running in the background
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
 
 
 class ReloadCSSHandler(FileSystemEventHandler):
@@ -95,69 +127,377 @@ class ReloadCSSHandler(FileSystemEventHandler):
 
 
 class CSSLayout:
-    def __init__(self, css_sheet):
+    """
+    Lays out an element tree with a stylesheet.
+
+    When threaded, restyling and layout after the first render run on a
+    background thread. Every finished layout is published as a snapshot,
+    which is what gets painted and hit tested, so the frame loop never
+    waits for a layout.
+
+    With `workers`, the rules of large trees are matched by that many
+    processes, which are kept until `close`.
+    """
+    def __init__(
+        self,
+        css_sheet,
+        cache_dir=None,
+        threaded=False,
+        workers=0,
+    ):
         self.agent_css = read_file(AGENT_CSS_PATH)
         self.css_sheet = "\n".join([self.agent_css, css_sheet])
+        self.cache_dir = cache_dir
         self.element_tree = []
+        self.nodes_by_element = {}
         self.style_tree = None
         self.renderer = None
-        self.animation_manager = AnimationManager()
-        self.animation_manager.animations = EventableList()
-        self.running_animations = {}
+        self.animations = AnimationEngine()
         self.width = 0
         self.height = 0
         self.dirty = False
+        self.threaded = threaded
+        self.match_pool = None
+        if workers > 1:
+            self.match_pool = MatchPool(workers)
+        self.snapshot = None
+        self._lock = RLock()
+        self._work = Event()
+        self._worker = None
+        self._closed = False
+        self._errors = deque()
+        self._stale = False
+        self._pending_scrolls = deque()
+        self._pending_appends = deque()
         STYLE_CHANGED.connect(self._flag_dirty)
         LAUNCH_ANIMATION.connect(self.register_animation)
         STOP_ANIMATION.connect(self.kill_animation)
-        ON_FRAME.connect(self.animation_manager._blip)
-        ON_FRAME.connect(self._refresh)
+        ON_FRAME.connect(self.animations.tick)
+        ON_INTERPOLATE.connect(self.animations.interpolate)
+        ON_LAYOUT.connect(self._refresh)
+        TEXT_EDITED.connect(self._text_edited)
+        LINES_APPENDED.connect(self._lines_appended)
 
     @classmethod
-    def from_filepath(cls, file_path, observe=False):
-        layout = cls(read_file(file_path))
+    def from_filepath(
+        cls,
+        file_path,
+        observe=False,
+        cache_dir=None,
+        threaded=False,
+        workers=0,
+    ):
+        layout = cls(
+            read_file(file_path),
+            cache_dir=cache_dir,
+            threaded=threaded,
+            workers=workers,
+        )
         if observe:
             start_watchdog(layout, file_path)
         return layout
 
+    @property
+    def on_screen(self):
+        # The tree that is painted and hit tested
+        if self.threaded:
+            return self.snapshot
+        return self.style_tree
+
     def get_element_at(self, x, y):
-        return get_element_at(self.style_tree, x, y)
+        element = get_element_at(self.on_screen, x, y)
+        if isinstance(element, LayoutSnapshot):
+            return element.layout
+        return element
+
+    def scroll(self, x, y, delta):
+        container = get_scroll_container_at(self.on_screen, x, y)
+        if container is None:
+            return
+        if isinstance(container, LayoutSnapshot):
+            # Scrolling may lay out more of the flow, so it is left to the
+            # background thread as well
+            self._pending_scrolls.append((container.layout, delta))
+            return
+        container.scroll_by(delta)
+
+    @property
+    def lock(self):
+        return self._lock
+
+    @locked
+    def layout_of(self, element):
+        """
+        The live layout of element, None when it isn't laid out. Hold
+        `lock` while using it, the worker may be changing it.
+        """
+        node = self.nodes_by_element.get(element)
+        if node is None or self.renderer is None:
+            return None
+        return self.renderer.layouts_by_node.get(node)
 
     def get_node_at(self, x, y):
-        element = get_element_at(self.style_tree, x, y)
+        element = get_element_at(self.on_screen, x, y)
         if element:
             return element.node.raw_content
 
+    @locked
     def set_element_tree(self, element_tree):
-        self.element_tree = node_tree_from_nested_struct(
-            element_tree,
-            factory=node_factory
+        """
+        Once rendered, a new element tree is reconciled against the current
+        nodes. Nodes are reused on element type and key, so only the
+        differences are restyled and laid out again.
+        """
+        reusable = (
+            self.renderer is not None
+            and element_identity(self.element_tree.raw_content)
+            == element_identity(element_tree)
         )
-
+        if reusable:
+            with self.renderer.batch():
+                self._reconcile(self.element_tree, element_tree)
+        else:
+            self.element_tree = node_tree_from_nested_struct(
+                element_tree,
+                factory=node_factory
+            )
+            self.renderer = None
+        self.nodes_by_element = {}
+        self._register_nodes(self.element_tree)
+
+    def _reconcile(self, node, element):
+        if node.raw_content is not element:
+            self.renderer.set_content(node, element)
+        node_class = getattr(element, "name", None)
+        if node.node_class != node_class:
+            node.node_class = node_class
+            self.renderer.restyle_node(node)
+        if not isinstance(element, str):
+            self._reconcile_children(node, list(element))
+
+    def _reconcile_children(self, node, elements):
+        unkeyed = defaultdict(deque)
+        keyed = {}
+        for child in node.children:
+            element_type, key = element_identity(child.raw_content)
+            if key is None:
+                unkeyed[element_type].append(child)
+            else:
+                keyed[element_type, key] = child
+
+        matches = []
+        for element in elements:
+            element_type, key = element_identity(element)
+            if key is None:
+                candidates = unkeyed[element_type]
+                matches.append(candidates.popleft() if candidates else None)
+            else:
+                matches.append(keyed.pop((element_type, key), None))
+
+        reused = {id(match) for match in matches if match is not None}
+        for child in list(node.children):
+            if id(child) not in reused:
+                self.renderer.remove_node(child)
+
+        for index, (element, match) in enumerate(zip(elements, matches)):
+            if match is None:
+                child = node_tree_from_nested_struct(element, factory=node_factory)
+                self.renderer.insert_node(node, index, child)
+                continue
+            if node.children[index] is not match:
+                self.renderer.move_node(match, node, index)
+            self._reconcile(match, element)
+
+    def _register_nodes(self, node):
+        for child in node.walk():
+            if isinstance(child.raw_content, Element):
+                self.nodes_by_element[child.raw_content] = child
+                child.raw_content.css_layout = self
+
+    def _forget_nodes(self, node):
+        for child in node.walk():
+            if isinstance(child.raw_content, Element):
+                self.nodes_by_element.pop(child.raw_content, None)
+                child.raw_content.__dict__.pop("css_layout", None)
+
+    @locked
+    def insert(self, parent, index, element):
+        """
+        Inserts element at index in `parent.children`. Once rendered, only
+        the new element and the siblings its selectors can reach are
+        restyled, the layout follows on the next frame.
+        """
+        parent.insert(index, element)
+        node = node_tree_from_nested_struct(element, factory=node_factory)
+        self._register_nodes(node)
+        parent_node = self.nodes_by_element[parent]
+        if self.renderer is None:
+            parent_node.insert(index, node)
+        else:
+            self.renderer.insert_node(parent_node, index, node)
+
+    def append(self, parent, element):
+        self.insert(parent, len(parent.children), element)
+
+    @locked
+    def remove(self, element):
+        node = self.nodes_by_element[element]
+        parent_node = self.nodes_by_element[element.parent]
+        element.parent.remove(element)
+        self._forget_nodes(node)
+        if self.renderer is None:
+            del parent_node.children[index_of(parent_node.children, node)]
+        else:
+            self.renderer.remove_node(node)
+
+    @locked
+    def move(self, element, parent, index):
+        # index is the position in parent once element has been taken out
+        node = self.nodes_by_element[element]
+        parent_node = self.nodes_by_element[parent]
+        old_parent_node = self.nodes_by_element[element.parent]
+        element.parent.remove(element)
+        parent.insert(index, element)
+        if self.renderer is None:
+            del old_parent_node.children[index_of(old_parent_node.children, node)]
+            parent_node.insert(index, node)
+        else:
+            self.renderer.move_node(node, parent_node, index)
+
+    @locked
+    def replace(self, element, new_element):
+        parent = element.parent
+        index = index_of(parent.children, element)
+        self.remove(element)
+        self.insert(parent, index, new_element)
+
+    @locked
     def render(self, width, height):
         self.width = width
         self.height = height
+        if self.renderer is not None:
+            self.renderer.close()
         self.renderer = get_layout_renderer(
             element_tree=self.element_tree,
             css_sheet=self.css_sheet,
+            cache_dir=self.cache_dir,
+            match_pool=self.match_pool,
         )
         viewport = Vector2(x=width, y=0)
         self.style_tree = self.renderer.render_layout(viewport=viewport)
+        if self.threaded:
+            self.snapshot = LayoutSnapshot(self.style_tree)
+            self._start_worker()
         return self.style_tree
 
+    @locked
     def reload(self, path):
         self.css_sheet = "\n".join([self.agent_css, read_file(path)])
         self.renderer.update_style_tree(self.style_tree, self.css_sheet)
         self.refresh(self.width, self.height)
+        # The layout is done, the next frame only has to pick it up
+        self._stale = True
+
+    @locked
+    def _text_edited(self, text, start, tail=None):
+        node = self.nodes_by_element.get(text)
+        if node is not None and self.renderer is not None:
+            self.renderer.edit_text(node, start, tail)
+
+    def _lines_appended(self, text, lines):
+        # Sent from the thread of the producer, which should not wait for a
+        # layout, the lines are taken with the next one
+        self._pending_appends.append((text, lines))
+
+    @locked
+    def _take_appended(self):
+        while self._pending_appends:
+            text, lines = self._pending_appends.popleft()
+            appended, dropped = lines.take_appended()
+            if not appended and not dropped:
+                # Taken with an earlier append of the same frame
+                continue
+            node = self.nodes_by_element.get(text)
+            if node is not None and self.renderer is not None:
+                self.renderer.append_lines(node, appended, dropped)
 
     def _flag_dirty(self, style):
         self.dirty = True
 
-    def _refresh(self, style):
+    def _refresh(self, delta):
+        if self._errors:
+            # A layout that failed in the background fails the frame
+            raise self._errors.popleft()
+        if not self.threaded:
+            self._update_layout()
+            return
+        if self._needs_layout() or self._pending_scrolls or self._pending_appends or self._stale:
+            self._stale = False
+            self._work.set()
+
+    def _needs_layout(self):
+        if self.dirty:
+            return True
+        return self.renderer is not None and bool(self.renderer.dirty_layouts)
+
+    def _update_layout(self):
+        self._take_appended()
         if self.dirty:
             self.dirty = False
             self.refresh()
+        elif self.renderer is not None and self.renderer.dirty_layouts:
+            self.relayout()
 
+    def _start_worker(self):
+        if self._worker is not None:
+            return
+        self._worker = Thread(target=self._layout_in_background, daemon=True)
+        self._worker.start()
+
+    def _layout_in_background(self):
+        while not self._closed:
+            self._work.wait()
+            self._work.clear()
+            if self._closed:
+                break
+            try:
+                self.layout_snapshot()
+            except Exception as error:
+                # Raised on the frame thread, the next layouts still run
+                self._errors.append(error)
+
+    def close(self):
+        """
+        Stops the background layout, once the one it is running is done,
+        and the processes it matches rules with.
+        """
+        self._closed = True
+        self._work.set()
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+        if self.match_pool is not None:
+            self.match_pool.shutdown()
+
+    @locked
+    def layout_snapshot(self):
+        """
+        Applies the pending scrolls, lays out what changed, and publishes
+        the result as the snapshot on screen.
+        """
+        while self._pending_scrolls:
+            container, delta = self._pending_scrolls.popleft()
+            container.scroll_by(delta)
+        self._update_layout()
+        # A single assignment, the frame loop sees either snapshot whole
+        self.snapshot = LayoutSnapshot(self.style_tree)
+
+    @locked
+    def relayout(self):
+        viewport = Vector2(x=self.width, y=0)
+        self.renderer.relayout_dirty(viewport)
+
+    @locked
     def refresh(self, width=None, height=None):
         self.width = width or self.width
         self.height = height or self.height
@@ -165,6 +505,9 @@ class CSSLayout:
         layout.container.content.size = Vector2(x=self.width, y=0)
         self.reset_container(self.style_tree)
         self.style_tree.render_layout(layout)
+        self.style_tree.update_bounds()
+        if self.renderer is not None:
+            self.renderer.dirty_layouts = {}
 
     def reset_container(self, node):
         node.container.reset()
@@ -172,9 +515,7 @@ class CSSLayout:
             self.reset_container(child)
 
     def register_animation(self, animation):
-        self.animation_manager.fire(animation.sprite, animation.sequence)
-        self.running_animations[id(animation.sprite.style)] = animation.sprite
+        self.animations.fire(animation)
 
     def kill_animation(self, style):
-        sprite = self.running_animations.get(id(style))
-        self.animation_manager.kill(sprite)
+        self.animations.kill(style)
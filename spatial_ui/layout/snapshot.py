@@ -0,0 +1,212 @@
+from bisect import bisect_right
+
+from ..layout_engine.fonts import get_font
+from ..layout_engine.layout import ScrollLayout
+from ..layout_engine.layout.text import TextLine
+from ..layout_engine.models.primitives import Vector4
+from ..layout_engine.models.style import BoxModel, NO_VALUES
+from ..layout_engine.properties import default_value_for, INHERIT
+
+# The style values that painting reads
+PAINTED_VALUES = (
+    "display",
+    "color",
+    "background-color",
+    "border-radius",
+    "border-top-width",
+    "border-left-width",
+    "border-bottom-width",
+    "border-right-width",
+    "border-top-color",
+    "border-left-color",
+    "border-bottom-color",
+    "border-right-color",
+    "font-family",
+    "font-size",
+)
+INHERITED = object()
+
+
+def copy_vector(vector):
+    return Vector4.construct(w=vector.w, x=vector.x, y=vector.y, z=vector.z)
+
+
+def copy_box_model(container):
+    # Layout changes containers in place, so nothing can be shared
+    return BoxModel.construct(
+        content=container.content.copy(),
+        padding=copy_vector(container.padding),
+        border=copy_vector(container.border),
+        margin=copy_vector(container.margin),
+    )
+
+
+class StyleSnapshot:
+    """
+    The painted values of a style, as they were when the snapshot was
+    taken. Nodes matching the same rules in the same state share them,
+    values they inherit are read from the snapshot of their parent.
+
+    Animations are ticked on the frame loop, which is also the one that
+    paints, so animated values are read from the style as they change.
+    """
+    def __init__(self, style, values, parent):
+        self._style = style
+        self.values = values
+        self.parent = parent
+
+    def __getattr__(self, key):
+        key = key.replace("_", "-")
+        animated = self._style.animated
+        if key in animated:
+            return animated[key]
+        try:
+            value = self.values[key]
+        except KeyError:
+            raise AttributeError(key) from None
+        if value is not INHERITED:
+            return value
+        if self.parent is None:
+            return default_value_for(key)[key]
+        return getattr(self.parent, key)
+
+
+class StyleCopies:
+    # The style snapshots of a layout snapshot, by style
+    def __init__(self):
+        self.by_style = {}
+        self.values = {}
+
+    def copy(self, style):
+        copy = self.by_style.get(id(style))
+        if copy is not None:
+            return copy
+        parent = None
+        if style.inherits is not None:
+            parent = self.copy(style.inherits)
+        # Styles without rules, like the ones of text, all resolve alike
+        key = (id(style.values) if style.values else None, style.state)
+        values = self.values.get(key)
+        if values is None:
+            values = self.values[key] = self._resolve(style)
+        copy = StyleSnapshot(style, values, parent)
+        self.by_style[id(style)] = copy
+        return copy
+
+    def _resolve(self, style):
+        # Like the style itself, without animated and inherited values
+        declared = style.values.get(style.state, NO_VALUES)
+        defaults = style.values.get("default", NO_VALUES)
+        values = {}
+        for key in PAINTED_VALUES:
+            if key in declared:
+                values[key] = declared[key]
+            elif key in defaults:
+                values[key] = defaults[key]
+            elif key in INHERIT:
+                values[key] = INHERITED
+            else:
+                values[key] = default_value_for(key)[key]
+        return values
+
+
+class LayoutSnapshot:
+    """
+    A laid out subtree, as it was when the snapshot was taken. Painting
+    and hit testing read it like the layout itself, while the layout is
+    changed for the next frame. Only the node and its element are shared
+    with the live layout, they are what hit testing finds.
+    """
+    def __init__(self, layout, styles=None):
+        styles = StyleCopies() if styles is None else styles
+        self.layout = layout
+        self.node = layout.node
+        self.parent = layout.parent
+        self.style = styles.copy(layout.style)
+        self.container = copy_box_model(layout.container)
+        self.bounds = None if layout.bounds is None else layout.bounds.copy()
+        self.scroll_offset = layout.scroll_offset
+        self.y_offset = getattr(layout, "y_offset", 0)
+        self.clips = layout.needs_clip()
+        self.scrollable = layout.is_scrollable()
+        self.text_blocks = [
+            TextLine.construct(text=line.text, font=line.font, box=line.box.copy())
+            for line in getattr(layout, "text_blocks", ())
+        ]
+        # Lines of a text area are placed when they are read, from a copy
+        # of its paragraphs
+        self.paragraphs = None
+        if getattr(layout, "paragraphs", None) is not None:
+            self.paragraphs = layout.paragraphs.copy()
+        # Where the lines of other text start, for the caret
+        self.text = None
+        self.line_starts = self.line_tops = ()
+        if self.paragraphs is None and hasattr(layout, "line_starts"):
+            self.text = str(layout.node.raw_content)
+            self.line_starts = list(layout.line_starts)
+            self.line_tops = list(layout.line_tops)
+
+        self.scrollbar = None
+        if getattr(layout, "scrollbar", None) is not None:
+            self.scrollbar = LayoutSnapshot(layout.scrollbar, styles)
+
+        # Only the laid out part of a scroll container's flow is kept
+        self.flow_tops = None
+        if isinstance(layout, ScrollLayout):
+            self.flow_tops = list(layout.flow_tops)
+            self.floating = [
+                LayoutSnapshot(child, styles) for child in layout.floating
+            ]
+            self.overlays = [
+                LayoutSnapshot(child, styles) for child in layout.overlays
+            ]
+            self.flow = [
+                LayoutSnapshot(child, styles)
+                for child in layout.flow[:len(self.flow_tops)]
+            ]
+            self.children = self.floating + self.flow + self.overlays
+        else:
+            self.children = [
+                LayoutSnapshot(child, styles) for child in layout.children
+            ]
+
+    def __iter__(self):
+        return iter(self.children)
+
+    def needs_clip(self):
+        return self.clips
+
+    def is_scrollable(self):
+        return self.scrollable
+
+    def children_in(self, top, bottom):
+        if self.flow_tops is None:
+            return self.children
+        first = max(bisect_right(self.flow_tops, top) - 1, 0)
+        last = bisect_right(self.flow_tops, bottom)
+        return self.floating + self.flow[first:last] + self.overlays
+
+    def lines_in(self, top, bottom):
+        if self.paragraphs is None:
+            return self.text_blocks
+        content = self.container.content
+        return self.paragraphs.lines_in(content.x, content.y, top, bottom)
+
+    def caret_offset(self, index):
+        if self.paragraphs is not None:
+            return self.paragraphs.caret_offset(index)
+        line = max(bisect_right(self.line_starts, index) - 1, 0)
+        start = self.line_starts[line] if self.line_starts else 0
+        y_offset = 0
+        if self.line_tops:
+            y_offset = self.line_tops[line] - self.container.content.y
+        if not self.text:
+            return 0, y_offset
+        font = get_font(self.style.font_family, int(self.style.font_size.value))
+        return font.getlength(self.text[start:index]), y_offset
+
+    def selection_rects(self, start, end, top, bottom):
+        content = self.container.content
+        return self.paragraphs.selection_rects(
+            start, end, content.x, content.y, top, bottom
+        )
@@ -1,35 +1,43 @@
 from collections import defaultdict
-
-import tinycss
-from tinycss.css21 import Stylesheet
-from lxml.etree import Element, SubElement
+from contextlib import contextmanager
 
 from .models.node import NodeType
 from .models.primitives import Vector2
 from .models.style import BoxModel, Style
 from .properties import clean_value_for, default_value_for
+from .helpers import index_of
+from .matching import RuleMatcher
+from .parallel import MatchPool
 from .layout import (
     AnonymousLayout,
     BlockLayout,
     TextLayout,
+    TextAreaLayout,
     CaretLayout,
     TableRowLayout,
     TableCellLayout,
+    ScrollLayout,
     ScrollbarLayout,
+    SCROLL_OVERFLOW,
 )
 from .signals import (
     STYLE_CREATED,
     LAYOUT_CREATED,
+    LAYOUT_INSERTED,
+    LAYOUT_REMOVED,
+    NODE_CONTENT_CHANGED,
     BIND_ANIMATION,
     LAUNCH_ANIMATION,
 )
-from .parser.animation import load_animations
+from .parser.stylesheet import load_stylesheet
 
 
 def get_layout_renderer(
     element_tree,
     css_sheet=None,
     css_file=None,
+    cache_dir=None,
+    match_pool=None,
 ):
     if not any([css_sheet, css_file]):
         raise ValueError("A css definition is needed when rendering a layout")
@@ -38,6 +46,8 @@ def get_layout_renderer(
         root_node=element_tree,
         sheet=css_sheet,
         sheet_file=css_file,
+        cache_dir=cache_dir,
+        match_pool=match_pool,
     )
     return style_tree_renderer
 
@@ -60,82 +70,104 @@ def render_layout(
     return style_tree
 
 
-def _style_tree_from_node_tree(tree, node, parent=None):
-    if parent is None:
-        parent = Element(node.node_element_name, attrib=node.identifiers)
-    else:
-        parent = SubElement(parent, node.node_element_name, attrib=node.identifiers)
-
-    tree.nodes_by_element[parent] = node
-    for child in node.children:
-        _style_tree_from_node_tree(tree, child, parent)
-
-    return parent
-
-
-def load_rules(sheet=None, sheet_file=None):
-    # TODO: replace this by tinycss2
-    if sheet_file:
-        sheet = tinycss.make_parser().parse_stylesheet_file(sheet_file)
-    if isinstance(sheet, str):
-        sheet = tinycss.make_parser().parse_stylesheet(sheet)
-
-    if not isinstance(sheet, Stylesheet):
-        msg = "Style rules must be of type tinycss.css21.Stylesheet"
-        raise ValueError(msg)
-    return sheet.rules
-
-
 class StyleTreeRenderer:
-    def __init__(self, rules=None, animations=None):
-        self.nodes_by_element = {}
+    def __init__(
+        self,
+        rules=None,
+        animations=None,
+        cache_dir=None,
+        workers=0,
+        match_pool=None,
+    ):
         self.rules = rules
         self.animations = animations
+        self.cache_dir = cache_dir
+        # Processes matching the rules of a full render of a large tree,
+        # none matches in this process. A pool that is passed in is shared
+        # with other renderers, and not shut down here
+        self.match_pool = match_pool
+        self._owns_match_pool = False
+        if match_pool is None and workers > 1:
+            self.match_pool = MatchPool(workers)
+            self._owns_match_pool = True
+        self.matcher = RuleMatcher(rules or [])
+        self._shared_values = {}
         self._node_tree = None
-        self._tree = None
+        self._parents = {}
+        self._rules_by_node = {}
+        self.style_tree = None
+        self.styles_by_node = defaultdict(Style)
+        self.layouts_by_node = {}
+        self.dirty_layouts = {}
+        self._pending_siblings = None
         BIND_ANIMATION.connect(self._launch_animation)
 
     @classmethod
-    def from_node_tree(cls, root_node, sheet=None, sheet_file=None):
+    def from_node_tree(
+        cls,
+        root_node,
+        sheet=None,
+        sheet_file=None,
+        cache_dir=None,
+        workers=0,
+        match_pool=None,
+    ):
+        stylesheet = load_stylesheet(sheet, sheet_file, cache_dir)
         style_tree = cls(
-            rules=load_rules(sheet, sheet_file),
-            animations=load_animations(sheet, sheet_file),
+            rules=stylesheet.rules,
+            animations=stylesheet.animations,
+            cache_dir=cache_dir,
+            workers=workers,
+            match_pool=match_pool,
         )
-
-        root = _style_tree_from_node_tree(style_tree, root_node)
-        style_tree._tree = root
         style_tree._node_tree = root_node
 
         return style_tree
 
+    def close(self):
+        if self._owns_match_pool:
+            self.match_pool.shutdown()
+            self._owns_match_pool = False
+
     def render_layout(self, viewport):
-        styles_by_node = self._calculate_styles()
-        style_tree = self._assemble_style_tree(None, self._node_tree, styles_by_node)
+        self._parents = {}
+        self._index_parents(None, self._node_tree)
+        self.layouts_by_node = {}
+        self.dirty_layouts = {}
+        self.styles_by_node = self._calculate_styles()
+        style_tree = self._assemble_style_tree(None, self._node_tree, self.styles_by_node)
         layout = AnonymousLayout()
         layout.container.content.size = viewport
         style_tree.render_layout(layout)
+        style_tree.update_bounds()
+        self.style_tree = style_tree
         return style_tree
 
+    def _index_parents(self, parent, node):
+        self._parents[node] = parent
+        for child in node.children:
+            self._index_parents(node, child)
+
     def _calculate_styles(self):
-        rules_by_node = defaultdict(list)
         styles_by_node = defaultdict(Style)
 
-        for rule in self.rules:
-            selector = rule.selector.as_css()
-            if ':' in selector:
-                selector = selector.split(":")[0]
-            elements = self._tree.cssselect(selector)
-            for element in elements:
-                node = self.nodes_by_element[element]
-                rules_by_node[node].append(rule)
-
-        for node, rules in rules_by_node.items():
-            style = Style.from_rules(rules)
-            style._maybe_start_animation("none")
-            styles_by_node[node] = style
-            STYLE_CREATED.send(style)
+        if self.match_pool is not None:
+            self._rules_by_node = self.match_pool.match(
+                self.matcher, self.rules, self._node_tree, len(self._parents)
+            )
+        else:
+            self._rules_by_node = self.matcher.match(self._node_tree)
+        for node, rules in self._rules_by_node.items():
+            styles_by_node[node] = self._create_style(rules)
         return styles_by_node
 
+    def _create_style(self, rules, state="default"):
+        style = Style.shared_from_rules(rules, self._shared_values)
+        style.state = state
+        style._maybe_start_animation("none")
+        STYLE_CREATED.send(style)
+        return style
+
     def _launch_animation(self, style):
         if style.animation_name is 'none':
             return
@@ -147,23 +179,20 @@ class StyleTreeRenderer:
         style = styles_by_node[node]
         style.inherit_from(styles_by_node[parent])
 
-        if node.node_type is NodeType.TEXT:
+        if node.node_type is NodeType.TEXT and style.white_space == "pre-wrap":
+            layout = TextAreaLayout(style=style, node=node, parent=parent)
+        elif node.node_type is NodeType.TEXT:
             layout = TextLayout(style=style, node=node, parent=parent)
         elif node.node_type is NodeType.CARET:
             layout = CaretLayout(style=style, node=node, parent=parent)
-        # elif node.node_type is NodeType.SCROLLBAR:
-        #     layout = ScrollbarLayout(style=style, node=node, parent=parent)
+        elif style.display == 'block' and style.overflow in SCROLL_OVERFLOW:
+            layout = ScrollLayout(style=style, node=node, parent=parent)
         elif style.display == 'block':
             layout = BlockLayout(style=style, node=node, parent=parent)
         elif style.display == 'table-row':
             layout = TableRowLayout(style=style, node=node, parent=parent)
         elif style.display == 'table-cell':
-            layout = TableCellLayout(
-                style=style,
-                node=node,
-                parent=parent,
-                column_idx=len(parent.children)
-            )
+            layout = TableCellLayout(style=style, node=node, parent=parent)
         elif style.display == 'inline':
             raise NotImplementedError()
         elif style.display == 'inline-block':
@@ -171,17 +200,30 @@ class StyleTreeRenderer:
         else:
             return None
 
+        self.layouts_by_node[node] = layout
         for child in node.children:
+            if child.node_type is NodeType.SCROLLBAR and isinstance(layout, ScrollLayout):
+                # Only scroll containers lay their scrollbar out, it is
+                # painted on top of their children rather than among them
+                layout.scrollbar = ScrollbarLayout(
+                    style=styles_by_node[child],
+                    node=child,
+                    parent=node
+                )
+                continue
             child_layout = self._assemble_style_tree(node, child, styles_by_node)
             if child_layout is not None:
                 layout.children.append(child_layout)
         return layout
 
     def update_style_tree(self, style_tree, sheet):
-        self.rules = load_rules(sheet=sheet)
-        self.animations = load_animations(sheet=sheet)
-        styles_by_node = self._calculate_styles()
-        self._update_style_tree(style_tree, styles_by_node)
+        stylesheet = load_stylesheet(sheet=sheet, cache_dir=self.cache_dir)
+        self.rules = stylesheet.rules
+        self.animations = stylesheet.animations
+        self.matcher = RuleMatcher(self.rules)
+        self._shared_values = {}
+        self.styles_by_node = self._calculate_styles()
+        self._update_style_tree(style_tree, self.styles_by_node)
 
     def _update_style_tree(self, layout, styles_by_node):
         style = styles_by_node[layout.node]
@@ -191,6 +233,292 @@ class StyleTreeRenderer:
         style.set_state(layout.style.state)
         style._maybe_start_animation('none')
         layout.style = style
+        if isinstance(layout, ScrollLayout) and layout.scrollbar is not None:
+            layout.scrollbar.style = styles_by_node[layout.scrollbar.node]
 
         for child in layout.children:
             self._update_style_tree(child, styles_by_node)
+
+    def insert_node(self, parent, index, node):
+        """
+        Inserts node as the index-th child of parent. Only the new subtree
+        and the siblings a sibling combinator can reach are restyled, the
+        layout is redone on the next call to `relayout_dirty`.
+        """
+        parent.insert(index, node)
+        self._index_parents(parent, node)
+        path = self._path_to(node)
+        self._rebuild(node, path, self.matcher.match_subtree(node, path))
+        self._restyle_siblings(parent, index + 1)
+
+    def remove_node(self, node):
+        parent = self._parents.get(node)
+        if parent is None:
+            raise ValueError("The root node can not be removed")
+        index = index_of(parent.children, node)
+
+        layout = self.layouts_by_node.get(node)
+        if layout is not None:
+            self._discard_layout(layout)
+            parent_layout = self.layouts_by_node[parent]
+            del parent_layout.children[index_of(parent_layout.children, layout)]
+            self._mark_dirty(parent)
+
+        del parent.children[index]
+        for child in node.walk():
+            self._parents.pop(child, None)
+            self._rules_by_node.pop(child, None)
+            style = self.styles_by_node.pop(child, None)
+            if style is not None and style.animation_name != 'none':
+                style.kill()
+        self._restyle_siblings(parent, index)
+
+    def move_node(self, node, parent, index):
+        # index is the position in parent once node has been taken out
+        self.remove_node(node)
+        self.insert_node(parent, index, node)
+
+    def replace_node(self, node, new_node):
+        parent = self._parents.get(node)
+        if parent is None:
+            raise ValueError("The root node can not be replaced")
+        index = index_of(parent.children, node)
+        self.remove_node(node)
+        self.insert_node(parent, index, new_node)
+
+    def set_content(self, node, content):
+        """
+        Swaps the element a node stands for, keeping its style and layout.
+        """
+        previous = node.raw_content
+        node.raw_content = content
+        layout = self.layouts_by_node.get(node)
+        if layout is None:
+            return
+        if node.node_type is NodeType.TEXT and previous != content:
+            layout.edit(0)
+            self._mark_dirty(node)
+        NODE_CONTENT_CHANGED.send(layout, previous=previous)
+
+    def edit_text(self, node, start, tail=None):
+        """
+        Marks the text of a text node as edited from index start on, up to
+        the last `tail` characters when given. Its layout only measures the
+        lines the edit touched again.
+        """
+        layout = self.layouts_by_node.get(node)
+        if layout is None:
+            return
+        layout.edit(start, tail)
+        self._mark_dirty(node)
+
+    def append_lines(self, node, lines, dropped=0):
+        """
+        Adds lines to the end of the text of a text node, after dropping
+        `dropped` lines from its start. Its layout only measures the new
+        lines.
+        """
+        layout = self.layouts_by_node.get(node)
+        if layout is None:
+            return
+        layout.append_lines(lines, dropped)
+        self._mark_dirty(node)
+
+    def restyle_node(self, node):
+        """
+        Matches node again, after its class or id changed. Its subtree and
+        following siblings are only rebuilt when their rules changed.
+        """
+        parent = self._parents.get(node)
+        if parent is None:
+            self.styles_by_node = self._calculate_styles()
+            self._update_style_tree(self.style_tree, self.styles_by_node)
+            self.dirty_layouts[node] = self.style_tree
+            return
+
+        path = self._path_to(node)
+        rules_by_node = self.matcher.match_subtree(node, path)
+        if self._rules_changed(node, rules_by_node):
+            self._rebuild(node, path, rules_by_node)
+        self._restyle_siblings(parent, path[-1][1] + 1)
+
+    @contextmanager
+    def batch(self):
+        """
+        Defers restyling siblings until the end of a series of mutations,
+        so siblings are only matched again against the final tree.
+        """
+        self._pending_siblings = {}
+        try:
+            yield
+        finally:
+            pending, self._pending_siblings = self._pending_siblings, None
+            for parent, start in pending.items():
+                if parent in self._parents:
+                    self._restyle_siblings(parent, start)
+
+    def relayout_dirty(self, viewport):
+        """
+        Lays out every dirty layout boundary again, skipping the ones
+        nested in another dirty boundary. When a boundary changes height,
+        its ancestors move what follows it, up to the first one that keeps
+        its height.
+        """
+        dirty = self.dirty_layouts
+        self.dirty_layouts = {}
+        root = AnonymousLayout()
+        root.container.content.size = viewport
+        if self._node_tree in dirty:
+            self.style_tree.reset_containers()
+            self.style_tree.render_layout(root)
+            self.style_tree.update_bounds()
+            return
+
+        for node, layout in dirty.items():
+            if not self._has_dirty_ancestor(node, dirty):
+                self._relayout(node, layout, root.container)
+
+    def _relayout(self, node, layout, root_container):
+        height = layout.container.margin_box.height
+        layout.relayout(self._parent_container(node, root_container))
+        layout.update_bounds()
+        dy = layout.container.margin_box.height - height
+
+        parent = self._parents.get(node)
+        while dy and parent is not None:
+            parent_layout = self.layouts_by_node[parent]
+            if not parent_layout.is_layout_boundary():
+                # Table rows and cells size themselves from their siblings
+                boundary = self._boundary_of(parent)
+                self._relayout(boundary, self.layouts_by_node[boundary], root_container)
+                return
+            dy = parent_layout.make_room(
+                layout, dy, self._parent_container(parent, root_container)
+            )
+            node, layout, parent = parent, parent_layout, self._parents.get(parent)
+        self._merge_ancestor_bounds(node)
+
+    def _parent_container(self, node, root_container):
+        parent = self._parents.get(node)
+        if parent is None:
+            return root_container
+        return self.layouts_by_node[parent].container
+
+    def _merge_ancestor_bounds(self, node):
+        parent = self._parents.get(node)
+        while parent is not None:
+            self.layouts_by_node[parent].merge_bounds()
+            parent = self._parents.get(parent)
+
+    def _has_dirty_ancestor(self, node, dirty):
+        parent = self._parents.get(node)
+        while parent is not None:
+            if parent in dirty:
+                return True
+            parent = self._parents.get(parent)
+        return False
+
+    def _path_to(self, node):
+        path = []
+        parent = self._parents.get(node)
+        while parent is not None:
+            path.append((node, index_of(parent.children, node)))
+            node, parent = parent, self._parents.get(parent)
+        path.append((node, 0))
+        path.reverse()
+        return path
+
+    def _restyle_siblings(self, parent, start):
+        # Only sibling combinators make the rules of a node depend on the
+        # siblings before it
+        if not self.matcher.has_sibling_rules:
+            return
+        if self._pending_siblings is not None:
+            start = min(start, self._pending_siblings.get(parent, start))
+            self._pending_siblings[parent] = start
+            return
+        path = self._path_to(parent)
+        for index in range(start, len(parent.children)):
+            child = parent.children[index]
+            path.append((child, index))
+            rules_by_node = self.matcher.match_subtree(child, path)
+            if self._rules_changed(child, rules_by_node):
+                self._rebuild(child, path, rules_by_node)
+            path.pop()
+
+    def _rules_changed(self, node, rules_by_node):
+        for child in node.walk():
+            if rules_by_node.get(child) != self._rules_by_node.get(child):
+                return True
+        return False
+
+    def _rebuild(self, node, path, rules_by_node):
+        parent = self._parents[node]
+        parent_layout = self.layouts_by_node.get(parent)
+        old_layout = self.layouts_by_node.get(node)
+        if old_layout is not None:
+            self._discard_layout(old_layout)
+
+        for child in node.walk():
+            previous = self.styles_by_node.get(child)
+            state = "default"
+            if previous is not None:
+                state = previous.state
+                if previous.animation_name != 'none':
+                    previous.kill()
+
+            rules = rules_by_node.get(child)
+            if rules:
+                self._rules_by_node[child] = rules
+                self.styles_by_node[child] = self._create_style(rules, state)
+            else:
+                self._rules_by_node.pop(child, None)
+                self.styles_by_node[child] = Style(state=state)
+
+        if parent_layout is None:
+            # parent is not displayed, neither are its children
+            return
+
+        layout = self._assemble_style_tree(parent, node, self.styles_by_node)
+        children = parent_layout.children
+        if old_layout is not None:
+            position = index_of(children, old_layout)
+            del children[position]
+        else:
+            position = self._layout_position(parent, node)
+        if layout is not None:
+            children.insert(position, layout)
+            LAYOUT_INSERTED.send(layout)
+        self._mark_dirty(parent)
+
+    def _layout_position(self, parent, node):
+        position = 0
+        for sibling in parent.children:
+            if sibling is node:
+                break
+            if sibling in self.layouts_by_node:
+                position += 1
+        return position
+
+    def _discard_layout(self, layout):
+        LAYOUT_REMOVED.send(layout)
+        self._forget_layout(layout)
+
+    def _forget_layout(self, layout):
+        self.layouts_by_node.pop(layout.node, None)
+        self.dirty_layouts.pop(layout.node, None)
+        for child in layout.children:
+            self._forget_layout(child)
+
+    def _mark_dirty(self, node):
+        node = self._boundary_of(node)
+        self.dirty_layouts[node] = self.layouts_by_node[node]
+
+    def _boundary_of(self, node):
+        # The closest layout boundary holding node, or the root
+        while self._parents.get(node) is not None:
+            layout = self.layouts_by_node.get(node)
+            if layout is not None and layout.is_layout_boundary():
+                break
+            node = self._parents[node]
+        return node
@@ -1,3 +1,4 @@
+import mmap
 from pathlib import Path
 
 from PIL import ImageFont
@@ -7,6 +8,39 @@ DEFAULT_FONT_PATH = (HERE / "DejaVuSans.ttf").as_posix()
 DEFAULT_FONT = ImageFont.truetype(font=DEFAULT_FONT_PATH, size=6)
 
 FONTS = {}
+FONT_FILES = {}
+
+
+class FontFile:
+    """
+    Read-only memory map of a font file on disk.
+
+    The mapping is backed by the page cache, so every process mapping the
+    same file shares the same physical pages instead of holding a private
+    copy of the font bytes.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as fh:
+            self.buffer = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def close(self):
+        self.buffer.close()
+
+
+def get_font_file(path: str):
+    # Shared files stay mapped for the life of the process: skia reads
+    # typefaces made from them straight from the mapping, without taking
+    # a buffer export that would keep a close from unmapping it
+    if path in FONT_FILES:
+        return FONT_FILES[path]
+
+    font_file = FontFile(path)
+    FONT_FILES[path] = font_file
+    return font_file
 
 
 def get_font(font_family: str, size: int):
@@ -14,6 +48,9 @@ def get_font(font_family: str, size: int):
     if key in FONTS:
         return FONTS[key]
 
+    # Faces are loaded by path rather than from bytes: FreeType maps the
+    # file itself, whereas loading from bytes would copy the whole font
+    # onto the private heap for every size.
     try:
         font = ImageFont.truetype(font=font_family, size=size)
     except OSError:
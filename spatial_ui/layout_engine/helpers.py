@@ -1,7 +1,3 @@
-from collections import defaultdict
-
-import cssselect
-
 from .models.node import Node, NodeType
 
 AUTO = 'auto'
@@ -58,6 +54,15 @@ def node_tree_from_nested_struct(nested_struct, factory=node_factory):
     return root
 
 
+def index_of(items, item):
+    # list.index compares with ==, which pydantic models implement by
+    # comparing all of their fields
+    for index, candidate in enumerate(items):
+        if candidate is item:
+            return index
+    raise ValueError("item is not in the list")
+
+
 def orientation_from_property_name(property_name):
     for candidate in HORIZONTAL_CANDIDATES:
         if candidate in property_name:
@@ -85,23 +90,9 @@ def parse_value(value, unit):
 
 
 def sort_rules_by_specificity(rules):
-    # Sorts the rules from less important to most important
-    selectors_by_importance = defaultdict(list)
-    all_rules = {r.selector.as_css(): r for r in rules}
-
-    for selector, rule in all_rules.items():
-        parsed_selector, = cssselect.parse(selector)
-        # parsed_selector => (most important int, int, least important int)
-        importance = int("".join([str(s) for s in parsed_selector.specificity()]))
-        selectors_by_importance[importance].append(selector)
-
-    for importance in sorted(selectors_by_importance.keys()):
-        selectors = selectors_by_importance[importance]
-        if len(selectors) == 1:
-            yield all_rules[selectors[0]]
-        rules = [all_rules[s] for s in selectors]
-        for rule in sorted(rules, key=lambda r: r.line):
-            yield rule
+    # Sorts the rules from less important to most important. Specificities
+    # compare as (id, class, element) tuples, equal ones keep source order
+    return sorted(rules, key=lambda r: (r.specificity, r.order))
 
 
 class Dimension:
@@ -2,8 +2,10 @@ from pydantic import BaseModel, Field
 
 from .block import BlockLayout
 from .text import TextLayout
+from .text_area import TextAreaLayout
 from .misc import CaretLayout, ScrollbarLayout
 from .table import TableRowLayout, TableCellLayout
+from .scroll import ScrollLayout, SCROLL_OVERFLOW
 from ..models.style import BaseLayout, BoxModel, Style
 
 
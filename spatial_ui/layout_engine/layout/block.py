@@ -1,6 +1,6 @@
 from ..models.primitives import Vector4, Vector2
 from ..models.style import BaseLayout
-from ..helpers import AUTO
+from ..helpers import AUTO, index_of
 
 
 def handle_width_auto(width, margin_left, margin_right, underflow):
@@ -44,6 +44,39 @@ class BlockLayout(BaseLayout):
         self.layout_children()
         self.calculate_height(parent_layout.container)
 
+    def is_layout_boundary(self):
+        # A block lays its children out again in place, its ancestors then
+        # only make room for it when its height changed
+        return True
+
+    def relayout(self, parent_container):
+        for child in self.children:
+            child.reset_containers()
+        self.container.content.height = 0
+        self.layout_children()
+        self.calculate_height(parent_container)
+
+    def make_room(self, child, dy, parent_container):
+        """
+        Moves what follows child down by dy, once child was laid out again
+        dy taller. Returns how much taller this box got.
+        """
+        height = self.container.margin_box.height
+        if any(sibling.style.float in ['left', 'right'] for sibling in self.children):
+            # Floats wrap around each other, they are laid out again
+            self.relayout(parent_container)
+            self.update_bounds()
+            return self.container.margin_box.height - height
+
+        for sibling in self.children[index_of(self.children, child) + 1:]:
+            sibling.translate(dy)
+        self.container.content.height = sum(
+            sibling.container.margin_box.height for sibling in self.children
+        )
+        self.calculate_height(parent_container)
+        self.merge_bounds()
+        return self.container.margin_box.height - height
+
     def calculate_width(self, parent_container):
         margin_width = 0
 
@@ -180,6 +213,10 @@ class BlockLayout(BaseLayout):
             else:
                 non_floating.append(child)
 
+        self.layout_floating(floating)
+        self.layout_flow(non_floating)
+
+    def layout_floating(self, floating):
         left_float_offset = 0
         right_float_offset = 0
         top_float_offset = 0
@@ -208,6 +245,7 @@ class BlockLayout(BaseLayout):
                 right_float_offset = 0
                 height = 0
 
+    def layout_flow(self, non_floating):
         for child in non_floating:
             child.render_layout(self)
             self.container.content.height += child.container.margin_box.height
@@ -1,8 +1,13 @@
 from ..models.style import BaseLayout
-from ..models.primitives import Vector2
+from ..models.primitives import Vector2, Rect
+
+MIN_THUMB_HEIGHT = 20
 
 
 class CaretLayout(BaseLayout):
+    # From the top of the parent, the line of the caret is added on paint
+    y_offset: float = 0
+
     def render_layout(self, parent_layout):
         container = parent_layout.container
         self.container.content = container.content.copy()
@@ -18,15 +23,28 @@ class CaretLayout(BaseLayout):
 
         self.container.content.height = height
         self.container.content.y += offset
+        self.y_offset = offset
 
 
 class ScrollbarLayout(BaseLayout):
     def render_layout(self, parent_layout):
-        container = parent_layout.container
-
-        self.container.content.width = self.style.width.value;
-        self.container.content.height = 100
+        # The thumb of the scroll container, in its unscrolled coordinates
+        content = parent_layout.container.content
+        visible = content.height
+        total = max(parent_layout.scroll_height, visible)
+        ratio = visible / total if total else 1
+        height = min(max(visible * ratio, MIN_THUMB_HEIGHT), visible)
+        # the thumb travels over what its minimum height leaves of the track
+        travel = visible - height
+        scrollable = total - visible
 
-        top_right = container.content.top_left
-        top_right.x += container.content.width - self.container.content.width
-        self.container.content.topleft = top_right
+        width = self.style.width.value
+        y = content.y
+        if scrollable > 0:
+            y += travel * parent_layout.scroll_y / scrollable
+        self.container.content = Rect(
+            x=content.x + content.width - width,
+            y=y,
+            width=width,
+            height=height,
+        )
@@ -0,0 +1,150 @@
+from bisect import bisect_right
+from typing import Any, List, Optional
+
+from pydantic import Field
+
+from .block import BlockLayout
+from .misc import CaretLayout
+from ..helpers import AUTO
+
+SCROLL_OVERFLOW = ("scroll", "auto")
+
+
+class ScrollLayout(BlockLayout):
+    """
+    A block with `overflow: scroll` or `overflow: auto`.
+
+    With a fixed height, children in the flow are only laid out once they
+    scroll into view. The scroll offset is applied when painting and hit
+    testing, so scrolling does not lay anything out again.
+
+    When its element `follow`s, a container scrolled to its end stays
+    there as its content grows, like a log.
+    """
+    scroll_y: float = 0
+    scroll_height: float = 0
+    viewport_height: Optional[float]
+    scrollbar: Optional[Any]
+
+    floating: List[Any] = Field(default_factory=list)
+    # Placed over the flow when painting, like the caret of a text area
+    overlays: List[Any] = Field(default_factory=list)
+    flow: List[Any] = Field(default_factory=list)
+    flow_tops: List[float] = Field(default_factory=list)
+    flow_height: float = 0
+
+    @property
+    def scroll_offset(self):
+        return self.scroll_y
+
+    def is_scrollable(self):
+        if self.style.overflow == "scroll":
+            return True
+        return self.scroll_height > self.container.content.height
+
+    def render_layout(self, parent_layout, *float_offsets):
+        self.viewport_height = None
+        with self.style(parent_layout.container) as style:
+            if style.height != AUTO:
+                self.viewport_height = max(style.height, style.min_height)
+        super().render_layout(parent_layout, *float_offsets)
+        self.place_scrollbar()
+
+    def layout_floating(self, floating):
+        self.floating = floating
+        super().layout_floating(floating)
+
+    def layout_flow(self, non_floating):
+        following = (
+            getattr(self.node.raw_content, "follow", False)
+            and self.scroll_y >= self.scroll_height - self._visible_height()
+        )
+        self.overlays = [
+            child for child in non_floating if isinstance(child, CaretLayout)
+        ]
+        for child in self.overlays:
+            child.render_layout(self)
+        self.flow = [
+            child for child in non_floating if not isinstance(child, CaretLayout)
+        ]
+        self.flow_tops = []
+        self.flow_height = self.container.content.height
+        self._layout_flow_until(self.scroll_y + self._visible_height())
+        max_scroll = max(self.scroll_height - self._visible_height(), 0)
+        self.scroll_y = max_scroll if following else min(self.scroll_y, max_scroll)
+
+    def relayout(self, parent_container):
+        super().relayout(parent_container)
+        self.place_scrollbar()
+
+    def make_room(self, child, dy, parent_container):
+        # The flow is laid out lazily from the top, so it starts over
+        height = self.container.margin_box.height
+        self.relayout(parent_container)
+        self.update_bounds()
+        return self.container.margin_box.height - height
+
+    def _visible_height(self):
+        if self.viewport_height is None:
+            return float("inf")
+        return self.viewport_height
+
+    def _layout_flow_until(self, bottom):
+        # Picks up where the previous call left off, the running content
+        # height is the offset of the next child in the flow
+        top = self.container.content.top
+        while len(self.flow_tops) < len(self.flow) and self.flow_height < bottom:
+            child = self.flow[len(self.flow_tops)]
+            self.flow_tops.append(top + self.flow_height)
+            child.render_layout(self)
+            child.update_bounds()
+            self.container.content.height += child.container.margin_box.height
+            self.flow_height = self.container.content.height
+
+        laid_out = len(self.flow_tops)
+        self.scroll_height = self.flow_height
+        if laid_out and laid_out < len(self.flow):
+            flow_start = self.flow_tops[0] - top
+            average = (self.flow_height - flow_start) / laid_out
+            self.scroll_height += average * (len(self.flow) - laid_out)
+
+    def scroll_by(self, delta):
+        self.scroll_to(self.scroll_y + delta)
+
+    def scroll_to(self, scroll_y):
+        visible_height = self._visible_height()
+        bottom = scroll_y + visible_height
+        if bottom > self.flow_height and len(self.flow_tops) < len(self.flow):
+            height = self.container.content.height
+            self.container.content.height = self.flow_height
+            self._layout_flow_until(bottom)
+            self.container.content.height = height
+
+        max_scroll = max(self.scroll_height - visible_height, 0)
+        self.scroll_y = min(max(scroll_y, 0), max_scroll)
+        self.place_scrollbar()
+
+    def children_in(self, top, bottom):
+        # Flow children are laid out top to bottom, so the visible ones
+        # can be looked up on their offsets
+        first = max(bisect_right(self.flow_tops, top) - 1, 0)
+        last = bisect_right(self.flow_tops, bottom)
+        return self.floating + self.flow[first:last] + self.overlays
+
+    def translate(self, dy):
+        super().translate(dy)
+        self.flow_tops = [top + dy for top in self.flow_tops]
+        if self.scrollbar is not None:
+            self.scrollbar.translate(dy)
+
+    def update_bounds(self):
+        # Children in the flow got their bounds as they were laid out, and
+        # the clip keeps all of them inside this box
+        for child in self.floating + self.overlays:
+            child.update_bounds()
+        self.merge_bounds()
+
+    def place_scrollbar(self):
+        if self.scrollbar is None or self.viewport_height is None:
+            return
+        self.scrollbar.render_layout(self)
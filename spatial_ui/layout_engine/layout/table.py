@@ -4,7 +4,7 @@ from .block import BlockLayout
 
 
 class TableCellLayout(BaseLayout):
-    column_idx: int
+    column_idx: int = 0
 
     def render_layout(self, parent_layout):
         index = self.column_idx
@@ -55,6 +55,9 @@ class TableCellLayout(BaseLayout):
 
 
 class TableRowLayout(BlockLayout):
+    def is_layout_boundary(self):
+        return False
+
     def render_layout(self, parent_layout):
         self.container = parent_layout.container.copy()
 
@@ -95,7 +98,11 @@ class TableRowLayout(BlockLayout):
         self.container.content.y = parent_y + current_height
 
         max_height = 0
-        for child in self.children:
+        for index, child in enumerate(self.children):
+            # Cells can be inserted and removed, so their column follows
+            # from their position in the row
+            if isinstance(child, TableCellLayout):
+                child.column_idx = index
             child.render_layout(self)
             max_height = max(child.container.content.height, max_height)
         for child in self.children:
@@ -1,5 +1,6 @@
 import string
-from typing import Any, List
+from bisect import bisect_right
+from typing import Any, Dict, List, Optional
 
 from pydantic import BaseModel, Field
 from functools import lru_cache
@@ -37,18 +38,48 @@ class TextLine(BaseModel):
 
 class TextLayout(BaseLayout):
     text_blocks: List[TextLine] = Field(default_factory=list)
+    # Where every line starts, in the text and on the y axis
+    line_starts: List[int] = Field(default_factory=list)
+    line_tops: List[float] = Field(default_factory=list)
+    # Set by edits, lines before it are kept if nothing else changed
+    edited_from: Optional[int]
+    laid_out_in: Optional[Any]
+    x_offsets: Dict[int, float] = Field(default_factory=dict)
+
+    def edit(self, start, tail=None):
+        # Lines are only measured from the start of the edit on
+        if self.edited_from is None or start < self.edited_from:
+            self.edited_from = start
+
+    def append_lines(self, lines, dropped=0):
+        # Without line breaks kept, only the last line can take words back
+        if dropped or not self.line_starts:
+            self.edit(0)
+        else:
+            self.edit(self.line_starts[-1])
 
     def render_layout(
         self,
         parent_layout,
         *args, **kwargs
     ):
-        rendered_lines = []
-        self.text_blocks = []
-
         size = int(self.style.font_size.value)
         font = get_font(self.style.font_family, size)
         line_height = self.style.line_height.value
+        content_box = parent_layout.container.content_box
+        max_width = parent_layout.container.width
+
+        placement = (
+            content_box.left, content_box.top, content_box.width, max_width,
+            font, line_height, self.style.text_align,
+        )
+        first_line = 0
+        if self.edited_from is not None and placement == self.laid_out_in:
+            # The line before the edited one may take words back from it
+            first_line = max(bisect_right(self.line_starts, self.edited_from) - 2, 0)
+        self.edited_from = None
+        self.laid_out_in = placement
+        self.x_offsets = {}
 
         text = self.node.raw_content
 
@@ -57,20 +88,24 @@ class TextLayout(BaseLayout):
         estimated_chars_per_line = int(parent_layout.container.width // avg_size)
         estimated_chars_per_line = 100
         previous_idx = 0
-
-        max_width = parent_layout.container.width
-        y = parent_layout.container.content_box.top
-
-        line = text[previous_idx:estimated_chars_per_line]
+        y = content_box.top
+        if first_line:
+            previous_idx = self.line_starts[first_line]
+            y = self.line_tops[first_line]
+        del self.text_blocks[first_line:]
+        del self.line_starts[first_line:]
+        del self.line_tops[first_line:]
+
+        line = text[previous_idx:previous_idx + estimated_chars_per_line]
         while line:
-            x = parent_layout.container.content_box.left
+            x = content_box.left
             width, height, line = self._get_size(line, max_width, font)
             line_y = y
             if line_height:
                 line_y += line_height / 2 - height / 2
 
             if self.style.text_align == "center":
-                space = parent_layout.container.content_box.width - width
+                space = content_box.width - width
                 space /= 2
                 x += space
 
@@ -87,17 +122,46 @@ class TextLayout(BaseLayout):
                 box=line_rect,
             )
             self.text_blocks.append(text_line)
+            self.line_starts.append(previous_idx)
+            self.line_tops.append(y)
             previous_idx += len(line) + 1
             y += line_height or height
             line = text[previous_idx:previous_idx + estimated_chars_per_line]
 
-        self.container.content.height = y - parent_layout.container.content_box.top
+        self.container.content.height = y - content_box.top
         if len(self.text_blocks) == 1:
             self.container.content.width = self.text_blocks[0].box.width
         else:
             self.container.content.width = parent_layout.container.content.width
         self.container.content.top_left = parent_layout.container.content.top_left
 
+    def translate(self, dy):
+        super().translate(dy)
+        for text_line in self.text_blocks:
+            text_line.box.y += dy
+        self.line_tops = [top + dy for top in self.line_tops]
+        self.laid_out_in = None
+
+    def merge_bounds(self):
+        bounds = self.container.border_box
+        for text_line in self.text_blocks:
+            bounds = bounds.union(text_line.box)
+        self.bounds = bounds
+
+    def lines_in(self, top, bottom):
+        # The lines that can be seen between top and bottom
+        first = max(bisect_right(self.line_tops, top) - 1, 0)
+        last = bisect_right(self.line_tops, bottom)
+        return self.text_blocks[first:last]
+
+    def caret_offset(self, index):
+        # Where the caret goes for index, from the top left of the text
+        line = max(bisect_right(self.line_starts, index) - 1, 0)
+        y_offset = 0
+        if self.line_tops:
+            y_offset = self.line_tops[line] - self.container.content.y
+        return self._get_x_offset(index), y_offset
+
     def _get_size(self, line, max_width, font):
         line_size, height = get_text_dimensions(line, font)
         while line_size > max_width:
@@ -108,10 +172,17 @@ class TextLayout(BaseLayout):
         return line_size, height, line
 
     def _get_x_offset(self, index):
+        # Measured from the start of the line the index is on, and kept
+        # until the text is laid out again
+        if index in self.x_offsets:
+            return self.x_offsets[index]
         text = self.node.raw_content
         if not text:
             return 0
         size = int(self.style.font_size.value)
         font = get_font(self.style.font_family, size)
-        return font.getlength(text[:index])
-        # return get_text_dimensions(text[:index], font)[0]
+        line = max(bisect_right(self.line_starts, index) - 1, 0)
+        start = self.line_starts[line] if self.line_starts else 0
+        x_offset = font.getlength(text[start:index])
+        self.x_offsets[index] = x_offset
+        return x_offset
@@ -0,0 +1,358 @@
+from bisect import bisect_right
+from typing import Any, List, Optional
+
+import numpy as np
+from pydantic import Field
+
+from .text import TextLayout, TextLine, avg_font_size
+from ..models.primitives import Rect
+from ..models.style import BaseLayout
+from ..fonts import get_font
+
+
+def wrap(text, font, width):
+    """
+    Where the lines of a paragraph start and how wide they are. Lines
+    break after a space, a word is only cut when it does not fit alone.
+    """
+    starts = []
+    widths = []
+    start = 0
+    line_width = font.getlength(text)
+    while line_width > width and len(text) - start > 1:
+        # The longest part that fits, in log(n) measurements
+        low, high = start + 1, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if font.getlength(text[start:middle]) <= width:
+                low = middle
+            else:
+                high = middle - 1
+        space = text.rfind(" ", start, low + 1)
+        end = space + 1 if space >= start else low
+        if end == len(text):
+            # Only a trailing space does not fit, it is left hanging
+            break
+        starts.append(start)
+        widths.append(font.getlength(text[start:end]))
+        start = end
+        line_width = font.getlength(text[start:])
+    starts.append(start)
+    widths.append(line_width)
+    return tuple(starts), tuple(widths)
+
+
+class Paragraphs:
+    """
+    The lines of a text with preserved line breaks, kept per paragraph.
+
+    A paragraph is only wrapped once it is read, until then its number of
+    lines is estimated from its length. An edit only drops the paragraphs
+    it touched, the lines of all others are kept as they are. Where the
+    paragraphs start, in the text and in lines, is summed up again on
+    demand after a change.
+    """
+    def __init__(self, text, font, width, line_height):
+        self.font = font
+        self.width = width
+        self.line_height = line_height
+        self.ascent, self.descent = font.getmetrics()
+        self.char_width = avg_font_size(font)
+        self.texts = text.split("\n")
+        self.lines = [None] * len(self.texts)
+        self.lengths = self._lengths(self.texts)
+        self.counts = self._estimate(self.lengths)
+        self._starts = None
+        self._tops = None
+
+    def copy(self):
+        paragraphs = Paragraphs.__new__(Paragraphs)
+        paragraphs.__dict__.update(self.__dict__)
+        # Lines are replaced and never changed, the lists are enough
+        paragraphs.texts = list(self.texts)
+        paragraphs.lines = list(self.lines)
+        paragraphs.counts = self.counts.copy()
+        return paragraphs
+
+    @property
+    def starts(self):
+        if self._starts is None:
+            self._starts = np.zeros(len(self.lengths), dtype=np.int64)
+            np.cumsum(self.lengths[:-1] + 1, out=self._starts[1:])
+        return self._starts
+
+    @property
+    def tops(self):
+        # In lines, from the top of the text
+        if self._tops is None:
+            self._tops = np.zeros(len(self.counts), dtype=np.int64)
+            np.cumsum(self.counts[:-1], out=self._tops[1:])
+        return self._tops
+
+    @property
+    def length(self):
+        return int(self.starts[-1]) + len(self.texts[-1])
+
+    @property
+    def line_count(self):
+        return int(self.tops[-1] + self.counts[-1])
+
+    @property
+    def height(self):
+        return self.line_count * self.line_height
+
+    def edit(self, text, start, tail):
+        """
+        Splits the paragraphs between start and the last `tail` characters
+        of the text again, text being the whole of it after the edit. Only
+        the edited paragraphs are sliced out of it.
+        """
+        length = self.length
+        first = self.paragraph_at(start)
+        last = self.paragraph_at(length - tail)
+        end = int(self.starts[last]) + len(self.texts[last]) + len(text) - length
+        texts = text[int(self.starts[first]):end].split("\n")
+        lengths = self._lengths(texts)
+        self.texts[first:last + 1] = texts
+        self.lines[first:last + 1] = [None] * len(texts)
+        self.lengths = np.concatenate(
+            (self.lengths[:first], lengths, self.lengths[last + 1:])
+        )
+        self.counts = np.concatenate(
+            (self.counts[:first], self._estimate(lengths), self.counts[last + 1:])
+        )
+        self._starts = None
+        self._tops = None
+
+    def append(self, texts):
+        """
+        Adds paragraphs after the last one. The one of an empty text is
+        taken as none.
+        """
+        lengths = self._lengths(texts)
+        counts = self._estimate(lengths)
+        if len(self.texts) == 1 and not self.texts[0]:
+            self.texts, self.lines = [], []
+            self.lengths = self.lengths[:0]
+            self.counts = self.counts[:0]
+        self.texts.extend(texts)
+        self.lines.extend([None] * len(texts))
+        self.lengths = np.concatenate((self.lengths, lengths))
+        self.counts = np.concatenate((self.counts, counts))
+        self._starts = None
+        self._tops = None
+
+    def drop(self, count):
+        # The first paragraphs, once all of them are gone the text is empty
+        count = min(count, len(self.texts))
+        del self.texts[:count]
+        del self.lines[:count]
+        self.lengths = self.lengths[count:]
+        self.counts = self.counts[count:]
+        if not self.texts:
+            self.texts, self.lines = [""], [None]
+            self.lengths = self._lengths(self.texts)
+            self.counts = self._estimate(self.lengths)
+        self._starts = None
+        self._tops = None
+
+    def wrap_end(self, height):
+        # Wraps the last paragraphs until they fill height
+        filled = 0
+        paragraph = len(self.texts) - 1
+        while paragraph >= 0 and filled < height:
+            starts, _ = self.wrapped(paragraph)
+            filled += len(starts) * self.line_height
+            paragraph -= 1
+
+    def paragraph_at(self, index):
+        return max(int(np.searchsorted(self.starts, index, side="right")) - 1, 0)
+
+    def wrapped(self, paragraph):
+        lines = self.lines[paragraph]
+        if lines is None:
+            lines = wrap(self.texts[paragraph], self.font, self.width)
+            self.lines[paragraph] = lines
+            if len(lines[0]) != self.counts[paragraph]:
+                self.counts[paragraph] = len(lines[0])
+                self._tops = None
+        return lines
+
+    def lines_in(self, left, top, view_top, view_bottom):
+        text_lines = []
+        for line, _, text, width in self._lines_between(top, view_top, view_bottom):
+            y = top + line * self.line_height
+            text_lines.append(self._text_line(text, left, y, width))
+        return text_lines
+
+    def caret_offset(self, index):
+        index = min(max(index, 0), self.length)
+        paragraph = self.paragraph_at(index)
+        starts, _ = self.wrapped(paragraph)
+        column = index - int(self.starts[paragraph])
+        line = bisect_right(starts, column) - 1
+        text = self.texts[paragraph][starts[line]:column]
+        y = (int(self.tops[paragraph]) + line) * self.line_height
+        return self.font.getlength(text), y
+
+    def selection_rects(self, start, end, left, top, view_top, view_bottom):
+        rects = []
+        lines = self._lines_between(top, view_top, view_bottom)
+        for line, line_start, text, width in lines:
+            line_end = line_start + len(text)
+            if line_end <= start or line_start >= end:
+                continue
+            x = self.font.getlength(text[:max(start - line_start, 0)])
+            if end < line_end:
+                width = self.font.getlength(text[:end - line_start])
+            rects.append(Rect(
+                x=left + x,
+                y=top + line * self.line_height,
+                width=width - x,
+                height=self.line_height,
+            ))
+        return rects
+
+    def index_at(self, x, y):
+        line = min(max(int(y // self.line_height), 0), self.line_count - 1)
+        paragraph = max(int(np.searchsorted(self.tops, line, side="right")) - 1, 0)
+        starts, _ = self.wrapped(paragraph)
+        text = self.texts[paragraph]
+        line = min(line - int(self.tops[paragraph]), len(starts) - 1)
+        start = starts[line]
+        end = len(text)
+        if line + 1 < len(starts):
+            # The end of a wrapped line is the start of the next one
+            end = starts[line + 1] - 1
+        low, high = start, end
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.font.getlength(text[start:middle]) <= x:
+                low = middle
+            else:
+                high = middle - 1
+        # Rounds to the closest side of the character
+        if low < end:
+            before = self.font.getlength(text[start:low])
+            after = self.font.getlength(text[start:low + 1])
+            if x - before > after - x:
+                low += 1
+        return int(self.starts[paragraph]) + low
+
+    def _lines_between(self, top, view_top, view_bottom):
+        # Line number, start, text and width of the lines in view
+        first = max(int((view_top - top) // self.line_height), 0)
+        last = (view_bottom - top) / self.line_height
+        paragraph = max(int(np.searchsorted(self.tops, first, side="right")) - 1, 0)
+        line = int(self.tops[paragraph])
+        paragraph_starts = self.starts
+        while paragraph < len(self.texts) and line < last:
+            text = self.texts[paragraph]
+            starts, widths = self.wrapped(paragraph)
+            paragraph_start = int(paragraph_starts[paragraph])
+            ends = starts[1:] + (len(text),)
+            for start, end, width in zip(starts, ends, widths):
+                if first <= line < last:
+                    yield line, paragraph_start + start, text[start:end], width
+                line += 1
+            paragraph += 1
+
+    def _text_line(self, text, x, y, width):
+        # Lines are centered on the line height, the box ends on the baseline
+        y += (self.line_height - self.ascent - self.descent) / 2
+        box = Rect(x=x, y=y, width=width, height=self.ascent)
+        return TextLine.construct(text=text, font=self.font, box=box)
+
+    def _lengths(self, texts):
+        return np.fromiter(map(len, texts), dtype=np.int64, count=len(texts))
+
+    def _estimate(self, lengths):
+        # Lines of paragraphs that were not wrapped yet
+        if self.width <= 0:
+            return np.maximum(lengths, 1)
+        lines = np.ceil(lengths * (self.char_width / self.width))
+        return np.maximum(lines, 1).astype(np.int64)
+
+
+class TextAreaLayout(TextLayout):
+    """
+    Text with `white-space: pre-wrap`, like the text of a TextArea.
+
+    Instead of text blocks for every line, the lines are kept per
+    paragraph and placed when read, so only the lines that are painted
+    are wrapped and the layout of a long text is its height. An edit
+    only wraps the paragraphs it touched again, and of lines appended to
+    a log, only the new ones are measured.
+    """
+    paragraphs: Optional[Any]
+    edited_tail: Optional[int]
+    appended_lines: List[str] = Field(default_factory=list)
+    dropped_lines: int = 0
+
+    def edit(self, start, tail=None):
+        super().edit(start)
+        tail = tail or 0
+        if self.edited_tail is None or tail < self.edited_tail:
+            self.edited_tail = tail
+
+    def append_lines(self, lines, dropped=0):
+        self.appended_lines.extend(lines)
+        self.dropped_lines += dropped
+
+    def render_layout(self, parent_layout, *args, **kwargs):
+        size = int(self.style.font_size.value)
+        font = get_font(self.style.font_family, size)
+        line_height = self.style.line_height.value or sum(font.getmetrics())
+        content_box = parent_layout.container.content_box
+        content = self.node.raw_content
+
+        placement = (content_box.width, font, line_height)
+        rebuild = self.paragraphs is None or placement != self.laid_out_in
+        if self.edited_from is not None and (self.appended_lines or self.dropped_lines):
+            # The text the edit is counted in already has the new lines
+            rebuild = True
+        if rebuild:
+            text = content if isinstance(content, str) else content.text
+            self.paragraphs = Paragraphs(text, font, content_box.width, line_height)
+        elif self.edited_from is not None:
+            self.paragraphs.edit(content, self.edited_from, self.edited_tail)
+        elif self.appended_lines or self.dropped_lines:
+            self.paragraphs.drop(self.dropped_lines)
+            self.paragraphs.append(self.appended_lines)
+        if rebuild or self.appended_lines:
+            # A log is looked at from its end, the lines there are measured
+            # now so that its height is right
+            viewport_height = getattr(parent_layout, "viewport_height", None)
+            if viewport_height:
+                self.paragraphs.wrap_end(viewport_height)
+        self.edited_from = None
+        self.edited_tail = None
+        self.appended_lines = []
+        self.dropped_lines = 0
+        self.laid_out_in = placement
+
+        self.container.content.top_left = content_box.top_left
+        self.container.content.width = content_box.width
+        self.container.content.height = self.paragraphs.height
+
+    def translate(self, dy):
+        # Lines are placed from the content box when they are read
+        BaseLayout.translate(self, dy)
+
+    def lines_in(self, top, bottom):
+        content = self.container.content
+        return self.paragraphs.lines_in(content.x, content.y, top, bottom)
+
+    def caret_offset(self, index):
+        return self.paragraphs.caret_offset(index)
+
+    def selection_rects(self, start, end, top, bottom):
+        content = self.container.content
+        return self.paragraphs.selection_rects(
+            start, end, content.x, content.y, top, bottom
+        )
+
+    def index_at(self, x, y):
+        # x and y are offsets from the top left of the text, like the ones
+        # of the caret
+        return self.paragraphs.index_at(x, y)
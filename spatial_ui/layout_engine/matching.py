@@ -0,0 +1,232 @@
+from collections import defaultdict
+from heapq import merge
+
+from cssselect.parser import (
+    Attrib,
+    Class,
+    CombinedSelector,
+    Element,
+    Hash,
+    Negation,
+)
+
+ATTRIBUTE_OPERATORS = {
+    "exists": lambda value, expected: value is not None,
+    "=": lambda value, expected: value == expected,
+    "~=": lambda value, expected: expected in (value or "").split(),
+    "^=": lambda value, expected: (value or "").startswith(expected),
+    "$=": lambda value, expected: (value or "").endswith(expected),
+    "*=": lambda value, expected: expected in (value or ""),
+}
+
+
+def node_at(path, depth):
+    return path[depth][0]
+
+
+def compile_selector(selector):
+    """
+    Turns a parsed cssselect tree into a matcher working on a path of
+    (node, index in parent) tuples from the root down to the node.
+
+    Pseudo classes are ignored when matching, they select the state a
+    rule applies to, not the nodes it applies to. So are functional ones
+    like `:nth-child()` and anything else this does not know how to
+    match, the rest of the selector still has to.
+    """
+    if isinstance(selector, Element):
+        return _compile_element(selector)
+    if isinstance(selector, Hash):
+        return _compile_hash(selector)
+    if isinstance(selector, Class):
+        return _compile_class(selector)
+    if isinstance(selector, Attrib):
+        return _compile_attrib(selector)
+    if isinstance(selector, Negation):
+        return _compile_negation(selector)
+    if isinstance(selector, CombinedSelector):
+        return _compile_combined(selector)
+    if hasattr(selector, "selector"):
+        # Pseudo, Function and whatever else wraps a selector
+        return compile_selector(selector.selector)
+    raise NotImplementedError(f"{selector} is not supported")
+
+
+def _compile_element(selector):
+    name = selector.element
+    if name in (None, "*"):
+        return lambda path, depth: True
+
+    def match(path, depth):
+        return node_at(path, depth).node_element_name == name
+    return match
+
+
+def _compile_hash(selector):
+    inner = compile_selector(selector.selector)
+    node_id = selector.id
+
+    def match(path, depth):
+        return node_at(path, depth).node_id == node_id and inner(path, depth)
+    return match
+
+
+def _compile_class(selector):
+    inner = compile_selector(selector.selector)
+    class_name = selector.class_name
+
+    def match(path, depth):
+        node_class = node_at(path, depth).node_class or ""
+        return class_name in node_class.split() and inner(path, depth)
+    return match
+
+
+def _compile_attrib(selector):
+    inner = compile_selector(selector.selector)
+    operator = ATTRIBUTE_OPERATORS.get(selector.operator)
+    if operator is None:
+        # Like the pseudo classes, only the rest of the selector is matched
+        return inner
+    expected = selector.value.value if selector.value else None
+    attrib = selector.attrib
+
+    def match(path, depth):
+        value = node_at(path, depth).identifiers.get(attrib)
+        return operator(value, expected) and inner(path, depth)
+    return match
+
+
+def _compile_negation(selector):
+    inner = compile_selector(selector.selector)
+    negated = compile_selector(selector.subselector)
+
+    def match(path, depth):
+        return not negated(path, depth) and inner(path, depth)
+    return match
+
+
+def _compile_combined(selector):
+    left = compile_selector(selector.selector)
+    right = compile_selector(selector.subselector)
+    combinator = selector.combinator
+
+    if combinator == " ":
+        def match_left(path, depth):
+            return any(left(path, d) for d in range(depth - 1, -1, -1))
+    elif combinator == ">":
+        def match_left(path, depth):
+            return depth > 0 and left(path, depth - 1)
+    elif combinator in ("+", "~"):
+        adjacent = combinator == "+"
+
+        def match_left(path, depth):
+            if depth == 0:
+                return False
+            siblings = node_at(path, depth - 1).children
+            index = path[depth][1]
+            ancestors = path[:depth]
+            candidates = range(index - 1, -1, -1)
+            if adjacent:
+                candidates = candidates[:1]
+            for sibling_index in candidates:
+                sibling = (siblings[sibling_index], sibling_index)
+                if left(ancestors + [sibling], depth):
+                    return True
+            return False
+    else:
+        raise NotImplementedError(f"{selector} is not supported")
+
+    def match(path, depth):
+        return right(path, depth) and match_left(path, depth)
+    return match
+
+
+def _bucket_key(selector):
+    # Rules are bucketed on the most selective part of their rightmost
+    # compound selector, so a node only tries the rules that can match it
+    if isinstance(selector, CombinedSelector):
+        selector = selector.subselector
+    element = None
+    while selector is not None:
+        if isinstance(selector, Hash):
+            return "id", selector.id
+        if isinstance(selector, Class):
+            return "class", selector.class_name
+        if isinstance(selector, Element):
+            element = selector.element
+        selector = getattr(selector, "selector", None)
+    if element in (None, "*"):
+        return None
+    return "element", element
+
+
+def _has_sibling_combinator(selector):
+    while selector is not None:
+        if isinstance(selector, CombinedSelector) and selector.combinator in ("+", "~"):
+            return True
+        selector = getattr(selector, "selector", None)
+    return False
+
+
+class RuleMatcher:
+    """
+    Matches compiled rules directly against a Node tree.
+
+    Every bucket is kept in cascade order, so merging the buckets a node
+    falls in yields its matched rules already sorted on specificity.
+    """
+    def __init__(self, rules):
+        self.buckets = defaultdict(list)
+        # Without sibling combinators, the rules a node matches do not
+        # depend on its position among its siblings
+        self.has_sibling_rules = False
+        for index, rule in enumerate(rules):
+            tree = rule.parsed_selector.parsed_tree
+            matcher = compile_selector(tree)
+            self.buckets[_bucket_key(tree)].append((index, rule, matcher))
+            if _has_sibling_combinator(tree):
+                self.has_sibling_rules = True
+
+    def candidates_for(self, node):
+        keys = [None, ("element", node.node_element_name)]
+        if node.node_id:
+            keys.append(("id", node.node_id))
+        if node.node_class:
+            for class_name in node.node_class.split():
+                keys.append(("class", class_name))
+        buckets = [
+            self.buckets[key] for key in dict.fromkeys(keys)
+            if key in self.buckets
+        ]
+        if len(buckets) == 1:
+            return buckets[0]
+        return merge(*buckets)
+
+    def match_node(self, path):
+        depth = len(path) - 1
+        node = node_at(path, depth)
+        return [
+            rule for _, rule, matcher in self.candidates_for(node)
+            if matcher(path, depth)
+        ]
+
+    def match(self, root):
+        return self.match_subtree(root, [(root, 0)])
+
+    def match_subtree(self, node, path):
+        """
+        Matches node and its descendants, path runs from the root down to
+        and including node.
+        """
+        rules_by_node = {}
+        self._match(node, path, rules_by_node)
+        return rules_by_node
+
+    def _match(self, node, path, rules_by_node):
+        rules = self.match_node(path)
+        if rules:
+            rules_by_node[node] = rules
+        for index, child in enumerate(node.children):
+            path.append((child, index))
+            self._match(child, path, rules_by_node)
+            path.pop()
@@ -31,6 +31,14 @@ class Node(BaseModel):
     def add_all(self, *nodes: "Node") -> None:
         self.children.extend(nodes)
 
+    def insert(self, index: int, node: "Node") -> None:
+        self.children.insert(index, node)
+
+    def walk(self):
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
     @property
     def identifiers(self):
         base_identity =  {
@@ -38,4 +46,5 @@ class Node(BaseModel):
         }
         if self.node_id:
             base_identity['id'] = self.node_id
+        return base_identity
 
@@ -165,6 +165,22 @@ class Rect(TopLeftPositionHelperMixin):
             height=self.height,
         )
 
+    def union(self, other: "Rect") -> "Rect":
+        left = min(self.left, other.left)
+        top = min(self.top, other.top)
+        return Rect(
+            x=left,
+            y=top,
+            width=max(self.right, other.right) - left,
+            height=max(self.bottom, other.bottom) - top,
+        )
+
+    def intersects(self, left, top, right, bottom) -> bool:
+        return (
+            self.left <= right and self.right >= left
+            and self.top <= bottom and self.bottom >= top
+        )
+
     def expand_by_size(self, size: Vector4) -> "Rect":
         return Rect(
             x=self.x - size.z,
@@ -1,12 +1,11 @@
-from typing import List, Dict, Union, Optional, Any
+from typing import List, Dict, FrozenSet, Union, Optional, Any
 from collections import defaultdict
 
 from pydantic import Field, validator
 
 from .node import Node
 from .primitives import Rect, Vector4
-from ..helpers import sort_rules_by_specificity
-from ..properties import clean_value_for, default_value_for, INHERIT
+from ..properties import default_value_for, INHERIT
 from .base import BaseModel
 from ..helpers import Dimension
 from ..signals import (
@@ -18,14 +17,18 @@ from ..signals import (
 
 # make the getattr play nice with blinker
 EXCLUDE_ATTRS = ("im_func", "__func__")
+NO_VALUES = {}
 
 
 def exit_animation(style):
     if style.animation_fill_mode != 'forwards':
-        style.values["animating"] = {}
+        style.animated = {}
     style.animating = False
 
 
+ANIMATION_ENDED.connect(exit_animation)
+
+
 class BoxModel(BaseModel):
     content: Rect = Field(default_factory=Rect)
     padding: Vector4 = Field(default_factory=Vector4)
@@ -83,24 +86,33 @@ class BoxModel(BaseModel):
 
 class Style(BaseModel):
     values: Dict = Field(default_factory=lambda: defaultdict(dict))
+    animated: Dict = Field(default_factory=dict)
     state: str = "default"
+    # The pseudo classes of the rules the values come from
+    states: FrozenSet[str] = frozenset()
     animating: bool = False
+    shared: bool = False
     inherits: Optional["Style"]
 
     def __getattr__(self, key):
         if key in EXCLUDE_ATTRS:
             return super().__getattr__(key)
         key = key.replace("_", "-")
-        if key in self.values["animating"]:
-            return self.values["animating"][key]
-        if key in self.values[self.state]:
-            return self.values[self.state][key]
-        if key in self.values["default"]:
-            return self.values["default"][key]
+        if key in self.animated:
+            return self.animated[key]
+        values = self.values.get(self.state, NO_VALUES)
+        if key in values:
+            return values[key]
+        values = self.values.get("default", NO_VALUES)
+        if key in values:
+            return values[key]
         if self.inherits and key in INHERIT:
             return getattr(self.inherits, key)
         return default_value_for(key)[key]
 
+    def declares(self, state):
+        return state == "default" or state in self.states
+
     def set_state(self, state):
         if self.state == state:
             return
@@ -116,7 +128,7 @@ class Style(BaseModel):
         # somewhere else
         if self.animation_name != previous_animation:
             STOP_ANIMATION.send(self)
-            self.values["animating"] = {}
+            self.animated = {}
             if self.animation_name != 'none':
                 BIND_ANIMATION.send(self)
                 self.animating = True
@@ -130,29 +142,72 @@ class Style(BaseModel):
         if isinstance(val, Dimension):
             value = Dimension(value, val.unit)
         if self.animating:
-            self.values["animating"][key] = value
+            self.animated[key] = value
         else:
-            self.values[self.state][key] = value
+            self._own_values()
+            # A state without values of its own shows the default ones
+            state = self.state if self.state in self.values else "default"
+            self.values.setdefault(state, {})[key] = value
         STYLE_CHANGED.send(self)
 
+    def set_animated(self, values):
+        # Animated values of a frame, with a single change signal for all
+        # of them
+        if not self.animating:
+            for key, value in values.items():
+                self.set(key, value)
+            return
+        for key, value in values.items():
+            key = key.replace("_", "-")
+            current = getattr(self, key)
+            if isinstance(current, Dimension):
+                value = Dimension(value, current.unit)
+            self.animated[key] = value
+        STYLE_CHANGED.send(self)
+
+    def set_painted(self, key, value):
+        # Animated values that are only painted skip the declared values
+        # and the change signal, the painter reads them every frame
+        if not self.animating:
+            self.set(key, value)
+            return
+        self.animated[key.replace("_", "-")] = value
+
+    def _own_values(self):
+        # Copy on write, shared values belong to every node that matched
+        # the same rules
+        if not self.shared:
+            return
+        values = defaultdict(dict)
+        for pseudo_class, declared in self.values.items():
+            values[pseudo_class] = dict(declared)
+        self.values = values
+        self.shared = False
+
     @classmethod
     def from_rules(cls, rules):
+        # Rules come in cascade order, the compiled stylesheet is sorted
+        # on specificity once when it is loaded
         style = Style()
-        pseudo_rules = []
-        for rule in sort_rules_by_specificity(rules):
-            append_to = "default"
-            if ":" in rule.selector.as_css():
-                append_to = rule.selector.as_css().split(":")[1]
-
-            for declaration in rule.declarations:
-                values = [v for v in declaration.value if not v.type == "S"]
-                style.values[append_to].update(
-                    clean_value_for(declaration.name, *values)
-                )
-        # optimise this to only connect if there are animations
-        ANIMATION_ENDED.connect(exit_animation)
+        for rule in rules:
+            style.values[rule.pseudo_class].update(rule.values)
+        style.states = frozenset(rule.pseudo_class for rule in rules)
         return style
 
+    @classmethod
+    def shared_from_rules(cls, rules, cache):
+        """
+        Nodes matching the same rules share their declared values, only
+        the per node state (pseudo class, animation, parent) is their own.
+        """
+        key = tuple(rule.order for rule in rules)
+        if key not in cache:
+            style = cls.from_rules(rules)
+            cache[key] = (style.values, style.states)
+        values, states = cache[key]
+        # Skip validation, it would copy the shared values
+        return cls.construct(values=values, states=states, shared=True)
+
     def inherit_from(self, style):
         self.inherits = style
         # for pseudo_class, values in style.values.items():
@@ -194,6 +249,7 @@ class BaseLayout(BaseModel):
     children: List["BaseLayout"] = Field(default_factory=list)
     container: BoxModel = Field(default_factory=BoxModel)
     parent: Optional[Any]
+    bounds: Optional[Any]
 
     def __iter__(self):
         return iter(self.children)
@@ -201,15 +257,47 @@ class BaseLayout(BaseModel):
     def needs_clip(self):
         return self.style.overflow in ["hidden", "clip", "scroll", "auto"]
 
+    def is_layout_boundary(self):
+        return False
+
+    def translate(self, dy):
+        # Moves the laid out subtree down by dy
+        self.container.content.y += dy
+        if self.bounds is not None:
+            self.bounds.y += dy
+        for child in self.children:
+            child.translate(dy)
+
+    def reset_containers(self):
+        self.container.reset()
+        for child in self.children:
+            child.reset_containers()
+
     def is_scrollable(self):
-        if self.style.overflow not in ["scroll", "auto"]:
-            return False
-        if not self.is_hovering(include_children=True):
-            return False
-        container_bottom = self.container.content.bottom
-        child_bottom = self.children[-1].container.content.bottom
-        print(container_bottom < child_bottom)
-        return container_bottom < child_bottom
+        return False
+
+    @property
+    def scroll_offset(self):
+        return 0
+
+    def children_in(self, top, bottom):
+        # The children that may overlap the band between top and bottom
+        return self.children
+
+    def update_bounds(self):
+        for child in self.children:
+            child.update_bounds()
+        self.merge_bounds()
+
+    def merge_bounds(self):
+        # The area painted by this layout and its subtree, anything a clip
+        # cuts off does not count
+        bounds = self.container.border_box
+        if not self.needs_clip():
+            for child in self.children:
+                if child.bounds is not None:
+                    bounds = bounds.union(child.bounds)
+        self.bounds = bounds
 
     def is_hovering(self, include_children=False):
         is_hovering = [self.style.state == "hover"]
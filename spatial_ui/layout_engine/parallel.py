@@ -0,0 +1,266 @@
+"""
+Rule matching of large node trees in a pool of processes.
+
+The tree is cut into subtrees of about the same size. Every task ships a
+compact copy of its subtrees, together with the ancestors (and, when the
+rules use sibling combinators, the siblings of those ancestors) that
+selectors can look at. Workers answer with the indices of the rules each
+node matched, the nodes above the cut are matched in the calling process.
+"""
+import heapq
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from .matching import RuleMatcher
+
+# Tasks handed out per worker, so a slow task does not hold up the pool
+TASKS_PER_WORKER = 4
+
+# Below this many nodes, shipping the tree costs more than matching it
+MIN_PARALLEL_NODES = 20_000
+
+# Flags of a serialized node
+CONTEXT = 0
+MATCH = 1
+
+_worker_matcher = None
+_worker_rule_indices = None
+
+
+class CompactNode:
+    """
+    The part of a Node that selectors look at.
+    """
+    __slots__ = ("node_element_name", "node_id", "node_class", "children")
+
+    def __init__(self, node_element_name, node_id, node_class):
+        self.node_element_name = node_element_name
+        self.node_id = node_id
+        self.node_class = node_class
+        self.children = []
+
+    @property
+    def identifiers(self):
+        base_identity = {
+            'class': self.node_class
+        }
+        if self.node_id:
+            base_identity['id'] = self.node_id
+        return base_identity
+
+
+class MatchPool:
+    """
+    The processes matching the rules of a layout, kept for as long as it.
+
+    Workers are started in a fresh process rather than forked from one
+    that may be running other threads, and keep the rules they were
+    started with, so new rules start new workers. Trees smaller than
+    `min_nodes` are matched in the calling process.
+    """
+    def __init__(self, workers, min_nodes=MIN_PARALLEL_NODES):
+        self.workers = workers
+        self.min_nodes = min_nodes
+        self._executor = None
+        self._rules = None
+
+    def match(self, matcher, rules, root, node_count):
+        if node_count < self.min_nodes:
+            return matcher.match(root)
+        return match_in_parallel(
+            matcher, rules, root, self.workers, self._executor_for(rules)
+        )
+
+    def _executor_for(self, rules):
+        if self._executor is not None and rules is not self._rules:
+            self.shutdown()
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=_start_context(),
+                initializer=_init_worker,
+                initargs=(rules,),
+            )
+            self._rules = rules
+        return self._executor
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+            self._rules = None
+
+
+def _start_context():
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+def match_in_parallel(matcher, rules, root, workers, executor=None):
+    """
+    Returns the same rules by node as `matcher.match(root)`, matching the
+    bulk of the tree in `workers` processes. Without an executor started
+    with the rules, one is started for this match only.
+    """
+    task_count = workers * TASKS_PER_WORKER
+    partitions, above = partition(root, task_count)
+    tasks = pack(partitions, task_count)
+
+    rules_by_node = {}
+    for node, path in above:
+        matched = matcher.match_node(path)
+        if matched:
+            rules_by_node[node] = matched
+
+    serialized = [
+        serialize(root, task, matcher.has_sibling_rules) for task in tasks
+    ]
+    if executor is None:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=_start_context(),
+            initializer=_init_worker,
+            initargs=(rules,),
+        ) as executor:
+            _collect(executor, serialized, rules, rules_by_node)
+    else:
+        _collect(executor, serialized, rules, rules_by_node)
+    return rules_by_node
+
+
+def _collect(executor, serialized, rules, rules_by_node):
+    results = executor.map(_match_task, [records for records, _ in serialized])
+    for (_, nodes), matches in zip(serialized, results):
+        for position, rule_indices in matches:
+            rules_by_node[nodes[position]] = [rules[i] for i in rule_indices]
+
+
+def partition(root, count):
+    """
+    Splits the largest subtree into its children until there are `count`
+    subtrees or none is larger than its share. Returns the paths to the
+    subtrees with their sizes, and the nodes that were split with their
+    paths.
+    """
+    sizes = {}
+    _subtree_sizes(root, sizes)
+    share = sizes[root] / count
+
+    # The counter keeps the heap from comparing paths of equal sizes
+    heap = [(-sizes[root], 0, [(root, 0)])]
+    counter = 1
+    above = []
+    while heap and len(heap) < count:
+        size, _, path = heap[0]
+        node = path[-1][0]
+        if -size <= share or not node.children:
+            break
+        heapq.heappop(heap)
+        above.append((node, path))
+        for index, child in enumerate(node.children):
+            heapq.heappush(heap, (-sizes[child], counter, path + [(child, index)]))
+            counter += 1
+    return [(-size, path) for size, _, path in heap], above
+
+
+def _subtree_sizes(node, sizes):
+    size = 1
+    for child in node.children:
+        size += _subtree_sizes(child, sizes)
+    sizes[node] = size
+    return size
+
+
+def pack(partitions, count):
+    # Largest first onto the smallest task keeps the tasks about even
+    partitions = sorted(partitions, key=lambda partition: -partition[0])
+    tasks = [(0, index, []) for index in range(min(count, len(partitions)))]
+    for size, path in partitions:
+        total, index, task = heapq.heappop(tasks)
+        task.append(path)
+        heapq.heappush(tasks, (total + size, index, task))
+    return [task for _, _, task in sorted(tasks, key=lambda task: task[1])]
+
+
+def serialize(root, paths, with_siblings):
+    """
+    Flattens the pruned tree holding the subtrees at `paths` into preorder
+    records of (name, id, class, child count, flag). Returns the records
+    and the nodes they stand for.
+    """
+    matched = {id(path[-1][0]) for path in paths}
+    ancestors = {id(node) for path in paths for node, _ in path[:-1]}
+    records = []
+    nodes = []
+
+    def add(node, flag):
+        if flag == MATCH:
+            children = node.children
+        elif id(node) in ancestors:
+            children = [
+                child for child in node.children
+                if with_siblings or id(child) in ancestors or id(child) in matched
+            ]
+        else:
+            children = []
+        records.append((
+            node.node_element_name,
+            node.node_id,
+            node.node_class,
+            len(children),
+            flag,
+        ))
+        nodes.append(node)
+        for child in children:
+            add(child, MATCH if flag == MATCH or id(child) in matched else CONTEXT)
+
+    add(root, MATCH if id(root) in matched else CONTEXT)
+    return records, nodes
+
+
+def deserialize(records):
+    """
+    Rebuilds the pruned tree, returns it with the record position of every
+    node.
+    """
+    position = 0
+
+    def build():
+        nonlocal position
+        name, node_id, node_class, child_count, flag = records[position]
+        node = CompactNode(name, node_id, node_class)
+        positions[node] = position
+        position += 1
+        for _ in range(child_count):
+            node.children.append(build())
+        return node
+
+    positions = {}
+    return build(), positions
+
+
+def _init_worker(rules):
+    global _worker_matcher, _worker_rule_indices
+    _worker_matcher = RuleMatcher(rules)
+    _worker_rule_indices = {id(rule): index for index, rule in enumerate(rules)}
+
+
+def _match_task(records):
+    root, positions = deserialize(records)
+    matches = []
+    _match_records(root, [(root, 0)], records, positions, matches)
+    return matches
+
+
+def _match_records(node, path, records, positions, matches):
+    position = positions[node]
+    if records[position][4] == MATCH:
+        for matched_node, rules in _worker_matcher.match_subtree(node, path).items():
+            rule_indices = tuple(_worker_rule_indices[id(rule)] for rule in rules)
+            matches.append((positions[matched_node], rule_indices))
+        return
+    for index, child in enumerate(node.children):
+        path.append((child, index))
+        _match_records(child, path, records, positions, matches)
+        path.pop()
@@ -1,9 +1,14 @@
+import numpy as np
 import tinycss2
-import tinycss
-from arcade_curtains import animation
 
-from ..models.style import Style
 from ..helpers import Dimension
+from ..properties import clean_declarations, PAINT_ONLY
+from ..signals import ANIMATION_ENDED
+
+KEYFRAME_KEYWORDS = {
+    "from": 0,
+    "to": 1,
+}
 
 
 def is_keyframe(rule):
@@ -14,91 +19,296 @@ def get_identity(at_rule):
     return [t.serialize() for t in at_rule.prelude if t.type == "ident"][0]
 
 
-def clean(content):
-    return [c for c in content if c.type != "whitespace"]
+def keyframe_offsets(prelude):
+    offsets = []
+    for token in prelude:
+        if token.type == "percentage":
+            offsets.append(token.value / 100)
+        elif token.type == "ident" and token.lower_value in KEYFRAME_KEYWORDS:
+            offsets.append(KEYFRAME_KEYWORDS[token.lower_value])
+    return offsets
 
 
-def load_animations(sheet=None, sheet_file=None):
-    if sheet_file:
-        with open(sheet_file) as fh:
-            sheet = fh.read()
-    sheet = tinycss2.parse_stylesheet(
-        sheet,
+def parse_animation(at_rule):
+    sequence = UnboundSequence()
+    keyframe_rules = tinycss2.parse_rule_list(
+        at_rule.content,
         skip_comments=True,
         skip_whitespace=True
     )
-
-    animations = {}
-    at_rules = [r for r in sheet if is_keyframe(r)]
-    for at_rule in at_rules:
-        animations[get_identity(at_rule)] = parse_animation(at_rule)
-    return animations
-
-
-def parse_animation(at_rule):
-    parser = tinycss.make_parser()
-    elements = clean(at_rule.content)
-    keyframes = {}
-    sequence = UnboundSequence()
-    for point_in_time, definition in zip(elements[::2], elements[1::2]):
-        res = parser.parse_stylesheet(f"stub {definition.serialize()}")
-        values = Style.from_rules(res.rules).values["default"]
-        sequence.add_keyframe(
-            point_in_time=point_in_time.value / 100,
-            keyframe=KeyFrame(values)
-        )
+    for rule in keyframe_rules:
+        if rule.type != "qualified-rule":
+            continue
+        values = clean_declarations(rule.content)
+        for point_in_time in keyframe_offsets(rule.prelude):
+            sequence.add_keyframe(
+                point_in_time=point_in_time,
+                keyframe=KeyFrame(values)
+            )
+    sequence.compile()
     return sequence
 
 
-class Sprite:
-    def __init__(self, style):
-        object.__setattr__(self, "style", style)
-
-    def __setattr__(self, key, value):
-        if isinstance(value, float):
-            value = int(value)
-        self.style.set(key, int(value))
-
-
 class UnboundSequence:
+    """
+    The keyframes of a @keyframes rule. `compile` lays them out once as
+    arrays indexed by attribute: a row per attribute holding the offsets
+    (0 to 1) and values of the keyframes that declare it. Rows are padded
+    by repeating their last keyframe, which is never interpolated past.
+    """
     def __init__(self):
         self.keyframes = {}
+        self.compile()
 
     def add_keyframe(self, point_in_time, keyframe):
         self.keyframes[point_in_time] = keyframe
 
+    def compile(self):
+        tracks = {}
+        for point_in_time in sorted(self.keyframes):
+            keyframe = self.keyframes[point_in_time]
+            for key in keyframe.values:
+                value = getattr(keyframe, key)
+                # Only numbers can be interpolated
+                if isinstance(value, (int, float)):
+                    offsets, values = tracks.setdefault(key, ([], []))
+                    offsets.append(point_in_time)
+                    values.append(value)
+
+        # A track needs a segment, a single keyframe holds its value
+        width = max([len(offsets) for offsets, _ in tracks.values()] + [2])
+        self.attributes = tuple(tracks)
+        self.offsets = np.zeros((len(tracks), width))
+        self.values = np.zeros((len(tracks), width))
+        self.last_segment = np.zeros(len(tracks), dtype=int)
+        for row, (offsets, values) in enumerate(tracks.values()):
+            self.offsets[row, :len(offsets)] = offsets
+            self.offsets[row, len(offsets):] = offsets[-1]
+            self.values[row, :len(values)] = values
+            self.values[row, len(values):] = values[-1]
+            self.last_segment[row] = max(len(offsets) - 2, 0)
+        self.end = max(self.keyframes, default=0)
+
     def bind(self, style):
-        return BoundSequence(style, self.keyframes)
+        return BoundSequence(style, self)
 
 
 class BoundSequence:
-    def __init__(self, style, keyframes):
-        self.sprite = Sprite(style)
-        self.sequence = animation.Sequence(
-            loop=style.animation_iteration_count == "infinite"
-        )
-        duration  = style.animation_duration.value
-        for pit, keyframe in keyframes.items():
-            self.sequence.add_keyframe(
-                point_in_time=pit * duration,
-                keyframe=keyframe
+    def __init__(self, style, sequence):
+        self.style = style
+        self.sequence = sequence
+        self.loop = style.animation_iteration_count == "infinite"
+        self.duration = style.animation_duration.value
+        self.total_time = sequence.end * self.duration
+
+
+class AnimationEngine:
+    """
+    Runs all active animations together. The compiled keyframes of every
+    animation are stacked into one block of rows, so a frame interpolates
+    all of them in one NumPy pass. The block and the buffers a frame works
+    in are only rebuilt when animations start or stop. Values are
+    truncated to int, and only the ones that changed are written back.
+    """
+    def __init__(self):
+        self.animations = []
+        self.elapsed = np.zeros(0)
+        self.total_time = np.zeros(0)
+        self.loop = np.zeros(0, dtype=bool)
+        self._tracks_changed = False
+        self._build_tracks()
+
+    def fire(self, animation):
+        self.animations.append(animation)
+        self._tracks_changed = True
+
+    def kill(self, style):
+        indices = [
+            index for index, animation in enumerate(self.animations)
+            if animation.style is style
+        ]
+        self._remove(indices)
+
+    def _remove(self, indices):
+        if not indices:
+            return
+        removed = set(indices)
+        self._sync_elapsed()
+        self.elapsed = np.delete(self.elapsed, indices)
+        self.animations = [
+            animation for index, animation in enumerate(self.animations)
+            if index not in removed
+        ]
+        self._tracks_changed = True
+
+    def _sync_elapsed(self):
+        # Animations fired since the last build have not started yet
+        started = len(self.elapsed)
+        if started < len(self.animations):
+            self.elapsed = np.append(
+                self.elapsed, np.zeros(len(self.animations) - started)
             )
 
+    def _build_tracks(self):
+        self._sync_elapsed()
+        sequences = [animation.sequence for animation in self.animations]
+        row_count = sum(len(sequence.attributes) for sequence in sequences)
+        width = max([sequence.offsets.shape[1] for sequence in sequences] + [2])
+
+        self.total_time = np.array([a.total_time for a in self.animations], dtype=float)
+        self.loop = np.array([a.loop for a in self.animations], dtype=bool)
+        self.times = np.zeros((row_count, width))
+        self.values = np.zeros((row_count, width))
+        self.track_animation = np.zeros(row_count, dtype=int)
+        self.last_segment = np.zeros(row_count, dtype=int)
+        self.targets = []
+        row = 0
+        for index, animation in enumerate(self.animations):
+            sequence = animation.sequence
+            rows = slice(row, row + len(sequence.attributes))
+            columns = sequence.offsets.shape[1]
+            np.multiply(sequence.offsets, animation.duration, out=self.times[rows, :columns])
+            self.times[rows, columns:] = self.times[rows, columns - 1:columns]
+            self.values[rows, :columns] = sequence.values
+            self.values[rows, columns:] = self.values[rows, columns - 1:columns]
+            self.track_animation[rows] = index
+            self.last_segment[rows] = sequence.last_segment
+            self.targets.extend((animation.style, key) for key in sequence.attributes)
+            row = rows.stop
+
+        # Buffers a frame is computed in, so ticking allocates nothing
+        self._row_start = np.arange(row_count) * width
+        self._flat_times = self.times.ravel()
+        self._flat_values = self.values.ravel()
+        self._animation_time = np.zeros(len(self.animations))
+        self._finished = np.zeros(len(self.animations), dtype=bool)
+        self._time = np.zeros(row_count)
+        self._reached = np.zeros((row_count, width), dtype=bool)
+        self._segment = np.zeros(row_count, dtype=int)
+        self._index = np.zeros(row_count, dtype=int)
+        self._start = np.zeros(row_count)
+        self._span = np.zeros(row_count)
+        self._progress = np.zeros(row_count)
+        self._first = np.zeros(row_count)
+        self._step = np.zeros(row_count)
+        self._has_span = np.zeros(row_count, dtype=bool)
+        self._changed = np.zeros(row_count, dtype=bool)
+        self._next = np.zeros(row_count)
+        self.current = np.full(row_count, np.nan)
+        self._paint_only = np.array(
+            [key in PAINT_ONLY for _, key in self.targets], dtype=bool
+        )
+        self._tracks_changed = False
+
+    def tick(self, delta):
+        if not self.animations:
+            return
+        if self._tracks_changed:
+            self._build_tracks()
+
+        self.elapsed += delta
+        self._sample(0)
+        np.not_equal(self._next, self.current, out=self._changed)
+        self.current, self._next = self._next, self.current
+        if self._changed.any():
+            self._write(np.flatnonzero(self._changed))
+        self._advance()
+
+    def interpolate(self, lead):
+        """
+        Paints the values lead seconds past the last tick, for frames that
+        fall between two fixed steps. Only paint only values are written,
+        the next tick writes the ones of its step again.
+        """
+        if not self.animations or lead <= 0:
+            return
+        if self._tracks_changed:
+            self._build_tracks()
+
+        self._sample(lead)
+        np.not_equal(self._next, self.current, out=self._changed)
+        self._changed &= self._paint_only
+        if not self._changed.any():
+            return
+        rows = np.flatnonzero(self._changed)
+        for row in rows:
+            style, key = self.targets[row]
+            style.set_painted(key, int(self._next[row]))
+        self.current[rows] = np.nan
+
+    def _sample(self, lead):
+        # The values of every row lead seconds past elapsed, into _next
+        np.add(self.elapsed, lead, out=self._animation_time)
+        np.minimum(self._animation_time, self.total_time, out=self._animation_time)
+        np.take(self._animation_time, self.track_animation, out=self._time)
+
+        # The segment is the last keyframe reached, it never runs past the
+        # last pair of keyframes of a row
+        np.less_equal(self.times, self._time[:, None], out=self._reached)
+        np.sum(self._reached, axis=1, out=self._segment)
+        self._segment -= 1
+        np.clip(self._segment, 0, self.last_segment, out=self._segment)
+
+        np.add(self._row_start, self._segment, out=self._index)
+        np.take(self._flat_times, self._index, out=self._start)
+        np.take(self._flat_values, self._index, out=self._first)
+        self._index += 1
+        np.take(self._flat_times, self._index, out=self._span)
+        np.take(self._flat_values, self._index, out=self._step)
+        self._span -= self._start
+        self._step -= self._first
+
+        # A segment without length is a keyframe holding its value
+        np.subtract(self._time, self._start, out=self._progress)
+        np.greater(self._span, 0, out=self._has_span)
+        np.divide(self._progress, self._span, out=self._progress, where=self._has_span)
+        np.clip(self._progress, 0, 1, out=self._progress)
+
+        np.multiply(self._step, self._progress, out=self._next)
+        self._next += self._first
+        np.trunc(self._next, out=self._next)
+
+    def _write(self, changed):
+        # One change signal per style, and none for paint only properties
+        layout_values = {}
+        for row in changed:
+            style, key = self.targets[row]
+            value = int(self.current[row])
+            if key in PAINT_ONLY:
+                style.set_painted(key, value)
+            else:
+                # Styles are not hashable
+                layout_values.setdefault(id(style), (style, {}))[1][key] = value
+        for style, values in layout_values.values():
+            style.set_animated(values)
+
+    def _advance(self):
+        np.greater_equal(self.elapsed, self.total_time, out=self._finished)
+        if not self._finished.any():
+            return
+        # The time past the end carries over into the next iteration
+        looped = self._finished & self.loop
+        self.elapsed[looped & (self.total_time <= 0)] = 0
+        looped &= self.total_time > 0
+        self.elapsed[looped] %= self.total_time[looped]
+        ended = np.flatnonzero(self._finished & ~self.loop).tolist()
+        styles = [self.animations[index].style for index in ended]
+        self._remove(ended)
+        for style in styles:
+            ANIMATION_ENDED.send(style)
+
 
 class KeyFrame:
     def __init__(self, values):
         self.values = values
 
     def __getattr__(self, key):
-        if key in self.values:
-            value = self.values[key]
+        # Look values up through __dict__, so unpickling (which probes for
+        # __setstate__ before `values` is restored) does not recurse
+        values = self.__dict__.get("values", {})
+        if key in values:
+            value = values[key]
             if isinstance(value, Dimension):
                 value = value.value
             return value
         super().__getattr__(key)
-
-    def to_list(self):
-        # Hack to have this keyframe work with sequence
-        attrs = list(self.values.keys())
-        animation.TRACKED_ATTRIBUTES = attrs
-        return [getattr(self, attr) for attr in attrs]
@@ -0,0 +1,163 @@
+import copyreg
+import os
+import os.path as osp
+import pickle
+from collections import OrderedDict
+from hashlib import sha1
+
+import tinycss2
+import cssselect
+from cssselect.parser import Token
+
+from .animation import is_keyframe, get_identity, parse_animation
+from ..helpers import sort_rules_by_specificity
+from ..properties import clean_declarations
+
+# Bump whenever the compiled representation changes, so artifacts pickled
+# by an older version are never picked up from the disk cache
+COMPILED_FORMAT_VERSION = 6
+# Pseudo classes that are a state of the node rather than a test on it
+PSEUDO_STATES = ("hover", "active", "focus")
+
+# Compiled sheets by digest, the least recently loaded are dropped so a
+# sheet that is edited and reloaded does not keep every version of it
+STYLESHEETS = OrderedDict()
+MAX_STYLESHEETS = 16
+
+
+def _reduce_token(token):
+    return Token, (token.type, token.value, token.pos)
+
+
+# The tokens of attribute values and pseudo class arguments keep their
+# position outside of the tuple, which pickle would drop. Compiled rules
+# are pickled for the disk cache and for matching in other processes.
+copyreg.pickle(Token, _reduce_token)
+
+
+class CompiledRule:
+    """
+    A single selector of a style rule, with everything the cascade needs
+    already resolved: the parsed selector, its specificity, its position
+    in the sheet and the cleaned declaration values.
+    """
+    def __init__(self, selector, parsed_selector, order, values):
+        self.selector = selector
+        self.parsed_selector = parsed_selector
+        self.specificity = parsed_selector.specificity()
+        self.order = order
+        self.values = values
+
+        # Other pseudo classes, like `:not()`, are left to the matcher
+        match_selector, _, pseudo_class = selector.rpartition(":")
+        if pseudo_class not in PSEUDO_STATES:
+            match_selector, pseudo_class = selector, "default"
+        self.match_selector = match_selector
+        self.pseudo_class = pseudo_class
+
+    def __repr__(self):
+        return f"<CompiledRule {self.selector} {self.specificity}>"
+
+
+class CompiledStyleSheet:
+    def __init__(self, digest, rules, animations):
+        self.digest = digest
+        self.rules = rules
+        self.animations = animations
+
+
+def stylesheet_digest(sheet):
+    content = f"{COMPILED_FORMAT_VERSION}\n{sheet}"
+    return sha1(content.encode("utf-8")).hexdigest()
+
+
+def compile_rule(rule, order=0):
+    compiled = []
+    values = clean_declarations(rule.content)
+    for selector in tinycss2.serialize(rule.prelude).split(","):
+        selector = selector.strip()
+        parsed_selector, = cssselect.parse(selector)
+        compiled.append(
+            CompiledRule(selector, parsed_selector, order + len(compiled), values)
+        )
+    return compiled
+
+
+def parse_stylesheet(sheet):
+    # Style rules and keyframes come out of a single pass over the
+    # token stream, keyframe blocks included
+    rules = []
+    animations = {}
+    nodes = tinycss2.parse_stylesheet(
+        sheet,
+        skip_comments=True,
+        skip_whitespace=True
+    )
+    for node in nodes:
+        if node.type == "qualified-rule":
+            rules.extend(compile_rule(node, order=len(rules)))
+        elif is_keyframe(node):
+            animations[get_identity(node)] = parse_animation(node)
+    return rules, animations
+
+
+def compile_stylesheet(sheet, digest=None):
+    if digest is None:
+        digest = stylesheet_digest(sheet)
+    rules, animations = parse_stylesheet(sheet)
+    return CompiledStyleSheet(
+        digest=digest,
+        rules=sort_rules_by_specificity(rules),
+        animations=animations,
+    )
+
+
+def load_stylesheet(sheet=None, sheet_file=None, cache_dir=None):
+    if sheet_file:
+        with open(sheet_file) as fh:
+            sheet = fh.read()
+
+    digest = stylesheet_digest(sheet)
+    if digest in STYLESHEETS:
+        STYLESHEETS.move_to_end(digest)
+        return STYLESHEETS[digest]
+
+    compiled = None
+    if cache_dir:
+        cache_path = osp.join(cache_dir, f"{digest}.pickle")
+        compiled = _read_cached(cache_path)
+
+    if compiled is None:
+        compiled = compile_stylesheet(sheet, digest)
+        if cache_dir:
+            _write_cached(cache_path, compiled)
+
+    STYLESHEETS[digest] = compiled
+    while len(STYLESHEETS) > MAX_STYLESHEETS:
+        STYLESHEETS.popitem(last=False)
+    return compiled
+
+
+def _read_cached(path):
+    if not osp.exists(path):
+        return None
+    with open(path, "rb") as fh:
+        try:
+            return pickle.load(fh)
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError, TypeError):
+            # A corrupt or outdated artifact is just a cache miss
+            return None
+
+
+def _write_cached(path, compiled):
+    os.makedirs(osp.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as fh:
+            pickle.dump(compiled, fh, protocol=pickle.HIGHEST_PROTOCOL)
+    except (pickle.PicklingError, TypeError, AttributeError):
+        # Values the cleaner does not understand may be left as raw
+        # tokens, in which case the sheet is only cached in memory
+        os.remove(tmp_path)
+        return
+    os.replace(tmp_path, path)
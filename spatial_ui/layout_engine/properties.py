@@ -1,15 +1,11 @@
 from copy import deepcopy
 
-try:
-    from tinycss.speedups import CToken
-    Token = CToken
-except ImportError:
-    from tinycss.token_data import Token
-    from tinycss.token_data import FunctionToken
-
+import tinycss2
 
 from .helpers import Dimension
 
+IGNORED_TOKENS = ("whitespace", "comment")
+
 
 class NotSupportedError(Exception):
     pass
@@ -24,26 +20,52 @@ def clean_value_for(property_name, *values):
     return {property_name: values}
 
 
+def clean_declarations(content):
+    values = {}
+    declarations = tinycss2.parse_declaration_list(
+        content,
+        skip_comments=True,
+        skip_whitespace=True
+    )
+    for declaration in declarations:
+        if declaration.type != "declaration":
+            continue
+        tokens = [v for v in declaration.value if v.type not in IGNORED_TOKENS]
+        if tokens:
+            values.update(clean_value_for(declaration.lower_name, *tokens))
+    return values
+
+
+def _number(token):
+    if token.int_value is not None:
+        return token.int_value
+    return token.value
+
+
 def _sanitize_value(value):
-    if isinstance(value, Token):
-        if value.type in ("DIMENSION", "PERCENTAGE"):
-            return Dimension(value.value, value.unit)
-        elif value.type in ("HASH"):
-            return 0xff000000 | int(value.value[1:], base=16)
-        elif value.type in ("IDENT") and value.value in COLORS:
-            return COLORS[value.value]
-        else:
-            return value.value
-    if isinstance(value, FunctionToken):
-        if value.function_name == "rgba":
-            args = [v for v in value.content if v.type not in ["DELIM", "S"]]
-            alpha = int(args.pop(-1).value * 255)
+    if value.type == "dimension":
+        return Dimension(value.value, value.lower_unit)
+    elif value.type == "percentage":
+        return Dimension(value.value, "%")
+    elif value.type == "hash":
+        return 0xff000000 | int(value.value, base=16)
+    elif value.type == "ident" and value.value in COLORS:
+        return COLORS[value.value]
+    elif value.type == "number":
+        return _number(value)
+    elif value.type == "function":
+        if value.lower_name == "rgba":
+            args = [
+                v for v in value.arguments
+                if v.type not in IGNORED_TOKENS and v != ","
+            ]
+            alpha = int(_number(args.pop(-1)) * 255)
             value = alpha
             for arg in args:
                 value = value << 8
-                value += arg.value
-            return value
-    return value
+                value += _number(arg)
+        return value
+    return getattr(value, "value", value)
 
 
 def default_value_for(property_name):
@@ -328,6 +350,7 @@ DEFAULT_PROPERTY_VALUES = {
 
     "vertical-align": "baseline", 
     "text-align": "left",
+    "white-space": "normal",
 
     "color": COLORS["white"], 
     "content": "normal", 
@@ -383,7 +406,6 @@ DEFAULT_PROPERTY_VALUES = {
     # "unicode-bidi": "normal", 
     # "voice-family": "depends" on user agent, 
     # "volume": "medium", 
-    # "white-space": "normal", 
     # "widows": "2"
     # "word-spacing": "normal", 
 }
@@ -432,6 +454,17 @@ INHERIT = [
     'word-spacing',
 ]
 
+# Properties that only change how a box is painted, never its layout
+PAINT_ONLY = [
+    'background-color',
+    'border-top-color',
+    'border-right-color',
+    'border-bottom-color',
+    'border-left-color',
+    'color',
+    'outline-color',
+]
+
 
 UNPACK = {
     "margin": unpack_to(
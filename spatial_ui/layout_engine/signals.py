@@ -2,6 +2,9 @@ from blinker import Signal
 
 STYLE_CREATED = Signal("style_created")
 LAYOUT_CREATED = Signal("layout_created")
+LAYOUT_INSERTED = Signal("layout_inserted")
+LAYOUT_REMOVED = Signal("layout_removed")
+NODE_CONTENT_CHANGED = Signal("node_content_changed")
 
 LAUNCH_ANIMATION = Signal("launch_animation")
 STOP_ANIMATION = Signal("stop_animation")
@@ -2,6 +2,7 @@ import os
 import os.path as osp
 import psutil
 from contextlib import contextmanager
+from functools import wraps
 from statistics import mean
 
 import glfw
@@ -13,9 +14,17 @@ import time
 
 from spatial_ui.layout_engine.models.node import NodeType
 from spatial_ui.layout_engine.layout.misc import ScrollbarLayout
+from spatial_ui.layout_engine.fonts import get_font_file
+from spatial_ui.layout_engine.signals import (
+    LAYOUT_INSERTED,
+    LAYOUT_REMOVED,
+    NODE_CONTENT_CHANGED,
+)
 
 from spatial_ui.layout.css import CSSLayout
-from spatial_ui.elements.primitives.element import Element
+from spatial_ui.elements.primitives.element import Element, NO_LOCK
+from spatial_ui.events.dispatch import EventDispatcher
+from spatial_ui.events.frame import FrameScheduler
 from spatial_ui.events.signals import (
     ON_HOVER,
     ON_ENTER,
@@ -25,7 +34,6 @@ from spatial_ui.events.signals import (
     ON_CLICK,
     ON_FOCUS,
     ON_BLUR,
-    ON_FRAME,
     ON_CHAR,
     ON_BACKSPACE_KEY,
     ON_ENTER_KEY,
@@ -34,6 +42,7 @@ from spatial_ui.events.signals import (
 
 SHOW_FPS = True
 SHOW_CONTAINER = False
+SCROLL_STEP = 40
 ARROWS = {
     glfw.KEY_RIGHT: "right",
     glfw.KEY_LEFT: "left",
@@ -100,6 +109,9 @@ class GLFWWindow:
     def set_button_handler(self, handler):
         glfw.set_mouse_button_callback(self.window, handler)
 
+    def set_scroll_handler(self, handler):
+        glfw.set_scroll_callback(self.window, handler)
+
     def handle_events(self):
         glfw.poll_events()
 
@@ -176,7 +188,9 @@ class SkiaSurface:
 
 
 FONT_PAINT = {}
+BOX_PAINT = {}
 TYPEFACE = {}
+FONT = {}
 
 def get_font_paint(color):
     if color in FONT_PAINT:
@@ -186,83 +200,287 @@ def get_font_paint(color):
     return paint
 
 
+def get_fill_paint(color):
+    key = ("fill", color)
+    if key in BOX_PAINT:
+        return BOX_PAINT[key]
+    paint = skia.Paint(Color=color, AntiAlias=True)
+    BOX_PAINT[key] = paint
+    return paint
+
+
+def get_stroke_paint(color, width):
+    key = ("stroke", color, width)
+    if key in BOX_PAINT:
+        return BOX_PAINT[key]
+    paint = skia.Paint(
+        Color=color,
+        AntiAlias=True,
+        Style=sk.Paint.Style.kStroke_Style,
+        StrokeWidth=width,
+    )
+    BOX_PAINT[key] = paint
+    return paint
+
+
 def get_typeface(path):
     if path in TYPEFACE:
         return TYPEFACE[path]
-    font = skia.Typeface.MakeFromFile(path)
+    try:
+        font_file = get_font_file(path)
+    except (OSError, ValueError):
+        # A missing, unreadable or empty file, skia uses its default
+        # typeface for none
+        font = None
+    else:
+        # Wrap the shared font mapping instead of letting skia read its own
+        # copy
+        data = skia.Data.MakeWithoutCopy(font_file.buffer)
+        font = skia.Typeface.MakeFromData(data)
     TYPEFACE[path] = font
     return font
 
 
+def get_font(path, size):
+    key = (path, size)
+    if key in FONT:
+        return FONT[key]
+    font = skia.Font(get_typeface(path), size)
+    font.setEdging(skia.Font.Edging.kAntiAlias)
+    FONT[key] = font
+    return font
+
+
 @contextmanager
-def clip(canvas, box):
+def clip(canvas, box, scroll_offset=0):
     rect = sk.Rect.MakeXYWH(box.x, box.y, box.width, box.height)
     canvas.save()
     canvas.clipRect(rect)
+    if scroll_offset:
+        canvas.translate(0, -scroll_offset)
     yield
     canvas.restore()
 
 
+def is_culled(layout, visible):
+    # The caret is moved along its text when painted, after its bounds
+    # were taken
+    if layout.bounds is None or layout.node.node_type is NodeType.CARET:
+        return False
+    return not layout.bounds.intersects(*visible)
+
+
+def are_disjoint(children):
+    # Children that each lie below or right of every sibling before them can
+    # not be painted over by one another, which holds for the flow of a
+    # block and for the cells of a row
+    max_right = max_bottom = float("-inf")
+    for child in children:
+        bounds = child.bounds
+        if bounds is None:
+            return False
+        if bounds.top < max_bottom and bounds.left < max_right:
+            return False
+        max_right = max(max_right, bounds.right)
+        max_bottom = max(max_bottom, bounds.bottom)
+    return True
+
+
+class DisplayList:
+    """
+    Draw calls recorded in layers. Calls in the same layer never overlap,
+    so a layer is drawn grouped on paint instead of in tree order.
+    """
+    def __init__(self):
+        self.layers = []
+
+    def add(self, layer, paint, draw, *args):
+        self._add(layer, paint, draw, args, False)
+
+    def add_to_batch(self, layer, paint, draw, *args):
+        # `draw` is called once for all of the calls in its batch, with the
+        # list of their arguments
+        self._add(layer, paint, draw, args, True)
+
+    def _add(self, layer, paint, draw, args, batched):
+        layers = self.layers
+        while len(layers) <= layer:
+            layers.append([])
+        layers[layer].append((paint, draw, args, batched))
+
+    def draw(self):
+        for layer in self.layers:
+            # Paints are cached per state, and are not hashable themselves
+            batches = {}
+            for paint, draw, args, batched in layer:
+                key = (id(paint), draw)
+                batch = batches.get(key)
+                if batch is None:
+                    batches[key] = batch = (paint, draw, batched, [])
+                batch[3].append(args)
+            for paint, draw, batched, batch in batches.values():
+                if batched:
+                    draw(batch, paint)
+                    continue
+                for args in batch:
+                    draw(*args, paint)
+
+
 class SkiaBoxPainter:
     def __init__(self, canvas):
         self.canvas = canvas
         self.simple_box_painter = SkiaSimpleBoxPainter(self.canvas)
+        self.visible = None
+        self.text_blobs = {}
+        self.previous_text_blobs = {}
 
     def draw_style_box(self, style_box):
+        clip_bounds = self.canvas.getLocalClipBounds()
+        self.visible = (
+            clip_bounds.left(),
+            clip_bounds.top(),
+            clip_bounds.right(),
+            clip_bounds.bottom(),
+        )
+        display_list = DisplayList()
+        self.record_style_box(display_list, style_box, 0)
+        self.previous_text_blobs, self.text_blobs = self.text_blobs, {}
+        display_list.draw()
+
+    def record_style_box(self, display_list, style_box, layer):
+        """
+        Record a box and its subtree from `layer` on, returns the first
+        layer that is free after it.
+        """
         if self._is_simple_box(style_box):
-            self.simple_box_painter.draw_style_box(style_box)
+            layer = self.simple_box_painter.record_style_box(
+                display_list, style_box, layer
+            )
 
-        for child in style_box.children:
-            if style_box.needs_clip():
-                with clip(self.canvas, style_box.container.content):
-                    self._draw_child(child, style_box)
-            else:
-                self._draw_child(child, style_box)
+        if style_box.needs_clip():
+            layer = self._record_clipped(display_list, style_box, layer)
+        else:
+            layer = self._record_children(
+                display_list, style_box.children, style_box, layer
+            )
         if style_box.is_scrollable():
-            print("drawing scrollbar")
-            self.draw_scrollbar(style_box)
-
-    def _draw_child(self, child, parent):
-        if child.style.display == "none":
-            return
+            layer = self.record_scrollbar(display_list, style_box, layer)
+        return layer
+
+    def _record_clipped(self, display_list, style_box, layer):
+        # The clip is applied when the subtree is drawn, so it gets its own
+        # list that is drawn as a single call
+        box = style_box.container.content
+        offset = style_box.scroll_offset
+        visible = self.visible
+        self.visible = (
+            max(visible[0], box.left),
+            max(visible[1], box.top) + offset,
+            min(visible[2], box.right),
+            min(visible[3], box.bottom) + offset,
+        )
+        top = box.y + offset
+        children = style_box.children_in(top, top + box.height)
+        clipped = DisplayList()
+        self._record_children(clipped, children, style_box, 0)
+        self.visible = visible
+        display_list.add(layer, None, self._draw_clipped, clipped, box, offset)
+        return layer + 1
+
+    def _draw_clipped(self, display_list, box, offset, paint):
+        with clip(self.canvas, box, offset):
+            display_list.draw()
+
+    def _record_children(self, display_list, children, parent, layer):
+        # Prune subtrees that can not reach the current clip, which is the
+        # surface itself unless a parent clips its children
+        children = [
+            child for child in children
+            if child.style.display != "none" and not is_culled(child, self.visible)
+        ]
+        if not are_disjoint(children):
+            for child in children:
+                layer = self._record_child(display_list, child, parent, layer)
+            return layer
+
+        # Disjoint siblings share layers, so the same kind of call of all of
+        # them ends up in one batch
+        end = layer
+        for child in children:
+            end = max(end, self._record_child(display_list, child, parent, layer))
+        return end
+
+    def _record_child(self, display_list, child, parent, layer):
         if child.node.node_type == NodeType.ELEMENT:
-            self.draw_style_box(child)
+            return self.record_style_box(display_list, child, layer)
         elif child.node.node_type == NodeType.CARET:
             caret_index = parent.node.raw_content._index
             text_sibling = [c for c in parent.children if c.node.node_type == NodeType.TEXT][0]
-            x_offset = text_sibling._get_x_offset(caret_index)
-            child.container.content.x = parent.container.content.x + x_offset
-            self.draw_style_box(child)
+            x_offset, y_offset = text_sibling.caret_offset(caret_index)
+            content = parent.container.content
+            child.container.content.x = content.x + x_offset
+            child.container.content.y = content.y + child.y_offset + y_offset
+            return self.record_style_box(display_list, child, layer)
         elif child.node.node_type == NodeType.SCROLLBAR:
-            self.draw_style_box(child)
+            return self.record_style_box(display_list, child, layer)
         elif child.node.node_type == NodeType.PLACEHOLDER:
             if child.parent.raw_content.must_draw:
-                self.draw_text(child.children[0])
+                return self.record_text(display_list, child.children[0], layer)
+            return layer
         elif child.node.node_type == NodeType.TEXT:
-            self.draw_text(child)
+            layer = self.record_selection(display_list, child, parent, layer)
+            return self.record_text(display_list, child, layer)
         else:
             raise ValueError("Unknown NodeType {child.node.node_type}")
 
-    def draw_scrollbar(self, parent_box):
-        print("drawing scrollbar")
-        # layout = ScrollbarLayout().render_layout(parent_box)
-        # self._draw_child(layout, parent)
+    def record_scrollbar(self, display_list, parent_box, layer):
+        if parent_box.scrollbar is None:
+            return layer
+        return self.simple_box_painter.record_style_box(
+            display_list, parent_box.scrollbar, layer
+        )
 
-    def draw_text(self, child):
-        # font_paint = skia.Paint(Color=child.style.color, AntiAlias=True)
+    def record_selection(self, display_list, child, parent, layer):
+        # Selected text is highlighted with the background of the text
+        selection = getattr(parent.node.raw_content, "selection", None)
+        if not selection:
+            return layer
+        paint = get_fill_paint(child.style.background_color)
+        rects = child.selection_rects(*selection, self.visible[1], self.visible[3])
+        for rect in rects:
+            rect = sk.Rect.MakeXYWH(rect.x, rect.y, rect.width, rect.height)
+            display_list.add(layer, paint, self.canvas.drawRect, rect)
+        return layer + 1
+
+    def record_text(self, display_list, child, layer):
         font_paint = get_font_paint(child.style.color)
-        for text_line in child.text_blocks:
-            # typeface = skia.Typeface.MakeFromFile(text_line.font.path)
-            typeface = get_typeface(text_line.font.path)
-            font = skia.Font(typeface, text_line.font.size)
-            font.setEdging(skia.Font.Edging.kAntiAlias)
-            self.canvas.drawString(
-                text=text_line.text,
-                x=text_line.box.left,
-                y=text_line.box.bottom,
-                font=font,
-                paint=font_paint,
+        for text_line in child.lines_in(self.visible[1], self.visible[3]):
+            display_list.add_to_batch(
+                layer,
+                font_paint,
+                self.draw_text_runs,
+                text_line.text,
+                text_line.box.left,
+                text_line.box.bottom,
+                text_line.font.path,
+                text_line.font.size,
             )
+        return layer + 1
+
+    def draw_text_runs(self, runs, paint):
+        # All lines with the same paint in a layer go out as the runs of a
+        # single blob. Blobs are kept for the next frame, where unchanged
+        # text draws the same blob again and skia can reuse its glyphs.
+        key = tuple(runs)
+        blob = self.previous_text_blobs.get(key)
+        if blob is None:
+            builder = skia.TextBlobBuilder()
+            for text, x, y, path, size in runs:
+                builder.allocRun(text, get_font(path, size), x, y)
+            blob = builder.make()
+        self.text_blobs[key] = blob
+        if blob is not None:
+            self.canvas.drawTextBlob(blob, 0, 0, paint)
 
     def _is_simple_box(self, style_box):
         style = style_box.style
@@ -284,43 +502,41 @@ class SkiaBoxPainter:
 class SkiaSimpleBoxPainter:
     def __init__(self, canvas):
         self.canvas = canvas
-        self.paint = sk.Paint(
-            AntiAlias=True
-        )
-        self.border_paint = sk.Paint(
-            AntiAlias=True,
-            Style=sk.Paint.Style.kStroke_Style
-        )
 
     def draw_style_box(self, style_box):
+        display_list = DisplayList()
+        self.record_style_box(display_list, style_box, 0)
+        display_list.draw()
+
+    def record_style_box(self, display_list, style_box, layer):
+        # The fill covers the inner half of the border stroke, so it goes
+        # in the layer above
         box = style_box.container.padding_box
-        x, y = box.top_left.as_tuple()
-        rect = sk.Rect.MakeXYWH(x, y, box.width, box.height)
-        rect = self.apply_radius(rect, style_box)
-        self.paint_borders(rect, style_box)
-        self.paint_rect(rect, style_box)
+        rect = sk.Rect.MakeXYWH(box.x, box.y, box.width, box.height)
+        rect, draw = self.apply_radius(rect, style_box)
+        self.record_borders(display_list, rect, draw, style_box, layer)
+        self.record_rect(display_list, rect, draw, style_box, layer + 1)
+        return layer + 2
 
     def apply_radius(self, rect, style_box):
-        style = style_box.style
-        values = [v.value for v in style.border_radius]
-        radii = list(zip(
-            values, values
-        ))
+        values = [v.value for v in style_box.style.border_radius]
+        if not any(values):
+            return rect, self.canvas.drawRect
 
         rrect = sk.RRect()
-        rrect.setRectRadii(rect, radii)
-        return rrect
+        rrect.setRectRadii(rect, list(zip(values, values)))
+        return rrect, self.canvas.drawRRect
 
-    def paint_rect(self, rect, style_box):
-        style = style_box.style
-        self.paint.setColor(style.background_color)
-        self.canvas.drawRRect(rect, self.paint)
+    def record_rect(self, display_list, rect, draw, style_box, layer):
+        paint = get_fill_paint(style_box.style.background_color)
+        display_list.add(layer, paint, draw, rect)
 
-    def paint_borders(self, rect, style_box):
+    def record_borders(self, display_list, rect, draw, style_box, layer):
         style = style_box.style
-        self.border_paint.setColor(style.border_top_color)
-        self.border_paint.setStrokeWidth(style.border_top_width.value * 2)
-        self.canvas.drawRRect(rect, self.border_paint)
+        paint = get_stroke_paint(
+            style.border_top_color, style.border_top_width.value * 2
+        )
+        display_list.add(layer, paint, draw, rect)
 
 
 class DiagnosticPainter:
@@ -486,23 +702,59 @@ class ContainerPainter:
 
 
 class MouseEvent:
-    def __init__(self, get_element_at):
+    """
+    Turns window callbacks into element events.
+
+    Pointer motion is coalesced: a callback only records the position, and
+    the hit test and hover, enter and exit events run once per frame, on
+    `flush`. With `keep_history`, ON_HOVER also gets the positions the
+    pointer went through since the previous frame as `history`.
+    """
+    def __init__(self, get_element_at, dispatcher=None, keep_history=False):
         self.current_x = None
         self.current_y = None
         self.current_hover = None
         self.current_down = None
         self.current_focus = None
         self.get_element_at = get_element_at
+        self.dispatcher = dispatcher
+        self.keep_history = keep_history
+        self.history = []
+        self.moved = False
+
+    def send(self, signal, element, **kwargs):
+        if self.dispatcher is None:
+            signal.send(element, **kwargs)
+        else:
+            self.dispatcher.send(signal, element, **kwargs)
+
+    def has_receivers(self, *signals):
+        if self.dispatcher is None:
+            return any(signal.receivers for signal in signals)
+        return self.dispatcher.has_receivers(*signals)
 
     def hover_handler(self, window, x, y):
         self.current_x = x
         self.current_y = y
-        if ON_HOVER.receivers or ON_ENTER.receivers or ON_EXIT.receivers:
+        self.moved = True
+        if self.keep_history:
+            self.history.append((x, y))
+
+    def flush(self):
+        if not self.moved:
+            return
+        self.moved = False
+        history, self.history = self.history, []
+        if self.has_receivers(ON_HOVER, ON_ENTER, ON_EXIT):
+            x, y = self.current_x, self.current_y
             element = self.get_element_at(x, y)
-            ON_HOVER.send(element, x=x, y=y)
+            if self.keep_history:
+                self.send(ON_HOVER, element, x=x, y=y, history=history)
+            else:
+                self.send(ON_HOVER, element, x=x, y=y)
             if element is not self.current_hover:
-                ON_ENTER.send(element)
-                ON_EXIT.send(self.current_hover)
+                self.send(ON_ENTER, element)
+                self.send(ON_EXIT, self.current_hover)
                 self.current_hover = element
 
     def button_press_handler(self, window, button, action, mods):
@@ -510,7 +762,9 @@ class MouseEvent:
             (0, 1): self.handle_down,
             (0, 0): self.handle_up,
         }
-        if ON_DOWN.receivers or ON_UP.receivers or ON_CLICK.receivers:
+        # Motion before the press is sent first
+        self.flush()
+        if self.has_receivers(ON_DOWN, ON_UP, ON_CLICK):
             element = self.get_element_at(
                 x=self.current_x,
                 y=self.current_y
@@ -519,24 +773,25 @@ class MouseEvent:
 
     def handle_down(self, element):
         self.current_down = element
-        ON_DOWN.send(element)
+        self.send(ON_DOWN, element)
 
     def handle_up(self, element):
-        ON_UP.send(element)
+        self.send(ON_UP, element)
         if element is self.current_down:
-            ON_CLICK.send(element)
+            self.send(ON_CLICK, element)
             if element is not self.current_focus:
-                ON_FOCUS.send(element)
-                ON_BLUR.send(self.current_focus)
+                self.send(ON_FOCUS, element)
+                self.send(ON_BLUR, self.current_focus)
                 self.current_focus = element
         self.current_down = None
 
 
 class MouseEventGroup:
-    def __init__(self, app, groups=None):
+    def __init__(self, app, groups=None, keep_history=False):
         if groups is None:
-            user_events = MouseEvent(app.layout.get_node_at)
-            system_events = MouseEvent(app.layout.get_element_at)
+            user_events = MouseEvent(app.layout.get_node_at, keep_history=keep_history)
+            system_events = MouseEvent(
+                app.layout.get_element_at, app.dispatcher, keep_history=keep_history)
             groups = (user_events, system_events)
         self.groups = groups
 
@@ -544,27 +799,54 @@ class MouseEventGroup:
         for group in self.groups:
             group.hover_handler(*args, **kwargs)
 
+    def flush(self):
+        for group in self.groups:
+            group.flush()
+
     def button_press_handler(self, *args, **kwargs):
         for group in self.groups:
             group.button_press_handler(*args, **kwargs)
 
 
+def layout_locked(handler):
+    # The state of a live layout is changed while no layout runs on it in
+    # the background
+    @wraps(handler)
+    def wrapper(element):
+        with getattr(element.node.raw_content, "layout_lock", NO_LOCK):
+            return handler(element)
+    return wrapper
+
+
+def flag_state(element, state):
+    # A state without rules is the default one, so that no node is left in
+    # a state whose handlers never run for it
+    if not element.style.declares(state):
+        state = "default"
+    element.style.set_state(state)
+
+
+@layout_locked
 def flag_hover_state(element):
-    element.style.set_state("hover")
+    flag_state(element, "hover")
 
 
+@layout_locked
 def flag_focus_state(element):
-    element.style.set_state("focus")
+    flag_state(element, "focus")
     if element.node.raw_content.__class__.__name__ == "Input":
         def is_caret(n):
             return n.node.node_type == NodeType.CARET
         caret = [n for n in element.children if is_caret(n)][0]
         caret.style.set_state("focus")
 
+
+@layout_locked
 def flag_active_state(element):
-    element.style.set_state("active")
+    flag_state(element, "active")
 
 
+@layout_locked
 def flag_default_state(element):
     element.style.set_state("default")
     if element.node.raw_content.__class__.__name__ == "Input":
@@ -574,14 +856,52 @@ def flag_default_state(element):
         caret.style.set_state("default")
 
 
+def defines_state(element, state):
+    if element.style.declares(state):
+        return True
+    if state != "focus":
+        return False
+    # Focus is passed on to the caret of an input
+    return any(
+        child.node.node_type == NodeType.CARET and child.style.declares(state)
+        for child in element.children
+    )
+
+
+# The (signal, handler) pairs that keep a pseudo state up to date
+PSEUDO_STATE_HANDLERS = {
+    "hover": (
+        (ON_ENTER, flag_hover_state),
+        (ON_EXIT, flag_default_state),
+    ),
+    "active": (
+        (ON_DOWN, flag_active_state),
+        (ON_UP, flag_hover_state),
+    ),
+    "focus": (
+        (ON_DOWN, flag_active_state),
+        (ON_UP, flag_hover_state),
+        (ON_FOCUS, flag_focus_state),
+        (ON_BLUR, flag_default_state),
+    ),
+}
+
+
 class App:
     def __init__(self, width, height, **opts):
         self.window = None
         self.surface = None
         self.width = width
         self.height = height
+        self.dispatcher = EventDispatcher(defines_state, self.parent_layout)
+        for state, handlers in PSEUDO_STATE_HANDLERS.items():
+            for signal, handler in handlers:
+                self.dispatcher.connect_state(state, signal, handler)
         self._handle_opts(opts)
         self._layout_tree = None
+        LAYOUT_INSERTED.connect(self.setup_system_events)
+        LAYOUT_REMOVED.connect(self.teardown_system_events)
+        NODE_CONTENT_CHANGED.connect(self.rebind_system_events)
 
     def _handle_opts(self, opts):
         window = opts.get('window', None)
@@ -589,6 +909,7 @@ class App:
         layout = opts.get('layout', None)
         mouse_event = opts.get('mouse_event', None)
         box_painter = opts.get('box_painter', None)
+        scheduler = opts.get('scheduler', None)
 
         if layout is None:
             # default to box layout
@@ -596,26 +917,33 @@ class App:
         self.layout = layout
 
         if mouse_event is None:
-            mouse_event = MouseEventGroup(self)
+            mouse_event = MouseEventGroup(
+                self, keep_history=opts.get('pointer_history', False))
         if window is None:
             window = GLFWWindow(self.width, self.height)
         window.set_hover_handler(mouse_event.hover_handler)
         window.set_button_handler(mouse_event.button_press_handler)
+        window.set_scroll_handler(self.scroll_handler)
         if surface is None:
             surface = SkiaSurface(self.width, self.height)
         if box_painter is None:
             box_painter = SkiaBoxPainter(surface.canvas)
 
+        if scheduler is None:
+            scheduler = FrameScheduler(budget=opts.get('frame_budget', 1 / 60))
+
         self.window = window
         self.surface = surface
         self.box_painter = box_painter
+        self.scheduler = scheduler
+        self.mouse_event = mouse_event
         self.diagnostic_painter = DiagnosticPainter(
             self.surface.canvas, 10, self.height - 32)
         self.container_painter = ContainerPainter(self.surface.canvas)
 
     def paint(self, delta):
         self.surface.clear()
-        self.box_painter.draw_style_box(self._layout_tree)
+        self.box_painter.draw_style_box(self.layout.on_screen)
         if SHOW_FPS:
             self.diagnostic_painter.draw(1 / delta)
         if SHOW_CONTAINER:
@@ -624,61 +952,63 @@ class App:
         self.surface.commit()
         self.window.commit()
 
-    def setup_system_events(self, node):
-        def setup_hover_handlers(element):
-            ON_ENTER.connect(flag_hover_state, element)
-            ON_EXIT.connect(flag_default_state, element)
-
-        def setup_click_handlers(element):
-            ON_DOWN.connect(flag_active_state, element)
-            ON_UP.connect(flag_hover_state, element)
-
-        def setup_focus_handlers(element):
-            setup_click_handlers(element)
-            ON_FOCUS.connect(flag_focus_state, element)
-            ON_BLUR.connect(flag_default_state, element)
-
-        pseudo_handlers = {
-            "hover": setup_hover_handlers,
-            "active": setup_click_handlers,
-            "focus": setup_focus_handlers,
-        }
-
-        for name, handler in pseudo_handlers.items():
-            handler(node)
+    def scroll_handler(self, window, x_offset, y_offset):
+        x, y = glfw.get_cursor_pos(window)
+        self.layout.scroll(x, y, -y_offset * SCROLL_STEP)
 
-        # for name in node.style.values.keys():
-        #     if name in pseudo_handlers:
-        #         pseudo_handlers[name](node)
+    def parent_layout(self, layout):
+        if layout.parent is None or self.layout.renderer is None:
+            return None
+        return self.layout.renderer.layouts_by_node.get(layout.parent)
 
+    def setup_system_events(self, node):
         ui_element = node.node.raw_content
         if isinstance(ui_element, Element):
-            ui_element.register_system_events(node)
+            ui_element.register_system_events(node, self.dispatcher)
 
         for child in node.children:
             self.setup_system_events(child)
 
+    def teardown_system_events(self, node):
+        self.dispatcher.forget(node)
+        for child in node.children:
+            self.teardown_system_events(child)
+
+    def rebind_system_events(self, node, previous):
+        # The layout was reused for another element, move the element
+        # handlers over
+        if isinstance(previous, Element):
+            previous.unregister_system_events(node, self.dispatcher)
+        ui_element = node.node.raw_content
+        if isinstance(ui_element, Element):
+            ui_element.register_system_events(node, self.dispatcher)
+
+    def handle_input(self):
+        self.window.handle_events()
+        # Once all callbacks of the frame are in. Mouse event handlers that
+        # are passed in and send events right away have nothing to flush
+        flush = getattr(self.mouse_event, "flush", None)
+        if flush is not None:
+            flush()
+
     def run_forever(self):
         self._layout_tree = self.layout.render(self.width, self.height)
         self.setup_system_events(self._layout_tree)
         self.window.show()
 
-        handle_events = self.window.handle_events
-        mouse_position = self.window.mouse_position
+        handle_input = self.handle_input
+        run_frame = self.scheduler.run_frame
         paint = self.paint
         delta = self.window.get_delta
 
         while not self.window.should_close:
-            t = delta()
-            handle_events()
-            mouse_position()
-            ON_FRAME.send(t)
-            paint(t)
+            run_frame(delta(), handle_input, paint)
         window.stop()
 
     def show(self):
         self.window.show()
 
     def stop(self):
+        self.layout.close()
         self.surface.close()
         self.window.close()
@@ -0,0 +1,34 @@
+import pytest
+
+from spatial_ui.layout_engine import StyleTreeRenderer
+from spatial_ui.layout_engine.models.primitives import Vector2
+
+VIEWPORT = Vector2(x=500, y=0)
+
+
+def layout_boxes(layout, out=None):
+    # The border box and background of every layout, in tree order
+    out = [] if out is None else out
+    box = layout.container.border_box
+    out.append((
+        layout.node.node_element_name,
+        box.x, box.y, box.width, box.height,
+        layout.style.background_color,
+    ))
+    for child in layout.children:
+        layout_boxes(child, out)
+    return out
+
+
+@pytest.fixture
+def boxes():
+    return layout_boxes
+
+
+@pytest.fixture
+def render_nodes():
+    def render(root, sheet):
+        renderer = StyleTreeRenderer.from_node_tree(root, sheet=sheet)
+        renderer.render_layout(VIEWPORT)
+        return renderer
+    return render
@@ -0,0 +1,20 @@
+from spatial_ui.elements.primitives.line_buffer import LineBuffer
+
+
+def test_appended_lines_join_the_buffer_when_taken():
+    buffer = LineBuffer(["one"], max_lines=3)
+    buffer.extend(["two", "three\nfour"])
+
+    assert str(buffer) == "one"
+    assert buffer.take_appended() == (["two", "three", "four"], 1)
+    assert str(buffer) == "two\nthree\nfour"
+    assert len(buffer) == len("two\nthree\nfour")
+    assert buffer.take_appended() == ([], 0)
+
+
+def test_more_lines_than_it_keeps_replace_all_of_them():
+    buffer = LineBuffer(["a", "b"], max_lines=2)
+    buffer.extend(str(idx) for idx in range(5))
+
+    assert buffer.take_appended() == (["3", "4"], 2)
+    assert list(buffer.lines) == ["3", "4"]
@@ -0,0 +1,35 @@
+from spatial_ui.elements.primitives.text_buffer import GapBuffer
+
+
+def test_edits_anywhere_in_the_buffer():
+    buffer = GapBuffer("hello world")
+    buffer.insert(5, ",")
+    buffer.insert(len(buffer), "!")
+    buffer.delete(0, 1)
+    buffer.insert(0, "J")
+
+    assert str(buffer) == "Jello, world!"
+    assert len(buffer) == 13
+    assert buffer.take_edited() == 0
+    assert buffer.take_edited() is None
+
+
+def test_a_paste_larger_than_the_gap_grows_it():
+    buffer = GapBuffer("ab")
+    pasted = "x" * 1000
+    buffer.insert(1, pasted)
+    buffer.delete(1000, 1001)
+
+    assert str(buffer) == "a" + "x" * 999 + "b"
+    assert buffer.edited_from == 1
+
+
+def test_it_keeps_how_much_of_the_end_was_not_edited():
+    buffer = GapBuffer("one\ntwo\nthree")
+    buffer.insert(5, "w")
+    buffer.delete(1, 2)
+
+    assert str(buffer) == "oe\ntwwo\nthree"
+    assert buffer.unchanged_tail == len("wo\nthree")
+    buffer.take_edited()
+    assert buffer.unchanged_tail is None
@@ -0,0 +1,100 @@
+from blinker import Signal
+
+from spatial_ui.events.dispatch import EventDispatcher, STOP_PROPAGATION
+
+
+class Style:
+    def __init__(self, *states):
+        self.values = {state: {} for state in ("default",) + states}
+
+
+class Layout:
+    def __init__(self, *states):
+        self.style = Style(*states)
+
+
+def defines_state(layout, state):
+    return state in layout.style.values
+
+
+def test_state_handlers_only_run_for_nodes_defining_the_state():
+    on_enter = Signal()
+    entered = []
+    dispatcher = EventDispatcher(defines_state)
+    dispatcher.connect_state("hover", on_enter, entered.append)
+    dispatcher.connect_state("focus", on_enter, entered.append)
+    plain, hoverable, both = Layout(), Layout("hover"), Layout("hover", "focus")
+
+    for layout in (plain, hoverable, both, None):
+        dispatcher.send(on_enter, layout)
+
+    assert entered == [hoverable, both]
+
+
+def test_handlers_are_kept_per_node():
+    on_click = Signal()
+    clicks = []
+    passed_on = []
+    dispatcher = EventDispatcher(defines_state)
+    first, second = Layout(), Layout()
+
+    def handler(layout, **kwargs):
+        clicks.append((layout, kwargs))
+
+    def receiver(layout, **kwargs):
+        passed_on.append(layout)
+
+    dispatcher.connect(on_click, handler, first)
+    on_click.connect(receiver)
+    dispatcher.send(on_click, first, x=1)
+    dispatcher.send(on_click, second, x=2)
+    assert clicks == [(first, {"target": first, "x": 1})]
+    assert passed_on == [first, second]
+
+    dispatcher.forget(first)
+    dispatcher.send(on_click, first)
+    assert len(clicks) == 1
+    assert not dispatcher.has_receivers(Signal())
+
+
+def test_events_are_captured_down_and_bubble_up_the_parent_chain():
+    on_click, on_enter = Signal(), Signal()
+    table, row, cell = Layout(), Layout(), Layout()
+    parents = {id(cell): row, id(row): table}
+    dispatcher = EventDispatcher(
+        defines_state,
+        parent_of=lambda layout: parents.get(id(layout)),
+        bubbling=(on_click,),
+    )
+    calls = []
+
+    def recorder(name, result=None):
+        def handler(layout, target):
+            calls.append((name, layout, target))
+            return result
+        return handler
+
+    dispatcher.connect(on_click, recorder("table"), table)
+    dispatcher.connect(on_click, recorder("cell"), cell)
+    dispatcher.connect(on_click, recorder("table capture"), table, capture=True)
+    dispatcher.connect(on_enter, recorder("table enter"), table)
+
+    dispatcher.send(on_click, cell)
+    assert calls == [
+        ("table capture", table, cell),
+        ("cell", cell, cell),
+        ("table", table, cell),
+    ]
+
+    # Enter does not bubble
+    calls.clear()
+    dispatcher.send(on_enter, cell)
+    assert calls == []
+
+    dispatcher.connect(on_click, recorder("row", STOP_PROPAGATION), row)
+    dispatcher.send(on_click, cell)
+    assert calls == [
+        ("table capture", table, cell),
+        ("cell", cell, cell),
+        ("row", row, cell),
+    ]
@@ -0,0 +1,97 @@
+from contextlib import contextmanager
+
+from pytest import approx
+
+from spatial_ui.events.frame import FrameScheduler
+from spatial_ui.events.signals import ON_FRAME, ON_INTERPOLATE, ON_LAYOUT, ON_FRAME_MISSED
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+@contextmanager
+def connected(signal, receiver):
+    signal.connect(receiver)
+    try:
+        yield
+    finally:
+        signal.disconnect(receiver)
+
+
+def test_animations_advance_in_fixed_steps():
+    steps = []
+    scheduler = FrameScheduler(step=0.01, max_steps=4)
+
+    with connected(ON_FRAME, steps.append):
+        # What is short of a step carries over to the next frame
+        scheduler.advance(0.025)
+        assert steps == approx([0.01, 0.01])
+        assert scheduler.alpha == approx(0.5)
+        scheduler.advance(0.005)
+        assert steps == approx([0.01] * 3)
+        assert scheduler.alpha == approx(0)
+        scheduler.advance(0.004)
+        assert steps == approx([0.01] * 3)
+
+        # A spike is caught up with at most max_steps, the rest is dropped
+        del steps[:]
+        scheduler.advance(1.003)
+        assert steps == approx([0.01] * 4)
+        assert scheduler.accumulator == approx(0.007)
+
+
+def test_the_time_past_the_last_step_is_interpolated_before_painting():
+    scheduler = FrameScheduler(step=0.01)
+    leads = []
+    painted = []
+
+    def paint(delta):
+        painted.append(leads[-1])
+
+    with connected(ON_INTERPOLATE, leads.append):
+        scheduler.run_frame(0.013, lambda: None, paint)
+        scheduler.run_frame(0.004, lambda: None, paint)
+
+    assert painted == approx([0.003, 0.007])
+
+
+def test_layout_is_deferred_while_over_budget():
+    clock = Clock()
+    scheduler = FrameScheduler(budget=0.016, step=0.016, max_deferred=2, clock=clock)
+    layouts = []
+    missed = []
+
+    def layout(delta):
+        layouts.append(delta)
+        clock.now += layout_time
+
+    def paint(delta):
+        clock.now += 0.004
+
+    def handle_input():
+        pass
+
+    with connected(ON_LAYOUT, layout), connected(ON_FRAME_MISSED, missed.append):
+        layout_time = 0.030
+        scheduler.run_frame(0.016, handle_input, paint)
+        assert len(layouts) == 1
+        assert missed == [0.034]
+
+        # The slow layout is put off, but not for more than max_deferred
+        layout_time = 0.001
+        for _ in range(2):
+            scheduler.run_frame(0.016, handle_input, paint)
+        assert len(layouts) == 1
+        assert scheduler.deferred == 2
+        scheduler.run_frame(0.016, handle_input, paint)
+        assert len(layouts) == 2
+
+        # Cheap again, so it runs every frame
+        scheduler.run_frame(0.016, handle_input, paint)
+        assert len(layouts) == 3
+        assert scheduler.missed == 1
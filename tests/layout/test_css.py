@@ -0,0 +1,200 @@
+from threading import Thread
+from time import sleep
+
+import pytest
+
+from spatial_ui.layout.css import CSSLayout
+from spatial_ui.elements import Button, Input, LogView, Panel
+from spatial_ui.elements.table import TableRow, TableCell
+
+SHEET = """
+    TableRow { display: table-row; }
+    TableCell { display: table-cell; padding: 2px; }
+    TableRow + TableRow { background-color: red; }
+"""
+
+
+def make_tree(records, title="Title"):
+    rows = []
+    for key, value in records:
+        row = TableRow([TableCell(key, 0), TableCell(value, 1)])
+        row.key = key
+        rows.append(row)
+    return Panel(Button(title), Panel(*rows))
+
+
+def render(element_tree):
+    layout = CSSLayout(SHEET)
+    layout.set_element_tree(element_tree)
+    layout.render(500, 500)
+    return layout
+
+
+def test_it_reconciles_a_rebuilt_element_tree_on_keys(boxes):
+    records = [(idx, f"value {idx}") for idx in range(6)]
+    layout = render(make_tree(records))
+    root_layout = layout.style_tree
+    row_layouts = {
+        element.key: layout.renderer.layouts_by_node[node]
+        for element, node in layout.nodes_by_element.items()
+        if isinstance(element, TableRow)
+    }
+
+    records = records[1:3] + [(10, "new")] + records[4:]
+    records[1] = (2, "changed")
+    records.insert(0, records.pop())
+    element_tree = make_tree(records, title="Other")
+    layout.set_element_tree(element_tree)
+    layout.relayout()
+
+    assert layout.style_tree is root_layout
+    for element, node in layout.nodes_by_element.items():
+        if isinstance(element, TableRow) and element.key in (1, 2, 4):
+            assert layout.renderer.layouts_by_node[node] is row_layouts[element.key]
+    assert boxes(layout.style_tree) == boxes(render(element_tree).style_tree)
+
+
+def test_a_different_root_element_starts_from_scratch():
+    layout = render(Panel(Button("Title")))
+    nodes = layout.element_tree
+
+    layout.set_element_tree(Button("Title"))
+
+    assert layout.element_tree is not nodes
+    assert layout.renderer is None
+
+
+def test_a_threaded_layout_keeps_the_snapshot_until_the_next_one(boxes):
+    layout = CSSLayout(SHEET, threaded=True)
+    root = Panel(Button("Title"))
+    layout.set_element_tree(root)
+    layout.render(500, 500)
+    snapshot = layout.on_screen
+    title_top = snapshot.children[0].container.border_box.y
+
+    layout.insert(root, 0, Button("Other"))
+    assert layout.on_screen is snapshot
+    assert snapshot.children[0].container.border_box.y == title_top
+
+    layout.layout_snapshot()
+    assert layout.on_screen is not snapshot
+    assert boxes(layout.on_screen) == boxes(layout.style_tree)
+    element = layout.get_element_at(20, title_top + 1)
+    assert element is layout.renderer.layouts_by_node[layout.nodes_by_element[root]].children[0]
+
+    # Styles are copied too
+    painted = layout.on_screen.children[0].style.background_color
+    element.style.set("background_color", "blue")
+    assert layout.on_screen.children[0].style.background_color == painted
+
+    worker = layout._worker
+    layout.close()
+    assert not worker.is_alive()
+
+
+def test_an_edited_input_only_measures_lines_from_the_edit_on():
+    text_input = Input()
+    layout = render(Panel(text_input))
+    text_input.insert_text(" ".join(f"word{idx}" for idx in range(100)))
+    layout.relayout()
+    text_layout = layout.renderer.layouts_by_node[
+        layout.nodes_by_element[text_input._content_container]
+    ]
+    lines = list(text_layout.text_blocks)
+    assert len(lines) > 4
+
+    text_input.on_backspace_key(None)
+    text_input.insert_text("!")
+    layout.relayout()
+
+    assert text_layout.text_blocks[:-2] == lines[:-2]
+    assert all(
+        kept is line for kept, line in zip(text_layout.text_blocks, lines[:-2])
+    )
+    assert text_layout.text_blocks[-1].text.endswith("word9!")
+
+
+def test_a_log_view_only_lays_out_appended_lines_and_follows_them():
+    log = LogView([f"line {idx}" for idx in range(100)], max_lines=1000)
+    layout = render(Panel(Button("Title"), log))
+    scroll = layout.renderer.layouts_by_node[layout.nodes_by_element[log]]
+    text_layout = layout.renderer.layouts_by_node[
+        layout.nodes_by_element[log._content_container]
+    ]
+    assert scroll.scroll_y == scroll.scroll_height - 300
+    kept = list(text_layout.paragraphs.lines)
+
+    producer = Thread(target=log.extend, args=([f"new {idx}" for idx in range(950)],))
+    producer.start()
+    producer.join()
+    layout._update_layout()
+
+    paragraphs = text_layout.paragraphs
+    assert paragraphs.texts == list(log.lines.lines)
+    assert paragraphs.texts[0] == "line 50"
+    assert all(kept is line for kept, line in zip(paragraphs.lines[:50], kept[50:]))
+    assert scroll.scroll_y == scroll.scroll_height - 300
+    assert scroll.scroll_height == 1000 * 20
+
+
+    scroll.scroll_by(-100)
+    scrolled_to = scroll.scroll_y
+    log.append("one more")
+    layout._update_layout()
+    assert scroll.scroll_y == scrolled_to
+
+
+def test_a_rule_with_a_functional_pseudo_class_renders():
+    layout = CSSLayout("Button:nth-child(2) { width: 10px; }")
+    first, second = Button("a"), Button("b")
+    layout.set_element_tree(Panel(first, second))
+    layout.render(500, 500)
+
+    widths = [
+        layout.renderer.layouts_by_node[layout.nodes_by_element[button]].style.width
+        for button in (first, second)
+    ]
+    assert all(width.value == 10 for width in widths)
+
+
+def test_edits_wait_for_a_layout_running_in_the_background():
+    text_input = Input()
+    layout = CSSLayout(SHEET, threaded=True)
+    layout.set_element_tree(Panel(text_input))
+    layout.render(500, 500)
+
+    editor = Thread(target=text_input.insert_text, args=("a",))
+    with layout._lock:
+        editor.start()
+        editor.join(0.05)
+        assert editor.is_alive()
+        assert str(text_input._content) == ""
+    editor.join()
+    assert str(text_input._content) == "a"
+    layout.close()
+
+
+def test_a_failed_background_layout_is_raised_on_the_frame_thread():
+    layout = CSSLayout(SHEET, threaded=True)
+    layout.set_element_tree(Panel(Button("Title")))
+    layout.render(500, 500)
+    failures = []
+
+    def fail():
+        failures.append(True)
+        raise RuntimeError("layout failed")
+
+    layout._update_layout = fail
+    layout._stale = True
+    layout._refresh(0)
+    while not layout._errors:
+        sleep(0.001)
+
+    with pytest.raises(RuntimeError):
+        layout._refresh(0)
+    assert layout._worker.is_alive()
+    layout._stale = True
+    layout._refresh(0)
+    while len(failures) < 2:
+        sleep(0.001)
+    layout.close()
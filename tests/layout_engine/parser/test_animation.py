@@ -0,0 +1,131 @@
+from spatial_ui.layout_engine.models.style import Style
+from spatial_ui.layout_engine.parser.animation import AnimationEngine
+from spatial_ui.layout_engine.parser.stylesheet import compile_stylesheet
+from spatial_ui.layout_engine.signals import STYLE_CHANGED
+
+SHEET = """
+@keyframes pulse {
+  0%   {background-color: rgba(255, 255, 255, 1)}
+  100% {background-color: rgba(255, 255, 255, 0)}
+}
+@keyframes grow {
+  0%   {width: 100px;}
+  100% {width: 200px;}
+}
+Button {
+    width: 100px;
+    background-color: black;
+    animation-duration: 1s;
+}
+"""
+
+
+def animate(animation_name, seconds):
+    sheet = compile_stylesheet(SHEET)
+    style = Style.from_rules(sheet.rules)
+    style.set("animation-name", animation_name)
+    style.animating = True
+    bound = sheet.animations[animation_name].bind(style)
+
+    changes = []
+
+    def record(sender):
+        changes.append(sender)
+
+    STYLE_CHANGED.connect(record)
+    engine = AnimationEngine()
+    engine.fire(bound)
+    try:
+        engine.tick(seconds)
+    finally:
+        STYLE_CHANGED.disconnect(record)
+    return style, changes
+
+
+def test_paint_only_properties_are_animated_without_a_change_signal():
+    style, changes = animate("pulse", 0.5)
+
+    assert changes == []
+    assert style.background_color == int(0xffffffff - 0.5 * 0xff000000)
+    assert style.values["default"]["background-color"] == 0xff000000
+
+
+def test_layout_properties_are_animated_through_the_style():
+    style, changes = animate("grow", 0.5)
+
+    assert changes == [style]
+    assert style.width.value == 150
+
+
+def test_finished_animations_are_dropped_and_loops_start_over():
+    sheet = compile_stylesheet(SHEET)
+    engine = AnimationEngine()
+    styles = []
+    for iteration_count in ("1", "infinite"):
+        style = Style.from_rules(sheet.rules)
+        style.set("animation-name", "grow")
+        style.set("animation-iteration-count", iteration_count)
+        style.animating = True
+        engine.fire(sheet.animations["grow"].bind(style))
+        styles.append(style)
+
+    engine.tick(1.0)
+    assert [animation.style for animation in engine.animations] == [styles[1]]
+    assert styles[0].animating is False
+
+    engine.tick(0.25)
+    assert styles[1].width.value == 125
+
+    # The time past the end is not lost
+    engine.tick(0.85)
+    engine.tick(0.25)
+    assert styles[1].width.value == 135
+
+
+def test_keyframes_are_compiled_per_attribute():
+    sequence = compile_stylesheet(SHEET).animations["grow"]
+
+    assert sequence.attributes == ("width",)
+    assert sequence.offsets.tolist() == [[0, 1]]
+    assert sequence.values.tolist() == [[100, 200]]
+
+
+def test_animations_of_different_attributes_run_side_by_side():
+    sheet = compile_stylesheet(SHEET)
+    engine = AnimationEngine()
+    styles = {}
+    for name in ("pulse", "grow"):
+        style = Style.from_rules(sheet.rules)
+        style.set("animation-name", name)
+        style.animating = True
+        engine.fire(sheet.animations[name].bind(style))
+        styles[name] = style
+
+    engine.tick(0.5)
+
+    assert styles["grow"].width.value == 150
+    assert "background-color" not in styles["grow"].animated
+    assert styles["pulse"].background_color == int(0xffffffff - 0.5 * 0xff000000)
+    assert "width" not in styles["pulse"].animated
+
+
+def test_paint_only_values_are_interpolated_between_steps():
+    sheet = compile_stylesheet(SHEET)
+    engine = AnimationEngine()
+    styles = {}
+    for name in ("pulse", "grow"):
+        style = Style.from_rules(sheet.rules)
+        style.set("animation-name", name)
+        style.animating = True
+        engine.fire(sheet.animations[name].bind(style))
+        styles[name] = style
+
+    engine.tick(0.25)
+    engine.interpolate(0.25)
+    assert styles["pulse"].background_color == int(0xffffffff - 0.5 * 0xff000000)
+    # Layout values wait for the next step
+    assert styles["grow"].width.value == 125
+
+    # The step writes its own value again, even where it did not change
+    engine.tick(0)
+    assert styles["pulse"].background_color == int(0xffffffff - 0.25 * 0xff000000)
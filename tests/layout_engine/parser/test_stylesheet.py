@@ -0,0 +1,84 @@
+from spatial_ui.layout_engine.helpers import Dimension
+from spatial_ui.layout_engine.parser import stylesheet
+from spatial_ui.layout_engine.parser.stylesheet import (
+    compile_stylesheet,
+    load_stylesheet,
+)
+
+SHEET = """
+@keyframes blink {
+  0%   {width: 10px}
+  100% {width: 20px}
+}
+Button, Panel {
+  width: 100px;
+  color: red;
+}
+Button:hover {
+  width: 150px;
+}
+"""
+
+
+def test_it_can_compile_a_stylesheet():
+    compiled = compile_stylesheet(SHEET)
+
+    button, panel, hover = compiled.rules
+    assert (button.selector, panel.selector) == ("Button", "Panel")
+    assert button.values is panel.values
+    assert button.values["color"] == 0xffff0000
+    assert hover.match_selector == "Button"
+    assert hover.pseudo_class == "hover"
+    assert hover.specificity == (0, 1, 1)
+    assert [r.order for r in compiled.rules] == [0, 1, 2]
+    assert list(compiled.animations) == ["blink"]
+
+
+def test_it_sorts_compiled_rules_on_specificity():
+    compiled = compile_stylesheet("""
+        #panel { width: 1px; }
+        .a.b.c.d.e.f.g.h.i.j.k { width: 2px; }
+        Button { width: 3px; }
+        Button { width: 4px; }
+    """)
+
+    widths = [r.values["width"].value for r in compiled.rules]
+    assert widths == [3, 4, 2, 1]
+
+
+def test_it_caches_compiled_stylesheets_on_content():
+    stylesheet.STYLESHEETS.clear()
+
+    compiled = load_stylesheet(sheet=SHEET)
+    assert load_stylesheet(sheet=SHEET) is compiled
+    assert load_stylesheet(sheet=SHEET + " ") is not compiled
+
+
+def test_it_keeps_the_most_recently_loaded_stylesheets(monkeypatch):
+    stylesheet.STYLESHEETS.clear()
+    monkeypatch.setattr(stylesheet, "MAX_STYLESHEETS", 2)
+
+    first = load_stylesheet(sheet=SHEET)
+    load_stylesheet(sheet=SHEET + " ")
+    assert load_stylesheet(sheet=SHEET) is first
+    load_stylesheet(sheet=SHEET + "  ")
+
+    assert len(stylesheet.STYLESHEETS) == 2
+    assert load_stylesheet(sheet=SHEET) is first
+    stylesheet.STYLESHEETS.clear()
+
+
+def test_it_can_load_a_compiled_stylesheet_from_disk(tmp_path):
+    stylesheet.STYLESHEETS.clear()
+    compiled = load_stylesheet(sheet=SHEET, cache_dir=tmp_path)
+    assert (tmp_path / f"{compiled.digest}.pickle").exists()
+
+    stylesheet.STYLESHEETS.clear()
+    loaded = load_stylesheet(sheet=SHEET, cache_dir=tmp_path)
+    assert loaded is not compiled
+    assert loaded.digest == compiled.digest
+    width = loaded.rules[2].values["width"]
+    assert isinstance(width, Dimension)
+    assert width.value == 150
+    keyframe = loaded.animations["blink"].keyframes[1.0]
+    assert keyframe.width == 20
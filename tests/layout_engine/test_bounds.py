@@ -0,0 +1,41 @@
+from spatial_ui.layout_engine.models.node import Node
+from spatial_ui.layout_engine.models.primitives import Vector2
+
+VIEWPORT = Vector2(x=500, y=0)
+SHEET = """
+    Panel { height: 50px; }
+    Row { height: 20px; }
+    .clipped { overflow: hidden; }
+"""
+
+
+def make_tree(node_class=None):
+    rows = [Node(node_element_name="Row") for _ in range(5)]
+    panel = Node(node_element_name="Panel", node_class=node_class, children=rows)
+    return Node(node_element_name="Root", children=[panel]), panel
+
+
+def test_bounds_cover_children_overflowing_their_parent(render_nodes):
+    root, panel = make_tree()
+    renderer = render_nodes(root, SHEET)
+    panel_layout = renderer.layouts_by_node[panel]
+
+    assert panel_layout.container.border_box.height == 50
+    assert panel_layout.bounds.height == 100
+    assert renderer.style_tree.bounds.height == 100
+
+    root, panel = make_tree(node_class="clipped")
+    renderer = render_nodes(root, SHEET)
+    assert renderer.layouts_by_node[panel].bounds.height == 50
+
+
+def test_relayout_updates_the_bounds_of_the_ancestors(render_nodes):
+    root, panel = make_tree()
+    renderer = render_nodes(root, SHEET)
+
+    renderer.insert_node(panel, 0, Node(node_element_name="Row"))
+    renderer.relayout_dirty(VIEWPORT)
+
+    assert list(renderer.dirty_layouts) == []
+    assert renderer.layouts_by_node[panel].bounds.height == 120
+    assert renderer.style_tree.bounds.height == 120
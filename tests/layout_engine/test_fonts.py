@@ -0,0 +1,32 @@
+import pytest
+
+from spatial_ui.layout_engine import fonts
+from spatial_ui.layout_engine.fonts import DEFAULT_FONT_PATH, FontFile, get_font_file
+from spatial_ui.window import get_font, get_typeface
+
+
+def test_a_font_file_maps_the_file_on_disk():
+    with open(DEFAULT_FONT_PATH, "rb") as fh:
+        content = fh.read()
+
+    font_file = FontFile(DEFAULT_FONT_PATH)
+    try:
+        assert len(font_file) == len(content)
+        assert font_file.buffer[:64] == content[:64]
+    finally:
+        font_file.close()
+
+
+def test_typefaces_are_read_from_the_shared_mapping():
+    typeface = get_typeface(DEFAULT_FONT_PATH)
+    font_file = fonts.FONT_FILES[DEFAULT_FONT_PATH]
+
+    assert get_font_file(DEFAULT_FONT_PATH) is font_file
+    assert not font_file.buffer.closed
+    assert typeface.getFamilyName() == "DejaVu Sans"
+    assert get_font(DEFAULT_FONT_PATH, 12).measureText("text") > 0
+
+
+def test_a_missing_font_file_raises(tmp_path):
+    with pytest.raises(OSError):
+        get_font_file((tmp_path / "missing.ttf").as_posix())
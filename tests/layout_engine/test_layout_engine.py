@@ -1,8 +1,8 @@
 import os.path as osp
 
-import tinycss
 from spatial_ui.layout_engine import render_layout
 from spatial_ui.layout_engine.models.style import Style
+from spatial_ui.layout_engine.parser.stylesheet import compile_stylesheet
 from spatial_ui.layout_engine.helpers import node_tree_from_nested_struct
 
 ROOT_PATH = osp.dirname(__file__)
@@ -20,7 +20,7 @@ def test_style_rules_takes_the_highest_specificity():
     }
     """
 
-    sheet = tinycss.make_parser().parse_stylesheet(css)
+    sheet = compile_stylesheet(css)
     style = Style.from_rules(sheet.rules)
 
     assert style.as_dict() == {
@@ -40,7 +40,7 @@ def test_style_rules_takes_the_last_defined_on_equal_specificity():
     }
     """
 
-    sheet = tinycss.make_parser().parse_stylesheet(css)
+    sheet = compile_stylesheet(css)
     style = Style.from_rules(sheet.rules)
 
     assert style.as_dict() == {
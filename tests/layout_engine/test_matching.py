@@ -0,0 +1,64 @@
+from spatial_ui.layout_engine.matching import RuleMatcher
+from spatial_ui.layout_engine.models.node import Node
+from spatial_ui.layout_engine.parser.stylesheet import compile_stylesheet
+
+
+def make_tree():
+    cells = [
+        Node(node_element_name="TableCell"),
+        Node(node_element_name="TableCell", node_class="odd"),
+        Node(node_element_name="TableCell"),
+    ]
+    row = Node(node_element_name="TableRow", children=cells)
+    table = Node(node_element_name="Table", node_id="data", children=[row])
+    return Node(node_element_name="Panel", children=[table]), row, cells
+
+
+def test_it_matches_combinators_on_the_node_tree():
+    root, row, cells = make_tree()
+    sheet = compile_stylesheet("""
+        Panel TableCell { width: 1px; }
+        Table > TableCell { width: 2px; }
+        TableCell + TableCell { width: 3px; }
+        .odd ~ TableCell { width: 4px; }
+        #data TableRow:hover { width: 5px; }
+    """)
+
+    rules_by_node = RuleMatcher(sheet.rules).match(root)
+
+    def widths(node):
+        return [r.values["width"].value for r in rules_by_node.get(node, [])]
+
+    assert widths(cells[0]) == [1]
+    assert widths(cells[1]) == [1, 3]
+    assert widths(cells[2]) == [1, 3, 4]
+    assert widths(row) == [5]
+
+
+def test_it_returns_matched_rules_in_cascade_order():
+    root, _, cells = make_tree()
+    sheet = compile_stylesheet("""
+        .odd { width: 1px; }
+        TableCell { width: 2px; }
+        * { width: 3px; }
+        TableRow .odd { width: 4px; }
+    """)
+
+    rules_by_node = RuleMatcher(sheet.rules).match(root)
+
+    widths = [r.values["width"].value for r in rules_by_node[cells[1]]]
+    assert widths == [3, 2, 1, 4]
+
+
+def test_it_ignores_functional_pseudo_classes():
+    root, _, cells = make_tree()
+    sheet = compile_stylesheet("""
+        TableCell:nth-child(2) { width: 1px; }
+        TableCell:not(.odd) { width: 2px; }
+    """)
+
+    rules_by_node = RuleMatcher(sheet.rules).match(root)
+
+    assert [r.pseudo_class for r in sheet.rules] == ["default", "default"]
+    assert [r.values["width"].value for r in rules_by_node[cells[0]]] == [1, 2]
+    assert [r.values["width"].value for r in rules_by_node[cells[1]]] == [1]
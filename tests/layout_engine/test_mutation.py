@@ -0,0 +1,106 @@
+from spatial_ui.layout_engine.layout import BlockLayout
+from spatial_ui.layout_engine.models.node import Node
+from spatial_ui.layout_engine.models.primitives import Vector2
+from spatial_ui.layout_engine.signals import LAYOUT_INSERTED, LAYOUT_REMOVED
+
+VIEWPORT = Vector2(x=500, y=0)
+SHEET = """
+    Panel { padding: 10px; }
+    Row { height: 20px; margin: 2px; }
+    Row + Row { background-color: red; }
+    #fixed { height: 100px; }
+"""
+
+
+def make_tree(rows=3):
+    fixed = Node(node_element_name="Panel", node_id="fixed", children=[
+        Node(node_element_name="Row") for _ in range(rows)
+    ])
+    other = Node(node_element_name="Panel", children=[
+        Node(node_element_name="Row") for _ in range(rows)
+    ])
+    return Node(node_element_name="Panel", children=[fixed, other]), fixed, other
+
+
+def test_inserting_restyles_the_siblings_a_sibling_combinator_reaches(render_nodes):
+    root, fixed, _ = make_tree()
+    renderer = render_nodes(root, SHEET)
+    first = fixed.children[0]
+    first_style = renderer.styles_by_node[first]
+
+    renderer.insert_node(fixed, 0, Node(node_element_name="Row"))
+
+    new, first = fixed.children[0], fixed.children[1]
+    assert renderer.styles_by_node[first] is not first_style
+    assert renderer.layouts_by_node[first].style.background_color != 0
+    assert renderer.layouts_by_node[new].style.background_color == 0
+
+
+def test_mutations_only_relayout_the_closest_layout_boundary(render_nodes, boxes):
+    root, fixed, other = make_tree()
+    renderer = render_nodes(root, SHEET)
+
+    renderer.insert_node(fixed, 1, Node(node_element_name="Row"))
+    renderer.remove_node(fixed.children[3])
+    assert list(renderer.dirty_layouts) == [fixed]
+    renderer.relayout_dirty(VIEWPORT)
+
+    renderer.move_node(other.children[0], other, 2)
+    assert list(renderer.dirty_layouts) == [other]
+    renderer.relayout_dirty(VIEWPORT)
+
+    assert boxes(renderer.style_tree) == boxes(render_nodes(root, SHEET).style_tree)
+
+
+def test_a_box_that_grows_moves_what_follows_it(monkeypatch, render_nodes, boxes):
+    root, fixed, other = make_tree()
+    inner = Node(node_element_name="Panel", children=[Node(node_element_name="Row")])
+    root.add(inner)
+    renderer = render_nodes(root, SHEET)
+    laid_out = []
+    render_layout = BlockLayout.render_layout
+
+    def spy(self, *args, **kwargs):
+        laid_out.append(self.node)
+        return render_layout(self, *args, **kwargs)
+
+    monkeypatch.setattr(BlockLayout, "render_layout", spy)
+    # The rows of the auto height panel follow the new one
+    renderer.insert_node(other, 0, Node(node_element_name="Row"))
+    renderer.relayout_dirty(VIEWPORT)
+    assert laid_out == other.children
+    assert boxes(renderer.style_tree) == boxes(render_nodes(root, SHEET).style_tree)
+
+    # The fixed height panel keeps its height, nothing after it moves
+    laid_out.clear()
+    renderer.insert_node(fixed, 0, Node(node_element_name="Row"))
+    other_top = renderer.layouts_by_node[other].container.content.y
+    renderer.relayout_dirty(VIEWPORT)
+    assert laid_out == fixed.children
+    assert renderer.layouts_by_node[other].container.content.y == other_top
+
+
+def test_removed_and_inserted_layouts_are_signalled(render_nodes):
+    root, _, other = make_tree()
+    renderer = render_nodes(root, SHEET)
+    inserted, removed = [], []
+
+    def on_inserted(layout):
+        inserted.append(layout)
+
+    def on_removed(layout):
+        removed.append(layout)
+
+    LAYOUT_INSERTED.connect(on_inserted)
+    LAYOUT_REMOVED.connect(on_removed)
+    try:
+        row = other.children[1]
+        layout = renderer.layouts_by_node[row]
+        renderer.replace_node(row, Node(node_element_name="Row"))
+    finally:
+        LAYOUT_INSERTED.disconnect(on_inserted)
+        LAYOUT_REMOVED.disconnect(on_removed)
+
+    assert removed == [layout]
+    assert [l.node for l in inserted] == [other.children[1]]
+    assert row not in renderer.layouts_by_node
@@ -0,0 +1,69 @@
+from spatial_ui.layout_engine.matching import RuleMatcher
+from spatial_ui.layout_engine.models.node import Node
+from spatial_ui.layout_engine.parallel import MatchPool, match_in_parallel, partition
+from spatial_ui.layout_engine.parser.stylesheet import compile_stylesheet
+
+SHEET = """
+    Row { height: 20px; }
+    Row + Row Cell { width: 10px; }
+    .odd + Row > Cell { width: 20px; }
+    Cell#first Text { color: red; }
+    Row > Cell[id^="fir"] Text { width: 30px; }
+"""
+
+
+def make_tree():
+    rows = []
+    for row_index in range(6):
+        cells = [
+            Node(
+                node_element_name="Cell",
+                node_id="first" if cell_index == 0 else None,
+                children=[Node(node_element_name="Text")],
+            )
+            for cell_index in range(3)
+        ]
+        node_class = "odd" if row_index % 2 else None
+        rows.append(Node(node_element_name="Row", node_class=node_class, children=cells))
+    return Node(node_element_name="Root", children=rows)
+
+
+def test_the_tree_is_cut_below_the_split_nodes():
+    root = make_tree()
+    partitions, above = partition(root, 8)
+
+    assert len(partitions) >= 8
+    assert [node for node, _ in above][0] is root
+    covered = [node for _, path in partitions for node in path[-1][0].walk()]
+    covered += [node for node, _ in above]
+    assert sorted(map(id, covered)) == sorted(map(id, root.walk()))
+
+
+def test_a_parallel_match_is_the_same_as_a_sequential_one():
+    root = make_tree()
+    rules = compile_stylesheet(SHEET).rules
+    matcher = RuleMatcher(rules)
+
+    assert match_in_parallel(matcher, rules, root, workers=2) == matcher.match(root)
+
+
+def test_a_match_pool_keeps_its_workers_between_matches():
+    root = make_tree()
+    node_count = sum(1 for _ in root.walk())
+    rules = compile_stylesheet(SHEET).rules
+    matcher = RuleMatcher(rules)
+    pool = MatchPool(workers=2, min_nodes=node_count + 1)
+
+    try:
+        # Small trees are matched here
+        assert pool.match(matcher, rules, root, node_count) == matcher.match(root)
+        assert pool._executor is None
+
+        pool.min_nodes = 0
+        assert pool.match(matcher, rules, root, node_count) == matcher.match(root)
+        executor = pool._executor
+        assert pool.match(matcher, rules, root, node_count) == matcher.match(root)
+        assert pool._executor is executor
+    finally:
+        pool.shutdown()
+    assert pool._executor is None
@@ -0,0 +1,42 @@
+from spatial_ui.layout_engine.layout import ScrollLayout
+from spatial_ui.layout_engine.models.node import Node, NodeType
+
+SHEET = """
+    Panel { height: 100px; overflow: scroll; }
+    Row { height: 20px; }
+    Scrollbar { width: 4px; }
+"""
+
+
+def make_tree(rows):
+    children = [Node(node_element_name="Scrollbar", node_type=NodeType.SCROLLBAR)]
+    children += [Node(node_element_name="Row") for _ in range(rows)]
+    return Node(node_element_name="Panel", children=children)
+
+
+def test_only_the_visible_part_of_a_scroll_container_is_laid_out(render_nodes):
+    panel = render_nodes(make_tree(rows=50), SHEET).style_tree
+
+    assert isinstance(panel, ScrollLayout)
+    assert len(panel.flow_tops) == 5
+    assert panel.scroll_height == 50 * 20
+    assert panel.container.content.height == 100
+
+    panel.scroll_by(210)
+
+    assert len(panel.flow_tops) == 16
+    assert panel.flow[15].container.content.y == 15 * 20
+    visible = panel.children_in(210, 310)
+    assert visible == panel.flow[10:16]
+
+
+def test_scrolling_is_clamped_to_the_content(render_nodes):
+    panel = render_nodes(make_tree(rows=10), SHEET).style_tree
+
+    panel.scroll_by(-50)
+    assert panel.scroll_y == 0
+
+    panel.scroll_by(1000)
+    assert panel.scroll_y == 100
+    assert len(panel.flow_tops) == 10
+    assert panel.scrollbar.container.content.bottom == 100
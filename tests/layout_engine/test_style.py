@@ -1,3 +1,5 @@
+from spatial_ui.layout_engine.models.style import Style
+from spatial_ui.layout_engine.parser.stylesheet import compile_stylesheet
 # from spatial_ui.models.node import Node
 # from spatial_ui.helpers import n
 
@@ -9,3 +11,40 @@
 
 #     style_tree = style_tree_from_node_tree(root)
 
+
+
+def test_styles_matching_the_same_rules_share_their_values():
+    sheet = compile_stylesheet("TableCell { width: 10px; color: red; }")
+    cache = {}
+
+    style1 = Style.shared_from_rules(sheet.rules, cache)
+    style2 = Style.shared_from_rules(sheet.rules, cache)
+
+    assert style1 is not style2
+    assert style1.values is style2.values
+    assert style1.width.value == 10
+
+
+def test_setting_a_value_on_a_shared_style_copies_its_values():
+    sheet = compile_stylesheet("TableCell { width: 10px; color: red; }")
+    cache = {}
+    style1 = Style.shared_from_rules(sheet.rules, cache)
+    style2 = Style.shared_from_rules(sheet.rules, cache)
+
+    style1.set("width", 20)
+
+    assert style1.values is not style2.values
+    assert style1.width.value == 20
+    assert style2.width.value == 10
+
+
+def test_setting_a_value_in_an_undeclared_state_sets_the_default_one():
+    sheet = compile_stylesheet("TableCell { width: 10px; }")
+    style = Style.from_rules(sheet.rules)
+    style.state = "hover"
+
+    style.set("width", 20)
+
+    assert "hover" not in style.values
+    style.state = "default"
+    assert style.width.value == 20
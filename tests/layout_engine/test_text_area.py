@@ -0,0 +1,109 @@
+import random
+
+from spatial_ui.elements import Panel, TextArea
+from spatial_ui.layout.css import CSSLayout
+from spatial_ui.layout_engine.layout import TextAreaLayout
+
+SHEET = """
+    TextArea { height: 100px; line-height: 20px; padding: 0px; margin: 0px; }
+"""
+
+
+def render(text_area):
+    layout = CSSLayout(SHEET)
+    layout.set_element_tree(Panel(text_area))
+    layout.render(500, 500)
+    text_layout = layout.layout_of(text_area._content_container)
+    return layout, text_layout
+
+
+def test_only_paragraphs_in_view_are_wrapped():
+    text_area = TextArea("\n".join(f"line {idx}" for idx in range(100_000)))
+    layout, text_layout = render(text_area)
+
+    assert isinstance(text_layout, TextAreaLayout)
+    top = text_layout.container.content.y
+    assert text_layout.container.content.height == 100_000 * 20
+
+    lines = text_layout.lines_in(top + 2000, top + 2100)
+    assert [line.text for line in lines] == [f"line {idx}" for idx in range(100, 105)]
+    # The end of the text is wrapped with its layout, for logs
+    wrapped = [idx for idx, lines in enumerate(text_layout.paragraphs.lines) if lines]
+    assert wrapped == [*range(100, 105), *range(99_995, 100_000)]
+
+
+def test_an_edit_only_wraps_the_paragraphs_it_touched_again():
+    text = "\n".join("word " * idx for idx in range(1, 40))
+    text_area = TextArea(text)
+    layout, text_layout = render(text_area)
+    top = text_layout.container.content.y
+    text_layout.lines_in(top, top + 10_000)
+    before = list(text_layout.paragraphs.lines)
+
+    text_area._index = len("word \n")
+    text_area.insert_text("new\nparagraph ")
+    layout.relayout()
+
+    paragraphs = text_layout.paragraphs
+    assert paragraphs.texts == text_area.text.split("\n")
+    assert paragraphs.lines[0] is before[0]
+    assert paragraphs.lines[1:3] == [None, None]
+    assert all(kept is line for kept, line in zip(paragraphs.lines[3:], before[2:]))
+
+
+def test_edits_anywhere_keep_the_paragraphs_of_the_text():
+    text_area = TextArea("one\ntwo\n\nthree four five")
+    layout, text_layout = render(text_area)
+    rng = random.Random(0)
+    for _ in range(200):
+        text_area._index = rng.randint(0, len(text_area.text))
+        if rng.random() < 0.4:
+            text_area.on_backspace_key(None)
+        else:
+            text_area.insert_text(rng.choice(["a", " ", "\n", "bc\nd"]))
+        if rng.random() < 0.5:
+            layout.relayout()
+
+    layout.relayout()
+    assert text_layout.paragraphs.texts == text_area.text.split("\n")
+
+
+def test_the_caret_moves_over_the_laid_out_lines():
+    text_area = TextArea("short\n" + "long line " * 20 + "\nend")
+    layout, text_layout = render(text_area)
+
+    text_area._index = 3
+    assert text_layout.caret_offset(3) == (text_layout.paragraphs.font.getlength("sho"), 0)
+
+    text_area.on_arrow_key("down")
+    x, y = text_layout.caret_offset(text_area._index)
+    assert text_area._index == len("short\nlon")
+    assert y == 20
+
+    text_area.on_arrow_key("down")
+    # The long line wraps, its second line is the third line of the text
+    assert text_layout.caret_offset(text_area._index)[1] == 40
+
+    text_area.select(2, len("short\nlong"))
+    top = text_layout.container.content.y
+    rects = text_layout.selection_rects(*text_area.selection, top, top + 100)
+    assert [rect.y - top for rect in rects] == [0, 20]
+    assert text_area.selected_text == "ort\nlong"
+
+    text_area.insert_text("!")
+    assert text_area.text.startswith("sh! line")
+
+
+def test_the_caret_follows_the_layout_of_a_rebuilt_tree():
+    text_area = TextArea("one\ntwo\nthree")
+    layout, _ = render(text_area)
+    # A new parent, the text area is laid out again from scratch
+    text_area.parent.remove(text_area)
+    layout.set_element_tree(Panel(Panel(text_area)))
+    layout.render(500, 500)
+    text_layout = layout.layout_of(text_area._content_container)
+
+    text_area._index = 1
+    text_area.on_arrow_key("down")
+    assert text_area._index == len("one\nt")
+    assert text_layout.caret_offset(text_area._index)[1] == 20
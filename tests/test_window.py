@@ -0,0 +1,173 @@
+from threading import Thread
+
+from spatial_ui.elements import Button, Panel
+from spatial_ui.events.dispatch import EventDispatcher
+from spatial_ui.events.signals import ON_DOWN, ON_EXIT, ON_HOVER, ON_UP
+from spatial_ui.layout.css import CSSLayout
+from spatial_ui.layout_engine.models.node import Node
+from spatial_ui.layout_engine.models.primitives import Rect
+from spatial_ui.layout_engine.models.style import Style
+from spatial_ui.layout_engine.parser.stylesheet import compile_stylesheet
+from spatial_ui.window import (
+    PSEUDO_STATE_HANDLERS,
+    App,
+    DisplayList,
+    MouseEvent,
+    are_disjoint,
+    defines_state,
+    flag_hover_state,
+    get_font,
+    get_typeface,
+)
+
+
+class Child:
+    def __init__(self, x, y, width, height):
+        self.bounds = Rect(x=x, y=y, width=width, height=height)
+
+
+def test_siblings_in_a_flow_or_a_row_are_disjoint():
+    rows = [Child(0, 20 * idx, 100, 20) for idx in range(3)]
+    cells = [Child(50 * idx, 0, 50, 20) for idx in range(3)]
+
+    assert are_disjoint(rows)
+    assert are_disjoint(cells)
+    assert not are_disjoint(rows + [Child(10, 10, 10, 10)])
+
+
+def test_a_layer_is_drawn_grouped_on_paint():
+    calls = []
+
+    def draw(name, paint):
+        calls.append((name, paint))
+
+    red, blue = object(), object()
+    display_list = DisplayList()
+    display_list.add(1, red, draw, "fill 1")
+    display_list.add(0, red, draw, "border 1")
+    display_list.add(1, blue, draw, "fill 2")
+    display_list.add(1, red, draw, "fill 3")
+    display_list.draw()
+
+    assert calls == [
+        ("border 1", red),
+        ("fill 1", red),
+        ("fill 3", red),
+        ("fill 2", blue),
+    ]
+
+
+def test_batched_calls_are_drawn_at_once():
+    calls = []
+
+    def draw_runs(runs, paint):
+        calls.append((runs, paint))
+
+    paint = object()
+    display_list = DisplayList()
+    display_list.add_to_batch(0, paint, draw_runs, "a", 0, 10)
+    display_list.add_to_batch(0, paint, draw_runs, "b", 0, 20)
+    display_list.draw()
+
+    assert calls == [([("a", 0, 10), ("b", 0, 20)], paint)]
+
+
+def test_pointer_motion_is_hit_tested_once_per_frame():
+    hit_tests = []
+    hovers = []
+
+    def get_element_at(x, y):
+        hit_tests.append((x, y))
+        return "element"
+
+    def on_hover(element, **kwargs):
+        hovers.append(kwargs)
+
+    mouse_event = MouseEvent(get_element_at, keep_history=True)
+    ON_HOVER.connect(on_hover)
+    try:
+        for x in range(5):
+            mouse_event.hover_handler(None, x, 10)
+        assert hit_tests == []
+
+        mouse_event.flush()
+        mouse_event.flush()
+    finally:
+        ON_HOVER.disconnect(on_hover)
+
+    assert hit_tests == [(4, 10)]
+    assert hovers == [{"x": 4, "y": 10, "history": [(x, 10) for x in range(5)]}]
+
+
+def test_a_state_without_rules_falls_back_to_the_default_one():
+    class Layout:
+        def __init__(self, style):
+            self.style = style
+            self.node = Node(node_element_name="Button")
+
+    sheet = compile_stylesheet("Button:active { width: 1px; }")
+    layout = Layout(Style.from_rules(sheet.rules))
+    dispatcher = EventDispatcher(defines_state)
+    for state, handlers in PSEUDO_STATE_HANDLERS.items():
+        for signal, handler in handlers:
+            dispatcher.connect_state(state, signal, handler)
+
+    dispatcher.send(ON_DOWN, layout)
+    assert layout.style.state == "active"
+    dispatcher.send(ON_UP, layout)
+    assert layout.style.state == "default"
+    assert not defines_state(layout, "hover")
+    layout.style.values["hover"]
+    assert not defines_state(layout, "hover")
+    dispatcher.send(ON_EXIT, layout)
+    assert layout.style.state == "default"
+
+
+def test_a_missing_font_falls_back_to_the_default_typeface(tmp_path):
+    path = (tmp_path / "missing.ttf").as_posix()
+
+    assert get_typeface(path) is None
+    assert get_font(path, 12).measureText("text") > 0
+
+
+def test_input_is_handled_with_mouse_events_that_do_not_flush():
+    handled = []
+
+    class Window:
+        def handle_events(self):
+            handled.append("events")
+
+    class Immediate:
+        def hover_handler(self, window, x, y):
+            pass
+
+    class Deferred:
+        def flush(self):
+            handled.append("flush")
+
+    class Host:
+        window = Window()
+        mouse_event = Immediate()
+
+    App.handle_input(Host())
+    Host.mouse_event = Deferred()
+    App.handle_input(Host())
+    assert handled == ["events", "events", "flush"]
+
+
+def test_pseudo_states_wait_for_a_layout_running_in_the_background():
+    button = Button("a")
+    layout = CSSLayout("Button:hover { width: 10px; }", threaded=True)
+    layout.set_element_tree(Panel(button))
+    layout.render(500, 500)
+    live = layout.renderer.layouts_by_node[layout.nodes_by_element[button]]
+
+    hover = Thread(target=flag_hover_state, args=(live,))
+    with layout._lock:
+        hover.start()
+        hover.join(0.05)
+        assert hover.is_alive()
+        assert live.style.state == "default"
+    hover.join()
+    assert live.style.state == "hover"
+    layout.close()